@@ -0,0 +1,151 @@
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from simulation import TRAJECTORY_FIELDS
+
+
+class BatchResult(NamedTuple):
+    """Итог пакетной симуляции по зонам.
+
+    trajectory — (тики, N, len(TRAJECTORY_FIELDS)) при record=True, иначе None;
+    зоны, завершившие прогон, заполнены NaN.
+    """
+    smoke: np.ndarray
+    temperature: np.ndarray
+    zone: np.ndarray
+    total_steps: np.ndarray
+    active_steps: np.ndarray
+    safe_steps: np.ndarray
+    time_to_safe: np.ndarray  # NaN, если безопасная зона не достигнута
+    trajectory: Optional[np.ndarray]
+
+
+def is_safe_zone_array(smoke: np.ndarray, temperature: np.ndarray, zone: np.ndarray) -> np.ndarray:
+    """Векторный аналог simulation.is_safe_zone"""
+    return (smoke <= 20) & (temperature <= 40) & (zone <= 1)
+
+
+class BatchSimulator:
+    """Синхронная симуляция N независимых зон на массивах NumPy.
+
+    Физика, ограничения и логика риска зоны те же, что у
+    FireSuppressionSimulator; каждая зона проходит тот же цикл run():
+    безопасные шаги пропускаются, прогон зоны заканчивается после steps
+    активных шагов или 2 * steps шагов всего.
+    """
+
+    def __init__(self, smoke, temperature, zone, seed=None, fis: Optional[FuzzyInferenceSystem] = None,
+                 db_path: str = 'knowledge_base.db', external_smoke=0.0, external_temp=25.0):
+        inputs = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (smoke, temperature, zone)))
+        self.smoke, self.temperature, self.zone = (v.ravel().copy() for v in inputs)
+        n = self.smoke.shape[0]
+        self.external_smoke = np.full(n, external_smoke, dtype=float)
+        self.external_temp = np.full(n, external_temp, dtype=float)
+
+        self.fis = fis if fis is not None else FuzzyInferenceSystem(db_path, verbosity=VERBOSITY_SILENT)
+        self.rng = np.random.default_rng(seed)
+
+        self.total_steps = np.zeros(n, dtype=np.int64)
+        self.active_steps = np.zeros(n, dtype=np.int64)
+        self.safe_steps = np.zeros(n, dtype=np.int64)
+        self.time_to_safe = np.full(n, np.nan)
+
+    @property
+    def size(self) -> int:
+        return self.smoke.shape[0]
+
+    def update_environment(self, mask: np.ndarray):
+        """Имитация изменения внешних условий для зон из mask"""
+        k = int(np.count_nonzero(mask))
+        smoke_noise = self.rng.normal(0, 2, size=k)
+        temp_noise = self.rng.normal(0, 1, size=k)
+        self.external_smoke[mask] = np.clip(self.external_smoke[mask] + smoke_noise, 0, 100)
+        self.external_temp[mask] = np.clip(self.external_temp[mask] + temp_noise, 0, 200)
+
+    def apply_control_actions(self, sprinkler: np.ndarray, alarm: np.ndarray, ventilation: np.ndarray,
+                              mask: np.ndarray):
+        """Физическая модель FireSuppressionSimulator.apply_control_actions для зон из mask"""
+        smoke = self.smoke[mask]
+        temperature = self.temperature[mask]
+        external_smoke = self.external_smoke[mask]
+        external_temp = self.external_temp[mask]
+
+        smoke_reduction = sprinkler * 30
+        temp_reduction = sprinkler * 40
+        ventilation_smoke_reduction = ventilation * 25
+        ventilation_temp_reduction = ventilation * 10
+
+        # Дополнительное охлаждение при высоких температурах
+        temp_reduction = temp_reduction + np.where(temperature > 80, (temperature - 80) * 0.4 * sprinkler, 0.0)
+        temp_reduction = temp_reduction + np.maximum(0, (external_temp - temperature) * 0.15)
+
+        total_smoke_reduction = smoke_reduction + ventilation_smoke_reduction
+        total_temp_reduction = temp_reduction + ventilation_temp_reduction
+
+        smoke = np.clip(smoke - total_smoke_reduction + external_smoke * 0.05, 0, 100)
+        temperature = np.clip(temperature - total_temp_reduction + external_temp * 0.02, 0, 200)
+
+        risk_increase = np.where((sprinkler > 0.5) | (ventilation > 0.7) | (temperature > 60), 0.02, -0.15)
+
+        self.smoke[mask] = smoke
+        self.temperature[mask] = temperature
+        self.zone[mask] = np.clip(self.zone[mask] + risk_increase, 0, 5)
+
+    def couple(self):
+        """Обмен между зонами в конце такта; здесь зоны независимы (см. coupled_simulation)"""
+
+    def step(self, steps: int) -> Dict[str, np.ndarray]:
+        """Один такт для всех зон, ещё не завершивших прогон из steps активных шагов"""
+        n = self.size
+        running = (self.active_steps < steps) & (self.total_steps < steps * 2)
+        self.total_steps[running] += 1
+
+        safe = is_safe_zone_array(self.smoke, self.temperature, self.zone)
+        newly_safe = running & safe & np.isnan(self.time_to_safe)
+        self.time_to_safe[newly_safe] = self.total_steps[newly_safe] - 1
+        self.safe_steps[running & safe] += 1
+
+        # Безопасные зоны пропускаются, как в FireSuppressionSimulator.run()
+        active = running & ~safe
+        self.active_steps[active] += 1
+
+        controls = {name: np.zeros(n) for name in ('sprinkler', 'alarm', 'ventilation')}
+        if active.any():
+            self.update_environment(active)
+            actions = self.fis.infer_batch(self.smoke[active], self.temperature[active], self.zone[active])
+            for name, values in actions.items():
+                controls[name][active] = values
+        controls['running'] = running
+        controls['active'] = active
+        return controls
+
+    def run(self, steps: int = 20, record: bool = False) -> BatchResult:
+        """Прогон всех зон до завершения"""
+        trajectory = np.full((steps * 2, self.size, len(TRAJECTORY_FIELDS)), np.nan) if record else None
+
+        for tick in range(steps * 2):
+            running = (self.active_steps < steps) & (self.total_steps < steps * 2)
+            if not running.any():
+                break
+            if record:
+                state = (self.smoke.copy(), self.temperature.copy(), self.zone.copy())
+            controls = self.step(steps)
+            active = controls['active']
+            if record:
+                frame = trajectory[tick]
+                frame[running] = np.column_stack(
+                    [self.total_steps, *state, controls['sprinkler'], controls['alarm'], controls['ventilation']]
+                )[running]
+            if active.any():
+                self.apply_control_actions(controls['sprinkler'][active], controls['alarm'][active],
+                                           controls['ventilation'][active], active)
+            self.couple()
+
+        final_safe = is_safe_zone_array(self.smoke, self.temperature, self.zone) & np.isnan(self.time_to_safe)
+        self.time_to_safe[final_safe] = self.total_steps[final_safe]
+
+        return BatchResult(self.smoke.copy(), self.temperature.copy(), self.zone.copy(),
+                           self.total_steps.copy(), self.active_steps.copy(), self.safe_steps.copy(),
+                           self.time_to_safe.copy(), trajectory)
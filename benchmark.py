@@ -0,0 +1,223 @@
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from batch_simulation import BatchSimulator
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from knowledge_base import INPUT_RANGES, INPUT_VARIABLES, KnowledgeBase, compile_knowledge_base
+from simulation import run_headless
+
+# Выходные термы, как в init_database.py
+OUTPUT_TERMS = (('off', 'low', 'medium', 'high'), ('off', 'warning', 'on'), ('off', 'low', 'medium', 'high'))
+
+
+class Benchmark(NamedTuple):
+    name: str
+    func: Callable[[], object]
+    items_per_call: int = 1  # для пакетных вызовов: строк или шагов за вызов
+
+
+def synthetic_knowledge_base(n_rules: int, n_terms: int = 5, seed: int = 0) -> KnowledgeBase:
+    """Синтетическая база знаний: равномерное разбиение с попарным перекрытием трапеций"""
+    rng = np.random.default_rng(seed)
+    fuzzy_sets = []
+    for variable in INPUT_VARIABLES:
+        low, high = INPUT_RANGES[variable]
+        edges = np.linspace(low, high, n_terms + 1)
+        overlap = (high - low) / n_terms / 2
+        for i in range(n_terms):
+            a = max(low, edges[i] - overlap)
+            d = min(high, edges[i + 1] + overlap)
+            fuzzy_sets.append((variable, f't{i}', a, edges[i], edges[i + 1], d))
+
+    rules = []
+    for rule_id in range(1, n_rules + 1):
+        # Примерно каждое пятое условие не задано, как в реальной базе
+        conditions = [None if rng.random() < 0.2 else f't{rng.integers(n_terms)}' for _ in INPUT_VARIABLES]
+        actions = [terms[rng.integers(len(terms))] for terms in OUTPUT_TERMS]
+        rules.append((rule_id, *conditions, *actions, int(rng.integers(1, 11))))
+    rules.sort(key=lambda rule: (-rule[7], rule[0]))
+    return compile_knowledge_base(fuzzy_sets, rules)
+
+
+def _silent_fis(db_path: str, kb: Optional[KnowledgeBase] = None) -> FuzzyInferenceSystem:
+    fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    if kb is not None:
+        fis.kb = kb
+    return fis
+
+
+def build_suite(db_path: str, quick: bool = False) -> List[Benchmark]:
+    """Набор замеров: функции нечеткого вывода и прогоны симуляторов"""
+    rng = np.random.default_rng(0)
+    fis = _silent_fis(db_path)
+    suite = [
+        Benchmark('trapezoid_mf', lambda: fis.trapezoid_mf(35.0, 30, 40, 60, 70)),
+        Benchmark('fuzzify/smoke', lambda: fis.fuzzify(35.0, 'smoke')),
+        Benchmark('infer/16', lambda: fis.infer(50.0, 90.0, 3.0)),
+        Benchmark('defuzzify_sprinkler', lambda: fis.defuzzify_sprinkler({'medium': 1.0, 'low': 0.5, 'off': 0.5})),
+        Benchmark('defuzzify_alarm', lambda: fis.defuzzify_alarm({'on': 1.0, 'warning': 0.5})),
+        Benchmark('defuzzify_ventilation', lambda: fis.defuzzify_ventilation({'medium': 1.0, 'low': 0.5})),
+    ]
+
+    batch_sizes = (1000, 100000) if quick else (1000, 100000, 1000000)
+    for n in batch_sizes:
+        inputs = [rng.uniform(*INPUT_RANGES[v], n) for v in INPUT_VARIABLES]
+        suite.append(Benchmark(f'infer_batch/16/{n}', lambda inputs=inputs: fis.infer_batch(*inputs), n))
+
+    # Альтернативные механизмы дефаззификации (нужны выходные множества в БД)
+    for engine in ('centroid', 'sugeno'):
+        engine_fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT, engine=engine)
+        suite.append(Benchmark(f'infer/{engine}', lambda f=engine_fis: f.infer(50.0, 90.0, 3.0)))
+        inputs = [rng.uniform(*INPUT_RANGES[v], 100000) for v in INPUT_VARIABLES]
+        suite.append(Benchmark(f'infer_batch/{engine}/100000',
+                               lambda f=engine_fis, inputs=inputs: f.infer_batch(*inputs), 100000))
+
+    # Синтетические базы правил и разбиения с большим числом термов
+    rule_counts = (16, 1000) if quick else (16, 1000, 10000)
+    for n_rules in rule_counts:
+        synthetic = _silent_fis(db_path, synthetic_knowledge_base(n_rules))
+        suite.append(Benchmark(f'infer/synthetic/{n_rules}', lambda f=synthetic: f.infer(50.0, 90.0, 3.0)))
+        inputs = [rng.uniform(*INPUT_RANGES[v], 10000) for v in INPUT_VARIABLES]
+        suite.append(Benchmark(f'infer_batch/synthetic/{n_rules}/10000',
+                               lambda f=synthetic, inputs=inputs: f.infer_batch(*inputs), 10000))
+    for n_terms in (25, 100):
+        synthetic = _silent_fis(db_path, synthetic_knowledge_base(1000, n_terms=n_terms))
+        suite.append(Benchmark(f'fuzzify/terms/{n_terms}', lambda f=synthetic: f.fuzzify(35.0, 'smoke')))
+        suite.append(Benchmark(f'infer/terms/{n_terms}', lambda f=synthetic: f.infer(50.0, 90.0, 3.0)))
+
+    for steps in ((15, 100) if quick else (15, 100, 1000)):
+        suite.append(Benchmark(f'simulator/steps/{steps}',
+                               lambda steps=steps: run_headless(60.0, 120.0, 4.0, steps=steps, seed=1, fis=fis),
+                               steps))
+    for zones in ((1000, 10000) if quick else (1000, 10000, 100000)):
+        initial = [rng.uniform(*INPUT_RANGES[v], zones) for v in INPUT_VARIABLES]
+        suite.append(Benchmark(f'batch_simulator/zones/{zones}',
+                               lambda initial=initial: BatchSimulator(*initial, seed=1, fis=fis).run(steps=15),
+                               zones))
+    return suite
+
+
+def measure(benchmark: Benchmark, min_time: float = 0.5, min_sample: float = 2e-4,
+            max_samples: int = 1000) -> Dict[str, float]:
+    """Замер одного сценария: пропускная способность, p50/p99 задержки и пиковая память"""
+    func = benchmark.func
+    func()  # прогрев
+
+    # Число вызовов в одной выборке подбирается так, чтобы выборка была
+    # заметно длиннее разрешения таймера
+    inner = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(inner):
+            func()
+        if time.perf_counter() - started >= min_sample:
+            break
+        inner *= 2
+
+    samples = []
+    total_calls = 0
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        deadline = time.perf_counter() + min_time
+        while len(samples) < max_samples and (len(samples) < 5 or time.perf_counter() < deadline):
+            started = time.perf_counter()
+            for _ in range(inner):
+                func()
+            samples.append((time.perf_counter() - started) / inner)
+            total_calls += inner
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # Пиковая память — отдельным вызовом: tracemalloc искажает время
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = np.array(samples)
+    elapsed = samples.sum() * inner
+    calls_per_s = total_calls / elapsed if elapsed > 0 else float('inf')
+    return {
+        'calls_per_s': calls_per_s,
+        'items_per_s': calls_per_s * benchmark.items_per_call,
+        'p50_us': float(np.percentile(samples, 50) * 1e6),
+        'p99_us': float(np.percentile(samples, 99) * 1e6),
+        'peak_memory_bytes': int(peak),
+        'calls': total_calls,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """Сценарии, у которых медианная задержка выросла больше чем на tolerance"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        ratio = result['p50_us'] / reference['p50_us'] if reference['p50_us'] else 1.0
+        result['baseline_ratio'] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: p50 {reference['p50_us']:.2f} → {result['p50_us']:.2f} мкс (×{ratio:.2f})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Замеры производительности нечеткого вывода и симуляции")
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--quick', action='store_true', help="меньшие масштабы и время замера")
+    parser.add_argument('--filter', help="только сценарии, в имени которых есть подстрока")
+    parser.add_argument('--output', help="куда записать результаты в JSON")
+    parser.add_argument('--baseline', help="JSON с эталонными результатами для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="допустимый рост p50 (доля)")
+    args = parser.parse_args(argv)
+
+    suite = build_suite(args.db, quick=args.quick)
+    if args.filter:
+        suite = [b for b in suite if args.filter in b.name]
+
+    results = {}
+    for benchmark in suite:
+        result = measure(benchmark, min_time=0.2 if args.quick else 0.5)
+        results[benchmark.name] = result
+        print(f"{benchmark.name:40s} {result['calls_per_s']:12.1f} вызовов/с  "
+              f"p50 {result['p50_us']:10.2f} мкс  p99 {result['p99_us']:10.2f} мкс  "
+              f"память {result['peak_memory_bytes'] / 1024:10.1f} КиБ")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+
+    if args.output:
+        report = {
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+            'regressions': regressions,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if regressions:
+        print("\n⚠️  РЕГРЕССИИ ПРОИЗВОДИТЕЛЬНОСТИ:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
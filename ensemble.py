@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from simulation import TRAJECTORY_FIELDS, FireSuppressionSimulator
+from trajectory_log import TrajectoryWriter
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Система нечеткого вывода рабочего процесса: база знаний загружается один раз на процесс
+_worker_fis: Optional[FuzzyInferenceSystem] = None
+
+
+class EnsembleResult(NamedTuple):
+    """Результаты ансамбля прогонов.
+
+    trajectories — (n_runs, 2 * steps, len(TRAJECTORY_FIELDS)), шаги после
+    окончания прогона заполнены NaN; time_to_safe — номер шага, на котором
+    впервые достигнута безопасная зона (NaN, если не достигнута).
+    """
+    trajectories: np.ndarray
+    time_to_safe: np.ndarray
+    percentiles: Tuple[float, ...]
+    bands: Dict[str, np.ndarray]  # поле → (len(percentiles), 2 * steps)
+    summary: Dict[str, float]
+
+    def probability_safe_within(self, n_steps: int) -> float:
+        """Доля прогонов, достигших безопасной зоны не позже n_steps шагов"""
+        return float(np.mean(self.time_to_safe <= n_steps))
+
+
+def _init_worker(db_path: str):
+    global _worker_fis
+    _worker_fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+
+
+def _run_chunk(seeds: List[np.random.SeedSequence], initial_conditions: Tuple[float, float, float],
+               steps: int, external: Tuple[float, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Прогоны для части семян в рабочем процессе"""
+    trajectories = np.full((len(seeds), steps * 2, len(TRAJECTORY_FIELDS)), np.nan)
+    time_to_safe = np.full(len(seeds), np.nan)
+    for n, seed in enumerate(seeds):
+        simulator = FireSuppressionSimulator(initial_conditions, seed=seed, headless=True, fis=_worker_fis,
+                                             external_smoke=external[0], external_temp=external[1])
+        trajectory, summary = simulator.run(steps=steps)
+        trajectories[n, :len(trajectory)] = trajectory
+        if summary['time_to_safe'] is not None:
+            time_to_safe[n] = summary['time_to_safe']
+    return trajectories, time_to_safe
+
+
+def _collect_parts(results, writer) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Части ансамбля по порядку; при наличии журнала шаги сразу дописываются в него"""
+    parts = []
+    first_run = 0
+    for trajectories, time_to_safe in results:
+        if writer is not None:
+            n_runs, n_steps, _ = trajectories.shape
+            runs = np.repeat(np.arange(first_run, first_run + n_runs), n_steps)
+            writer.extend(trajectories.reshape(-1, len(TRAJECTORY_FIELDS)), run=runs)
+        first_run += len(trajectories)
+        parts.append((trajectories, time_to_safe))
+    return parts
+
+
+def summarize(trajectories: np.ndarray, time_to_safe: np.ndarray,
+              percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> EnsembleResult:
+    """Сводная статистика и полосы перцентилей по шагам"""
+    with warnings.catch_warnings():
+        # Шаги, до которых не дошёл ни один прогон, дают полностью NaN-срезы
+        warnings.simplefilter('ignore', RuntimeWarning)
+        bands = {
+            name: np.nanpercentile(trajectories[:, :, j], percentiles, axis=0)
+            for j, name in enumerate(TRAJECTORY_FIELDS) if name != 'step'
+        }
+
+    reached = time_to_safe[~np.isnan(time_to_safe)]
+    summary = {
+        'runs': int(len(time_to_safe)),
+        'probability_safe': float(len(reached) / len(time_to_safe)) if len(time_to_safe) else 0.0,
+        'mean_time_to_safe': float(reached.mean()) if len(reached) else None,
+    }
+    for q in percentiles:
+        summary[f'time_to_safe_p{q:g}'] = float(np.percentile(reached, q)) if len(reached) else None
+    return EnsembleResult(trajectories, time_to_safe, tuple(percentiles), bands, summary)
+
+
+def run_ensemble(n_runs: int, initial_conditions: Tuple[float, float, float], steps: int = 15,
+                 seed: Optional[int] = None, workers: Optional[int] = None,
+                 db_path: str = 'knowledge_base.db', external: Tuple[float, float] = (0.0, 25.0),
+                 percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                 log_path: Optional[str] = None) -> EnsembleResult:
+    """Ансамбль независимых прогонов FireSuppressionSimulator в пуле процессов.
+
+    Каждый прогон получает свой поток случайных чисел из SeedSequence.spawn,
+    поэтому результат зависит только от seed, а не от числа процессов.
+    log_path — журнал траекторий (.ftlog), куда по мере готовности частей
+    записываются все шаги; номер прогона — его индекс в ансамбле.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(n_runs)
+    workers = workers or os.cpu_count() or 1
+    # Несколько частей на процесс сглаживают разницу во времени прогонов
+    n_chunks = max(1, min(n_runs, workers * 4))
+    chunks = [list(chunk) for chunk in np.array_split(np.array(seeds, dtype=object), n_chunks)]
+
+    writer = TrajectoryWriter(log_path) if log_path else None
+    parts = []
+    try:
+        if workers == 1:
+            _init_worker(db_path)
+            results = (_run_chunk(chunk, initial_conditions, steps, external) for chunk in chunks)
+            parts = _collect_parts(results, writer)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_path,)) as pool:
+                futures = [pool.submit(_run_chunk, chunk, initial_conditions, steps, external) for chunk in chunks]
+                parts = _collect_parts((future.result() for future in futures), writer)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if parts:
+        trajectories = np.concatenate([part[0] for part in parts])
+        time_to_safe = np.concatenate([part[1] for part in parts])
+    else:
+        trajectories = np.empty((0, steps * 2, len(TRAJECTORY_FIELDS)))
+        time_to_safe = np.empty(0)
+    return summarize(trajectories, time_to_safe, percentiles)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ансамбль стохастических прогонов симулятора (Монте-Карло)")
+    parser.add_argument('--runs', type=int, default=1000)
+    parser.add_argument('--smoke', type=float, required=True)
+    parser.add_argument('--temperature', type=float, required=True)
+    parser.add_argument('--zone', type=float, required=True)
+    parser.add_argument('--steps', type=int, default=15)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--output', help="куда записать сводку в JSON (по умолчанию stdout)")
+    parser.add_argument('--bands', help="куда сохранить полосы перцентилей (.npz)")
+    parser.add_argument('--log', help="журнал траекторий всех прогонов (.ftlog)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    result = run_ensemble(args.runs, (args.smoke, args.temperature, args.zone), steps=args.steps,
+                          seed=args.seed, workers=args.workers, db_path=args.db,
+                          log_path=args.log)
+    elapsed = time.perf_counter() - started
+
+    if args.bands:
+        np.savez(args.bands, percentiles=np.array(result.percentiles), **result.bands)
+    report = json.dumps(dict(result.summary, elapsed_s=elapsed), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
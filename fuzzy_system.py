@@ -1,15 +1,221 @@
-import sqlite3
 import numpy as np
-from typing import Dict, List, Tuple
+from collections import OrderedDict
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from instrumentation import NULL_TIMER
+from knowledge_base import (INPUT_VARIABLES, OUTPUT_VARIABLES, KnowledgeBase, db_signature, load_knowledge_base,
+                            load_knowledge_base_cached)
+
+# Уровни подробности вывода FuzzyInferenceSystem
+VERBOSITY_SILENT = 'silent'    # без печати, строки не форматируются
+VERBOSITY_SUMMARY = 'summary'  # одна строка на вызов infer()
+VERBOSITY_FULL = 'full'        # фаззификация, все правила и дефаззификация
+VERBOSITY_LEVELS = (VERBOSITY_SILENT, VERBOSITY_SUMMARY, VERBOSITY_FULL)
+
+
+class RuleActivation(NamedTuple):
+    """Результат проверки одного правила"""
+    rule_id: int
+    conditions: Dict[str, str]
+    actions: Dict[str, str]
+    priority: int
+    truth: float
+
+    @property
+    def fired(self) -> bool:
+        return self.truth > 0
+
+
+class InferenceTrace(NamedTuple):
+    """Структурированная трассировка одного вызова infer()"""
+    inputs: Dict[str, float]
+    fuzzified: Dict[str, Dict[str, float]]
+    rules: Tuple[RuleActivation, ...]
+    activated: Dict[str, Dict[str, float]]
+    outputs: Dict[str, float]
+
+    @property
+    def fired(self) -> Tuple[RuleActivation, ...]:
+        """Сработавшие правила"""
+        return tuple(rule for rule in self.rules if rule.fired)
+
+
+def trapezoid_mf_array(x: np.ndarray, params: np.ndarray) -> np.ndarray:
+    """Векторная трапециевидная функция принадлежности.
+
+    x — массив значений (n,), params — параметры термов (m, 4);
+    результат (n, m) поэлементно совпадает с FuzzyInferenceSystem.trapezoid_mf.
+    """
+    return _trapezoid_rows(x, params).T
+
+
+def _trapezoid_rows(x: np.ndarray, params: np.ndarray) -> np.ndarray:
+    """То же в раскладке (m, n): строка на терм, непрерывная по значениям"""
+    x = np.asarray(x, dtype=float)[None, :]
+    a, b, c, d = (params[:, k, None] for k in range(4))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # При a == b или c == d деление даёт ±inf или NaN (в самой точке излома);
+        # fmin игнорирует NaN, поэтому результат совпадает с ветвями скалярной версии
+        memberships = np.fmin((x - a) / (b - a), (d - x) / (d - c))
+    np.fmin(memberships, 1.0, out=memberships)
+    np.fmax(memberships, 0.0, out=memberships)
+    memberships[:, np.isnan(x[0])] = 0.0
+    return memberships
+
+
+class InferenceCache:
+    """LRU-кэш результатов infer() по квантованным входам.
+
+    Входы округляются до шага resolution (дым, температура, зона), и вывод
+    выполняется в точке сетки, поэтому результат зависит только от ключа,
+    а не от порядка запросов. Кэш очищается при перезагрузке базы знаний;
+    после изменения sprinkler_map/alarm_map/ventilation_map или engine нужен clear().
+    """
+
+    def __init__(self, resolution: Tuple[float, float, float] = (0.1, 0.1, 0.01), maxsize: int = 65536):
+        if maxsize <= 0 or any(step <= 0 for step in resolution):
+            raise ValueError("maxsize и шаги квантования должны быть положительными")
+        self.resolution = tuple(float(step) for step in resolution)
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Tuple[int, int, int], Dict[str, float]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, smoke: float, temperature: float, zone: float) -> Optional[Tuple[int, int, int]]:
+        """Ключ кэша; None для NaN и бесконечных входов — они вычисляются без кэша"""
+        try:
+            return (round(smoke / self.resolution[0]),
+                    round(temperature / self.resolution[1]),
+                    round(zone / self.resolution[2]))
+        except (ValueError, OverflowError):
+            return None
+
+    def point(self, key: Tuple[int, int, int]) -> Tuple[float, float, float]:
+        """Узел сетки, в котором вычисляется результат для ключа"""
+        return tuple(k * step for k, step in zip(key, self.resolution))
+
+    def get(self, key: Tuple[int, int, int]) -> Optional[Dict[str, float]]:
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: Tuple[int, int, int], result: Dict[str, float]):
+        self._entries[key] = result
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
 
 class FuzzyInferenceSystem:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, auto_reload: bool = True, verbosity: str = VERBOSITY_FULL,
+                 cache: Optional[InferenceCache] = None, engine=None, rule_set: Optional[str] = None,
+                 metrics=None, snapshot: Optional[str] = None):
+        if verbosity not in VERBOSITY_LEVELS:
+            raise ValueError(f"Неизвестный уровень подробности: {verbosity!r}")
         self.db_path = db_path
+        self.verbosity = verbosity
+        # База знаний загружается один раз; при auto_reload изменения файла БД
+        # (например, повторный запуск init_database.py) подхватываются автоматически
+        self.auto_reload = auto_reload
+        # Набор правил (здание / зона) в нормализованной схеме; None — набор по умолчанию
+        self.rule_set = rule_set
+        # Необязательные метрики (instrumentation.Metrics): длительности этапов,
+        # число оценённых и сработавших правил, попадания в кэш, загрузки БД
+        self.metrics = metrics
+        # Необязательный снимок базы знаний (JSON): первый запрос без чтения SQLite,
+        # снимок обновляется при изменении файла БД
+        self.snapshot = snapshot
+        self.kb: KnowledgeBase = self._load()
+        # Необязательный кэш результатов; используется только в режиме silent,
+        # трассировка всегда вычисляется заново
+        self.cache = cache
         self.sprinkler_map = {'off': 0, 'low': 0.33, 'medium': 0.66, 'high': 1.0}
         self.alarm_map = {'off': 0, 'warning': 0.5, 'on': 1.0}
         # Убедитесь, что используются только эти термины для вентиляции
         self.ventilation_map = {'off': 0, 'low': 0.33, 'medium': 0.66, 'high': 1.0}
+        self._plan, self._plan_kb = None, None
+        # Механизм дефаззификации: None — взвешенное среднее синглтонов (по умолчанию),
+        # 'centroid' / 'sugeno' или объект из inference_engines
+        # Механизм, заданный именем, пересоздаётся при перезагрузке базы знаний
+        self._engine_name = engine if isinstance(engine, str) else None
+        self.engine = self._create_engine() if self._engine_name is not None else engine
+
+    def _create_engine(self):
+        from inference_engines import create_engine
+        return create_engine(self._engine_name, {'sprinkler': self.sprinkler_map, 'alarm': self.alarm_map,
+                                                 'ventilation': self.ventilation_map})
+
+    def reload(self) -> KnowledgeBase:
+        """Принудительная перезагрузка базы знаний из БД"""
+        self.kb = self._load()
+        if self._engine_name is not None:
+            # Константы Сугено берутся из текущих словарей синглтонов
+            self.engine = self._create_engine()
+        if self.cache is not None:
+            self.cache.clear()
+        return self.kb
+
+    def _load(self) -> KnowledgeBase:
+        metrics = self.metrics
+        if metrics is None:
+            return self._read_kb()
+        metrics.count('fis_kb_loads_total')
+        with metrics.timer('fis_kb_load_seconds'):
+            return self._read_kb()
+
+    def _read_kb(self) -> KnowledgeBase:
+        if self.snapshot is None:
+            return load_knowledge_base(self.db_path, self.rule_set)
+        return load_knowledge_base_cached(self.db_path, self.snapshot, self.rule_set)
+
+    def _timer(self, name: str):
+        """Таймер этапа или пустой контекст, если метрики не заданы"""
+        return NULL_TIMER if self.metrics is None else self.metrics.timer(name)
+
+    def _aggregation_plan(self, kb: KnowledgeBase):
+        """Порядок правил для max-агрегации по термам выходов через reduceat"""
+        if self._plan_kb is not kb:
+            plan = []
+            for j in range(len(OUTPUT_VARIABLES)):
+                term_of_rule = kb.actions[:, j]
+                rule_order = np.flatnonzero(term_of_rule >= 0)
+                rule_order = rule_order[np.argsort(term_of_rule[rule_order], kind='stable')]
+                offsets = np.searchsorted(term_of_rule[rule_order], np.arange(len(kb.action_terms[j])))
+                plan.append((rule_order, offsets))
+            self._plan, self._plan_kb = plan, kb
+        return self._plan
+
+    def reload_if_changed(self) -> bool:
+        """Перезагрузка базы знаний, если файл БД изменился"""
+        if db_signature(self.db_path) == self.kb.signature:
+            return False
+        self.reload()
+        return True
 
     def trapezoid_mf(self, x: float, a: float, b: float, c: float, d: float) -> float:
         """Трапециевидная функция принадлежности"""
@@ -30,178 +236,497 @@ class FuzzyInferenceSystem:
 
     def fuzzify(self, value: float, variable: str) -> Dict[str, float]:
         """Фаззификация"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        if self.auto_reload:
+            self.reload_if_changed()
+        return self._fuzzify(value, variable)
 
-        cursor.execute('''
-        SELECT set_name, a, b, c, d FROM fuzzy_sets 
-        WHERE variable_name = ?
-        ''', (variable,))
+    def _fuzzify(self, value: float, variable: str) -> Dict[str, float]:
+        """Фаззификация по уже загруженной базе знаний"""
+        variable_sets = self.kb.variables.get(variable)
+        if variable_sets is None:
+            return {}
 
         result = {}
-        for set_name, a, b, c, d in cursor.fetchall():
+        for set_name, a, b, c, d in variable_sets.sets:
             membership = self.trapezoid_mf(value, a, b, c, d)
             if membership > 0:
                 result[set_name] = membership
 
-        conn.close()
         return result
 
     def infer(self, smoke: float, temperature: float, zone: float) -> Dict[str, float]:
         """Нечеткий вывод для системы пожаротушения с вентиляцией"""
-        # Фаззификация
-        smoke_fuzzy = self.fuzzify(smoke, 'smoke')
-        temp_fuzzy = self.fuzzify(temperature, 'temperature')
-        zone_fuzzy = self.fuzzify(zone, 'zone')
-
-        print("🎯 ФАЗЗИФИКАЦИЯ:")
-        print(f"   Дым {smoke}% → {smoke_fuzzy}")
-        print(f"   Температура {temperature}°C → {temp_fuzzy}")
-        print(f"   Зона риска {zone} → {zone_fuzzy}")
-
-        # Получение правил из БД
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM rules ORDER BY priority DESC')
-        rules = cursor.fetchall()
-        conn.close()
-
-        # Агрегация и активация правил
-        sprinkler_output = {}
-        alarm_output = {}
-        ventilation_output = {}
-
-        print("\n📋 ПРОВЕРКА ПРАВИЛ:")
-
-        for rule in rules:
-            (rule_id, cond_smoke, cond_temp, cond_zone,
-             act_sprinkler, act_alarm, act_ventilation, priority) = rule
+        if self.auto_reload:
+            self.reload_if_changed()
+
+        if self.verbosity == VERBOSITY_SILENT:
+            # Без трассировки: ни одной строки не форматируется
+            infer = self._infer_indexed if self.engine is None else self._infer_engine
+            cache = self.cache
+            metrics = self.metrics
+            if metrics is not None and metrics.enabled:
+                return self._infer_measured(infer, smoke, temperature, zone)
+            if cache is None:
+                return infer(self.kb, (smoke, temperature, zone))
+            key = cache.key(smoke, temperature, zone)
+            if key is None:
+                return infer(self.kb, (smoke, temperature, zone))
+            result = cache.get(key)
+            if result is None:
+                result = infer(self.kb, cache.point(key))
+                cache.put(key, result)
+            return dict(result)
+
+        with self._timer('fis_trace_seconds'):
+            trace = self._build_trace(smoke, temperature, zone)
+        if self.verbosity == VERBOSITY_FULL:
+            self._print_trace(trace)
+            if self.engine is None:
+                # Сообщения дефаззификации печатают сами методы defuzzify_*
+                self.defuzzify_sprinkler(trace.activated['sprinkler'])
+                self.defuzzify_alarm(trace.activated['alarm'])
+                self.defuzzify_ventilation(trace.activated['ventilation'])
+            else:
+                print(f"\n🎯 ДЕФАЗЗИФИКАЦИЯ ({self.engine.name}):")
+                for name, value in trace.outputs.items():
+                    print(f"   {name}: {trace.activated[name]} → {value:.2f}")
+        else:
+            print(f"🎛 Дым={smoke}%, темп={temperature}°C, зона={zone}: "
+                  f"сработало правил {len(trace.fired)}/{len(trace.rules)} → "
+                  f"спринклер={trace.outputs['sprinkler']:.2f}, "
+                  f"сигнализация={trace.outputs['alarm']:.2f}, "
+                  f"вентиляция={trace.outputs['ventilation']:.2f}")
+        return dict(trace.outputs)
+
+    def _infer_measured(self, infer, smoke: float, temperature: float, zone: float) -> Dict[str, float]:
+        """Вывод в режиме silent с учётом метрик (тот же результат, что и без них)"""
+        metrics = self.metrics
+        metrics.count('fis_infer_total')
+        started = perf_counter()
+        kb = self.kb
+        cache = self.cache
+        counts = [0, 0]  # оценено правил, сработало правил
+        key = None if cache is None else cache.key(smoke, temperature, zone)
+        if key is None:
+            result = infer(kb, (smoke, temperature, zone), counts)
+        else:
+            result = cache.get(key)
+            if result is not None:
+                metrics.count('fis_cache_hits_total')
+                metrics.observe('fis_infer_seconds', perf_counter() - started)
+                return dict(result)
+            metrics.count('fis_cache_misses_total')
+            result = infer(kb, cache.point(key), counts)
+            cache.put(key, result)
+            result = dict(result)
+        metrics.observe('fis_infer_seconds', perf_counter() - started)
+        metrics.count('fis_rules_evaluated_total', counts[0])
+        metrics.count('fis_rules_fired_total', counts[1])
+        return result
 
-            # Вычисляем степень истинности условия
+    def explain(self, smoke: float, temperature: float, zone: float) -> InferenceTrace:
+        """Структурированная трассировка вывода для отладки (без печати)"""
+        if self.auto_reload:
+            self.reload_if_changed()
+        return self._build_trace(smoke, temperature, zone)
+
+    def _infer_indexed(self, kb: KnowledgeBase, inputs: Tuple[float, float, float],
+                       counts: Optional[List[int]] = None) -> Dict[str, float]:
+        """Вывод с оценкой только тех правил, которые могут сработать (см. _aggregate_indexed)"""
+        aggregated = self._aggregate_indexed(kb, inputs, counts)
+
+        # Взвешенное среднее в порядке термов, как в _weighted_average
+        results = {}
+        maps = (self.sprinkler_map, self.alarm_map, self.ventilation_map)
+        for name, terms, output, crisp_map in zip(OUTPUT_VARIABLES, kb.action_terms, aggregated, maps):
+            numerator = 0.0
+            denominator = 0.0
+            for term, membership in zip(terms, output):
+                if membership > 0:
+                    crisp_value = crisp_map.get(term)
+                    if crisp_value is not None:
+                        numerator += crisp_value * membership
+                        denominator += membership
+            results[name] = numerator / denominator if denominator != 0 else 0.0
+        return results
+
+    def _aggregate_indexed(self, kb: KnowledgeBase, inputs: Tuple[float, float, float],
+                           counts: Optional[List[int]] = None, accumulate: bool = False) -> List[List[float]]:
+        """Агрегированные степени истинности термов выходов в точке.
+
+        Оцениваются только правила-кандидаты — пересечение по входным
+        переменным битовых масок правил, чьё условие либо не задано, либо
+        ссылается на терм с ненулевой принадлежностью. Результат совпадает
+        с полным перебором правил. Термы агрегируются максимумом, при
+        accumulate=True — суммой (Сугено). Если передан counts, к нему
+        добавляются числа оценённых и сработавших правил (у каждого
+        кандидата степень истинности положительна).
+        """
+        candidates = -1
+        memberships = []
+        for j, value in enumerate(inputs):
+            variable = kb.variables[INPUT_VARIABLES[j]]
+            term_rules = kb.term_rules[j]
+            allowed = term_rules[variable.any_index]
+            values = []
+            for t, (_, a, b, c, d) in enumerate(variable.sets):
+                membership = self.trapezoid_mf(value, a, b, c, d)
+                values.append(membership)
+                if membership > 0:
+                    allowed |= term_rules[t]
+            values.append(0.0)  # неизвестный терм
+            values.append(1.0)  # условие не задано
+            memberships.append(values)
+            candidates &= allowed
+
+        if counts is not None:
+            evaluated = candidates.bit_count()
+            counts[0] += evaluated
+            counts[1] += evaluated
+        smoke_mu, temp_mu, zone_mu = memberships
+        aggregated = [[0.0] * len(terms) for terms in kb.action_terms]
+        rule_conditions, rule_actions = kb.rule_conditions, kb.rule_actions
+        while candidates:
+            lowest = candidates & -candidates
+            candidates ^= lowest
+            r = lowest.bit_length() - 1
+            cond_smoke, cond_temp, cond_zone = rule_conditions[r]
+            truth_level = min(smoke_mu[cond_smoke], temp_mu[cond_temp], zone_mu[cond_zone])
+            if accumulate:
+                for output, k in zip(aggregated, rule_actions[r]):
+                    if k >= 0:
+                        output[k] += truth_level
+                continue
+            for output, k in zip(aggregated, rule_actions[r]):
+                if k >= 0 and output[k] < truth_level:
+                    output[k] = truth_level
+        return aggregated
+
+    def _infer_engine(self, kb: KnowledgeBase, inputs: Tuple[float, float, float],
+                      counts: Optional[List[int]] = None) -> Dict[str, float]:
+        """Вывод одной точки через механизм self.engine.
+
+        Механизмы с evaluate_point получают агрегаты правил-кандидатов без
+        массивов numpy; остальные — строку пакета из одного элемента.
+        """
+        engine = self.engine
+        evaluate_point = getattr(engine, 'evaluate_point', None)
+        if evaluate_point is not None:
+            aggregated = self._aggregate_indexed(kb, inputs, counts, engine.aggregation == 'sum')
+            return evaluate_point(kb, aggregated, inputs)
+
+        firing = None
+        for j, value in enumerate(inputs):
+            variable = kb.variables[INPUT_VARIABLES[j]]
+            memberships = [self.trapezoid_mf(value, a, b, c, d) for _, a, b, c, d in variable.sets]
+            memberships.append(0.0)  # неизвестный терм
+            memberships.append(1.0)  # условие не задано
+            truth = np.array(memberships)[kb.conditions[:, j]]
+            firing = truth if firing is None else np.minimum(firing, truth, out=firing)
+        if counts is not None:
+            counts[0] += kb.n_rules
+            counts[1] += int(np.count_nonzero(firing > 0))
+        return self._engine_outputs(kb, firing, inputs)
+
+    def _fuzzify_inputs(self, smoke: float, temperature: float, zone: float) -> Tuple[Dict[str, float], ...]:
+        return (self._fuzzify(smoke, 'smoke'),
+                self._fuzzify(temperature, 'temperature'),
+                self._fuzzify(zone, 'zone'))
+
+    def _rule_truths(self, kb: KnowledgeBase, fuzzified: Tuple[Dict[str, float], ...]) -> List[float]:
+        """Степени истинности всех правил (min по заданным условиям)"""
+        truths = []
+        for rule in kb.rules:
             truth_level = 1.0
+            for term, memberships in zip(rule[1:4], fuzzified):
+                if term:
+                    truth_level = min(truth_level, memberships.get(term, 0))
+            truths.append(truth_level)
+        return truths
+
+    def _aggregate(self, kb: KnowledgeBase, truths: List[float]) -> Dict[str, Dict[str, float]]:
+        """Max-агрегация заключений сработавших правил"""
+        outputs = ({}, {}, {})
+        for rule, truth_level in zip(kb.rules, truths):
+            if truth_level <= 0:
+                continue
+            act_sprinkler, act_alarm, act_ventilation = rule[4:7]
+            if act_sprinkler:
+                outputs[0][act_sprinkler] = max(outputs[0].get(act_sprinkler, 0), truth_level)
+            if act_alarm:
+                outputs[1][act_alarm] = max(outputs[1].get(act_alarm, 0), truth_level)
+            # Неизвестные термины вентиляции пропускаются
+            if act_ventilation and act_ventilation in self.ventilation_map:
+                outputs[2][act_ventilation] = max(outputs[2].get(act_ventilation, 0), truth_level)
+
+        # Порядок термов как в словарях базы знаний: суммы при дефаззификации
+        # складываются в том же порядке, что и в infer_batch
+        return {
+            name: {term: output[term] for term in terms if term in output}
+            for name, terms, output in zip(OUTPUT_VARIABLES, kb.action_terms, outputs)
+        }
 
-            if cond_smoke:
-                smoke_truth = smoke_fuzzy.get(cond_smoke, 0)
-                truth_level = min(truth_level, smoke_truth)
-            if cond_temp:
-                temp_truth = temp_fuzzy.get(cond_temp, 0)
-                truth_level = min(truth_level, temp_truth)
-            if cond_zone:
-                zone_truth = zone_fuzzy.get(cond_zone, 0)
-                truth_level = min(truth_level, zone_truth)
-
-            # Формируем читаемое условие
-            condition_parts = []
-            if cond_smoke:
-                condition_parts.append(f"smoke={cond_smoke}")
-            if cond_temp:
-                condition_parts.append(f"temp={cond_temp}")
-            if cond_zone:
-                condition_parts.append(f"zone={cond_zone}")
-            condition_str = " И ".join(condition_parts) if condition_parts else "ВСЕГДА"
+    def _defuzzify_all(self, activated: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+        return {
+            'sprinkler': self._weighted_average(activated['sprinkler'], self.sprinkler_map),
+            'alarm': self._weighted_average(activated['alarm'], self.alarm_map),
+            'ventilation': self._weighted_average(activated['ventilation'], self.ventilation_map),
+        }
 
-            status = "✅ СРАБОТАЛО" if truth_level > 0 else "❌ НЕ СРАБОТАЛО"
-            print(f"   Правило {rule_id}: ЕСЛИ {condition_str}")
-            print(f"        Приоритет: {priority}, Истинность: {truth_level:.2f} → {status}")
+    def _build_trace(self, smoke: float, temperature: float, zone: float) -> InferenceTrace:
+        kb = self.kb
+        with self._timer('fis_fuzzify_seconds'):
+            fuzzified = self._fuzzify_inputs(smoke, temperature, zone)
+        with self._timer('fis_rules_seconds'):
+            truths = self._rule_truths(kb, fuzzified)
+            activated = self._aggregate(kb, truths)
+        if self.metrics is not None and self.metrics.enabled:
+            self.metrics.count('fis_infer_total')
+            self.metrics.count('fis_rules_evaluated_total', len(truths))
+            self.metrics.count('fis_rules_fired_total', sum(1 for truth in truths if truth > 0))
+
+        rules = tuple(
+            RuleActivation(
+                rule_id=rule[0],
+                conditions={name: term for name, term in zip(INPUT_VARIABLES, rule[1:4]) if term},
+                actions={name: term for name, term in zip(OUTPUT_VARIABLES, rule[4:7]) if term},
+                priority=rule[7],
+                truth=truth_level,
+            )
+            for rule, truth_level in zip(kb.rules, truths)
+        )
+        with self._timer('fis_defuzzify_seconds'):
+            outputs = self._defuzzify_all(activated) if self.engine is None else \
+                self._engine_outputs(kb, np.array(truths, dtype=float), (smoke, temperature, zone))
+        return InferenceTrace(
+            inputs={'smoke': smoke, 'temperature': temperature, 'zone': zone},
+            fuzzified=dict(zip(INPUT_VARIABLES, fuzzified)),
+            rules=rules,
+            activated=activated,
+            outputs=outputs,
+        )
+
+    def _engine_outputs(self, kb: KnowledgeBase, truths: np.ndarray,
+                        inputs: Tuple[float, float, float]) -> Dict[str, float]:
+        """Дефаззификация механизмом self.engine для одной точки по степеням истинности правил"""
+        firing = truths.reshape(-1, 1)
+        columns = [np.array([value], dtype=float) for value in inputs]
+        outputs = self.engine.evaluate(kb, firing, self._aggregation_plan(kb), columns)
+        return {name: float(outputs[name][0]) for name in OUTPUT_VARIABLES}
+
+    def _print_trace(self, trace: InferenceTrace):
+        """Подробная печать хода вывода"""
+        print("🎯 ФАЗЗИФИКАЦИЯ:")
+        print(f"   Дым {trace.inputs['smoke']}% → {trace.fuzzified['smoke']}")
+        print(f"   Температура {trace.inputs['temperature']}°C → {trace.fuzzified['temperature']}")
+        print(f"   Зона риска {trace.inputs['zone']} → {trace.fuzzified['zone']}")
 
-            if truth_level > 0:
-                # Активация заключений
-                if act_sprinkler:
-                    current_value = sprinkler_output.get(act_sprinkler, 0)
-                    sprinkler_output[act_sprinkler] = max(current_value, truth_level)
+        print("\n📋 ПРОВЕРКА ПРАВИЛ:")
+        short_names = {'smoke': 'smoke', 'temperature': 'temp', 'zone': 'zone'}
+        for rule in trace.rules:
+            condition_parts = [f"{short_names[name]}={term}" for name, term in rule.conditions.items()]
+            condition_str = " И ".join(condition_parts) if condition_parts else "ВСЕГДА"
 
-                if act_alarm:
-                    current_value = alarm_output.get(act_alarm, 0)
-                    alarm_output[act_alarm] = max(current_value, truth_level)
+            status = "✅ СРАБОТАЛО" if rule.fired else "❌ НЕ СРАБОТАЛО"
+            print(f"   Правило {rule.rule_id}: ЕСЛИ {condition_str}")
+            print(f"        Приоритет: {rule.priority}, Истинность: {rule.truth:.2f} → {status}")
 
-                if act_ventilation:
-                    # Проверяем, что термин вентиляции корректен
-                    if act_ventilation not in self.ventilation_map:
-                        print(f"   ⚠️  ПРЕДУПРЕЖДЕНИЕ: неизвестный термин вентиляции '{act_ventilation}'")
-                        continue
-                    current_value = ventilation_output.get(act_ventilation, 0)
-                    ventilation_output[act_ventilation] = max(current_value, truth_level)
+            act_ventilation = rule.actions.get('ventilation')
+            if rule.fired and act_ventilation and act_ventilation not in self.ventilation_map:
+                print(f"   ⚠️  ПРЕДУПРЕЖДЕНИЕ: неизвестный термин вентиляции '{act_ventilation}'")
 
         print(f"\n🎛 АКТИВИРОВАННЫЕ ДЕЙСТВИЯ:")
-        print(f"   Спринклер: {sprinkler_output}")
-        print(f"   Сигнализация: {alarm_output}")
-        print(f"   Вентиляция: {ventilation_output}")
-
-        # Дефаззификация
-        sprinkler_result = self.defuzzify_sprinkler(sprinkler_output)
-        alarm_result = self.defuzzify_alarm(alarm_output)
-        ventilation_result = self.defuzzify_ventilation(ventilation_output)
-
-        return {
-            'sprinkler': sprinkler_result,
-            'alarm': alarm_result,
-            'ventilation': ventilation_result
-        }
-
-    def defuzzify_sprinkler(self, fuzzy_output: Dict[str, float]) -> float:
-        """Дефаззификация для спринклера"""
-        if not fuzzy_output:
-            print("   Спринклер: нет активированных правил → ВЫКЛ")
-            return 0.0
+        print(f"   Спринклер: {trace.activated['sprinkler']}")
+        print(f"   Сигнализация: {trace.activated['alarm']}")
+        print(f"   Вентиляция: {trace.activated['ventilation']}")
+
+    def membership_matrix(self, values: np.ndarray, variable: str) -> np.ndarray:
+        """Матрица принадлежности (n, n_terms + 2) для пакетного вывода.
+
+        Два последних столбца — неизвестный терм (0) и отсутствующее условие (1),
+        см. FuzzyVariable.unknown_index / any_index.
+        """
+        return self._membership_rows(values, variable).T
+
+    def _membership_rows(self, values: np.ndarray, variable: str) -> np.ndarray:
+        """Матрица принадлежности в раскладке (n_terms + 2, n)"""
+        variable_sets = self.kb.variables[variable]
+        values = np.asarray(values, dtype=float)
+        matrix = np.empty((len(variable_sets.terms) + 2, values.shape[0]))
+        matrix[:-2] = _trapezoid_rows(values, variable_sets.params)
+        matrix[-2] = 0.0
+        matrix[-1] = 1.0
+        return matrix
+
+    def _firing(self, kb: KnowledgeBase, inputs: List[np.ndarray]) -> np.ndarray:
+        """Степени истинности правил (правила × строки): min по условиям всех входов"""
+        firing = None
+        for j, variable in enumerate(INPUT_VARIABLES):
+            memberships = self._membership_rows(inputs[j], variable)
+            truth = memberships[kb.conditions[:, j]]
+            firing = truth if firing is None else np.minimum(firing, truth, out=firing)
+        return firing
+
+    def infer_batch(self, smoke: np.ndarray, temperature: np.ndarray, zone: np.ndarray,
+                    chunk_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Пакетный нечеткий вывод по массивам входов.
+
+        Результат поэлементно совпадает с infer(); массивы обрабатываются
+        частями по chunk_size строк, чтобы матрица (правила × строки) не росла
+        без ограничений. По умолчанию размер части подбирается так, чтобы
+        матрица занимала порядка 32 МБ. Если задан engine, дефаззификация
+        выполняется им.
+        """
+        return self._infer_batch(smoke, temperature, zone, chunk_size, False)[0]
+
+    def activation_batch(self, smoke: np.ndarray, temperature: np.ndarray, zone: np.ndarray,
+                         chunk_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Наибольшая степень истинности правил с заключением по каждому выходу.
+
+        Учитываются только заключения с известными термами (как в infer()).
+        Ноль означает, что для выхода не сработало ни одно правило и infer()
+        возвращает 0 («нет активированных правил → ВЫКЛ»).
+        """
+        return self._infer_batch(smoke, temperature, zone, chunk_size, True)[1]
+
+    def infer_activation_batch(self, smoke: np.ndarray, temperature: np.ndarray, zone: np.ndarray,
+                               chunk_size: Optional[int] = None) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """infer_batch и activation_batch за один проход по матрице правил"""
+        return self._infer_batch(smoke, temperature, zone, chunk_size, True)
+
+    def _infer_batch(self, smoke: np.ndarray, temperature: np.ndarray, zone: np.ndarray,
+                     chunk_size: Optional[int], with_activation: bool):
+        """Общий проход пакетного вывода: (выходы, активация или None)"""
+        if self.auto_reload:
+            self.reload_if_changed()
+        kb = self.kb
+        if chunk_size is None:
+            chunk_size = min(65536, max(256, (1 << 22) // max(kb.n_rules, 1)))
+
+        inputs = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (smoke, temperature, zone)))
+        shape = inputs[0].shape
+        inputs = [v.ravel() for v in inputs]
+        n = inputs[0].shape[0]
+
+        plan = self._aggregation_plan(kb)
+        maps = (self.sprinkler_map, self.alarm_map, self.ventilation_map)
+        # Неизвестные термины всех выходов пропускаются, как в infer() (_weighted_average)
+        crisp_values = [[crisp_map.get(term) for term in terms] for crisp_map, terms in zip(maps, kb.action_terms)]
+        known_terms = [[k for k, crisp in enumerate(crisp) if crisp is not None] for crisp in crisp_values]
+
+        measured = self.metrics is not None and self.metrics.enabled
+        results = {name: np.empty(n) for name in OUTPUT_VARIABLES}
+        activation = {name: np.zeros(n) for name in OUTPUT_VARIABLES} if with_activation else None
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+
+            chunk = [values[start:stop] for values in inputs]
+            with self._timer('fis_batch_firing_seconds'):
+                firing = self._firing(kb, chunk)
+            if measured:
+                self.metrics.count('fis_batch_rows_total', stop - start)
+                self.metrics.count('fis_rules_evaluated_total', firing.size)
+                self.metrics.count('fis_rules_fired_total', int(np.count_nonzero(firing > 0)))
+
+            # Максимум степеней истинности правил с одинаковым заключением: термы × строки
+            aggregated = [None] * len(OUTPUT_VARIABLES)
+            if with_activation or self.engine is None:
+                for j, (rule_order, offsets) in enumerate(plan):
+                    if len(offsets):
+                        aggregated[j] = np.maximum.reduceat(firing[rule_order], offsets, axis=0)
+                        np.maximum(aggregated[j], 0.0, out=aggregated[j])
+            if with_activation:
+                for j, name in enumerate(OUTPUT_VARIABLES):
+                    if aggregated[j] is not None and known_terms[j]:
+                        activation[name][start:stop] = aggregated[j][known_terms[j]].max(axis=0)
+
+            if self.engine is not None:
+                with self._timer('fis_batch_defuzzify_seconds'):
+                    outputs = self.engine.evaluate(kb, firing, plan, chunk)
+                for name in OUTPUT_VARIABLES:
+                    results[name][start:stop] = outputs[name]
+                continue
 
+            with self._timer('fis_batch_defuzzify_seconds'):
+                for j, name in enumerate(OUTPUT_VARIABLES):
+                    numerator = np.zeros(stop - start)
+                    denominator = np.zeros(stop - start)
+                    if aggregated[j] is not None:
+                        # Взвешенное среднее; слагаемые в порядке термов, как в infer()
+                        for k in known_terms[j]:
+                            numerator += crisp_values[j][k] * aggregated[j][k]
+                            denominator += aggregated[j][k]
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        results[name][start:stop] = np.where(denominator != 0, numerator / denominator, 0.0)
+
+        results = {name: values.reshape(shape) for name, values in results.items()}
+        if with_activation:
+            activation = {name: values.reshape(shape) for name, values in activation.items()}
+        return results, activation
+
+    def _weighted_average(self, fuzzy_output: Dict[str, float], crisp_map: Dict[str, float]) -> float:
+        """Взвешенное среднее синглтонов; неизвестные термины пропускаются"""
         numerator = 0.0
         denominator = 0.0
 
         for term, membership in fuzzy_output.items():
+            crisp_value = crisp_map.get(term)
+            if crisp_value is None:
+                continue
             membership_val = float(membership)
-            crisp_value = self.sprinkler_map[term]
             numerator += crisp_value * membership_val
             denominator += membership_val
 
-        result = numerator / denominator if denominator != 0 else 0.0
-        print(f"   Спринклер: {fuzzy_output} → интенсивность {result:.2f}")
+        return numerator / denominator if denominator != 0 else 0.0
+
+    def defuzzify_sprinkler(self, fuzzy_output: Dict[str, float]) -> float:
+        """Дефаззификация для спринклера"""
+        verbose = self.verbosity != VERBOSITY_SILENT
+        if not fuzzy_output:
+            if verbose:
+                print("   Спринклер: нет активированных правил → ВЫКЛ")
+            return 0.0
+
+        result = self._weighted_average(fuzzy_output, self.sprinkler_map)
+        if verbose:
+            print(f"   Спринклер: {fuzzy_output} → интенсивность {result:.2f}")
         return result
 
     def defuzzify_alarm(self, fuzzy_output: Dict[str, float]) -> float:
         """Дефаззификация для сигнализации"""
+        verbose = self.verbosity != VERBOSITY_SILENT
         if not fuzzy_output:
-            print("   Сигнализация: нет активированных правил → ВЫКЛ")
+            if verbose:
+                print("   Сигнализация: нет активированных правил → ВЫКЛ")
             return 0.0
 
-        numerator = 0.0
-        denominator = 0.0
-
-        for term, membership in fuzzy_output.items():
-            membership_val = float(membership)
-            crisp_value = self.alarm_map[term]
-            numerator += crisp_value * membership_val
-            denominator += membership_val
-
-        result = numerator / denominator if denominator != 0 else 0.0
-        status = "ВЫКЛ" if result < 0.25 else "ПРЕДУПРЕЖДЕНИЕ" if result < 0.75 else "ВКЛ"
-        print(f"   Сигнализация: {fuzzy_output} → {status} ({result:.2f})")
+        result = self._weighted_average(fuzzy_output, self.alarm_map)
+        if verbose:
+            status = "ВЫКЛ" if result < 0.25 else "ПРЕДУПРЕЖДЕНИЕ" if result < 0.75 else "ВКЛ"
+            print(f"   Сигнализация: {fuzzy_output} → {status} ({result:.2f})")
         return result
 
     def defuzzify_ventilation(self, fuzzy_output: Dict[str, float]) -> float:
         """Дефаззификация для вентиляции"""
+        verbose = self.verbosity != VERBOSITY_SILENT
         if not fuzzy_output:
-            print("   Вентиляция: нет активированных правил → ВЫКЛ")
+            if verbose:
+                print("   Вентиляция: нет активированных правил → ВЫКЛ")
             return 0.0
 
-        numerator = 0.0
-        denominator = 0.0
+        if verbose:
+            for term in fuzzy_output:
+                # Проверяем корректность термина
+                if term not in self.ventilation_map:
+                    print(f"   ⚠️  ОШИБКА: неизвестный термин вентиляции '{term}'")
 
-        for term, membership in fuzzy_output.items():
-            # Проверяем корректность термина
-            if term not in self.ventilation_map:
-                print(f"   ⚠️  ОШИБКА: неизвестный термин вентиляции '{term}'")
-                continue
-
-            membership_val = float(membership)
-            crisp_value = self.ventilation_map[term]
-            numerator += crisp_value * membership_val
-            denominator += membership_val
-
-        if denominator == 0:
-            print("   Вентиляция: все термины некорректны → ВЫКЛ")
+        if not any(term in self.ventilation_map for term in fuzzy_output):
+            if verbose:
+                print("   Вентиляция: все термины некорректны → ВЫКЛ")
             return 0.0
 
-        result = numerator / denominator
-        status = "ВЫКЛ" if result < 0.25 else "НИЗКАЯ" if result < 0.5 else "СРЕДНЯЯ" if result < 0.75 else "ВЫСОКАЯ"
-        print(f"   Вентиляция: {fuzzy_output} → {status} ({result:.2f})")
-        return result
\ No newline at end of file
+        result = self._weighted_average(fuzzy_output, self.ventilation_map)
+        if verbose:
+            status = "ВЫКЛ" if result < 0.25 else "НИЗКАЯ" if result < 0.5 else "СРЕДНЯЯ" if result < 0.75 else "ВЫСОКАЯ"
+            print(f"   Вентиляция: {fuzzy_output} → {status} ({result:.2f})")
+        return result
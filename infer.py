@@ -0,0 +1,59 @@
+import argparse
+import json
+import sys
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+
+# Лёгкая точка входа только для вывода: без matplotlib и симулятора.
+# python infer.py 60 90 3 — один запрос; без чисел — строки "дым температура зона" из stdin.
+
+
+def parse_values(line: str):
+    try:
+        values = [float(v) for v in line.replace(',', ' ').split()]
+    except ValueError:
+        values = []
+    if len(values) != 3:
+        raise ValueError(f"ожидалось три числа (дым, температура, зона): {line.strip()!r}")
+    return values
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Нечеткий вывод для системы пожаротушения (без симуляции и графиков)")
+    parser.add_argument('values', nargs='*', type=float, metavar='VALUE', help="дым, температура, зона")
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--rule-set', help="набор правил (по умолчанию основной)")
+    parser.add_argument('--snapshot', help="снимок базы знаний (JSON); создаётся или обновляется при необходимости")
+    parser.add_argument('--compile', action='store_true', help="только создать или обновить снимок")
+    args = parser.parse_args(argv)
+    if args.values and len(args.values) != 3:
+        parser.error("нужны три числа: дым, температура, зона")
+    if args.compile and not args.snapshot:
+        parser.error("--compile требует --snapshot")
+
+    fis = FuzzyInferenceSystem(args.db, auto_reload=False, verbosity=VERBOSITY_SILENT,
+                               rule_set=args.rule_set, snapshot=args.snapshot)
+    if args.compile:
+        print(f"💾 Снимок базы знаний: {args.snapshot} (правил: {fis.kb.n_rules})")
+        return 0
+    if args.values:
+        print(json.dumps(fis.infer(*args.values)))
+        return 0
+
+    status = 0
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            result = fis.infer(*parse_values(line))
+        except ValueError as error:
+            print(f"❌ {error}", file=sys.stderr)
+            status = 1
+            continue
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
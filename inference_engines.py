@@ -0,0 +1,247 @@
+from typing import Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+from fuzzy_system import _trapezoid_rows
+from knowledge_base import OUTPUT_RANGES, OUTPUT_VARIABLES, KnowledgeBase
+
+# Имена механизмов вывода для FuzzyInferenceSystem(engine=...)
+ENGINE_CENTROID = 'centroid'
+ENGINE_SUGENO = 'sugeno'
+
+
+class CentroidEngine:
+    """Мамдани: min-отсечение выходных трапеций, max-агрегация и центр тяжести.
+
+    Функции принадлежности выходных термов (таблица fuzzy_sets, переменные
+    sprinkler/alarm/ventilation) заранее вычисляются на равномерной сетке из
+    resolution точек диапазона выхода, поэтому вызов сводится к нескольким
+    векторным min/max и одному матричному умножению. Погрешность центра
+    тяжести — порядка шага сетки.
+    """
+
+    name = ENGINE_CENTROID
+    aggregation = 'max'  # агрегация степеней истинности правил одного терма для evaluate_point
+
+    def __init__(self, resolution: int = 201, block_size: int = 1024):
+        if resolution < 2:
+            raise ValueError("Сетка выхода должна содержать хотя бы две точки")
+        self.resolution = resolution
+        # Строки обрабатываются блоками: матрица (строки × сетка) не растёт без ограничений
+        self.block_size = block_size
+        self._prepared, self._prepared_kb = None, None
+        self._point, self._point_kb = None, None
+
+    def _prepare(self, kb: KnowledgeBase):
+        """Сетки выходов и значения функций принадлежности термов на них"""
+        if self._prepared_kb is not kb:
+            prepared = []
+            for name, terms in zip(OUTPUT_VARIABLES, kb.action_terms):
+                variable = kb.variables.get(name)
+                if variable is None or not variable.terms:
+                    raise ValueError(f"Для центроидной дефаззификации нужны нечеткие множества выхода "
+                                     f"'{name}' в таблице fuzzy_sets (см. init_database.py)")
+                universe = np.linspace(*OUTPUT_RANGES[name], self.resolution)
+                shapes = []
+                for term in terms:
+                    # Термы без множества не дают вклада, как неизвестные синглтоны
+                    t = variable.index.get(term)
+                    if t is None:
+                        shapes.append(None)
+                        continue
+                    shape = _trapezoid_rows(universe, variable.params[t:t + 1])[0]
+                    # Хранится только носитель терма: min/max считаются лишь на нём
+                    support = np.flatnonzero(shape > 0)
+                    if len(support) == 0:
+                        shapes.append(None)
+                        continue
+                    lo, hi = support[0], support[-1] + 1
+                    shapes.append((lo, hi, shape[lo:hi].copy()))
+                prepared.append((universe, tuple(shapes)))
+            self._prepared, self._prepared_kb = prepared, kb
+        return self._prepared
+
+    def evaluate(self, kb: KnowledgeBase, firing: np.ndarray, plan, inputs: Sequence[np.ndarray]) -> Dict[str, np.ndarray]:
+        prepared = self._prepare(kb)
+        n = firing.shape[1]
+        results = {}
+        for j, name in enumerate(OUTPUT_VARIABLES):
+            rule_order, offsets = plan[j]
+            universe, shapes = prepared[j]
+            result = np.zeros(n)
+            if len(offsets):
+                aggregated = np.maximum.reduceat(firing[rule_order], offsets, axis=0)
+                for start in range(0, n, self.block_size):
+                    stop = min(start + self.block_size, n)
+                    result[start:stop] = self._centroid(aggregated[:, start:stop], universe, shapes)
+            results[name] = result
+        return results
+
+    def _prepare_point(self, kb: KnowledgeBase):
+        """Функции принадлежности всех термов выходов одной матрицей для evaluate_point"""
+        prepared = self._prepare(kb)
+        if self._point_kb is not kb:
+            blocks, universes, outputs = [], [], []
+            for j, (universe, shapes) in enumerate(prepared):
+                if not shapes:
+                    continue
+                block = np.zeros((len(shapes), len(universe)))
+                for k, shape in enumerate(shapes):
+                    if shape is not None:
+                        lo, hi, values = shape
+                        block[k, lo:hi] = values
+                blocks.append(block)
+                universes.append(universe)
+                outputs.append(j)
+            offsets = np.cumsum([0] + [len(block) for block in blocks[:-1]])
+            stacked = np.vstack(blocks) if blocks else np.zeros((0, self.resolution))
+            self._point, self._point_kb = (stacked, offsets, np.array(universes), tuple(outputs)), kb
+        return self._point
+
+    def evaluate_point(self, kb: KnowledgeBase, aggregated: Sequence[Sequence[float]],
+                       inputs: Sequence[float]) -> Dict[str, float]:
+        """Одна точка по максимумам степеней истинности термов (без пакета строк)"""
+        stacked, offsets, universes, outputs = self._prepare_point(kb)
+        results = dict.fromkeys(OUTPUT_VARIABLES, 0.0)
+        if not outputs:
+            return results
+        strengths = np.array([strength for j in outputs for strength in aggregated[j]])
+        surface = np.maximum.reduceat(np.minimum(stacked, strengths[:, None]), offsets, axis=0)
+        areas = surface.sum(axis=1)
+        moments = (surface * universes).sum(axis=1)
+        for j, area, moment in zip(outputs, areas.tolist(), moments.tolist()):
+            if area > 0:
+                results[OUTPUT_VARIABLES[j]] = moment / area
+        return results
+
+    @staticmethod
+    def _centroid(strengths: np.ndarray, universe: np.ndarray, shapes) -> np.ndarray:
+        """Центр тяжести объединения отсечённых термов для блока строк"""
+        rows = strengths.shape[1]
+        surface = np.zeros((rows, len(universe)))
+        clipped = np.empty_like(surface)
+        for strength, shape in zip(strengths, shapes):
+            if shape is None:
+                continue
+            lo, hi, values = shape
+            part = clipped[:, lo:hi]
+            np.minimum(strength[:, None], values[None, :], out=part)
+            np.maximum(surface[:, lo:hi], part, out=surface[:, lo:hi])
+        area = surface.sum(axis=1)
+        moment = surface @ universe
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(area > 0, moment / area, 0.0)
+
+
+class SugenoEngine:
+    """Сугено нулевого или первого порядка.
+
+    coefficients — для каждого выхода и терма заключения либо константа,
+    либо коэффициенты (p0, p_smoke, p_temperature, p_zone) линейной функции
+    z = p0 + p_smoke * smoke + p_temperature * temperature + p_zone * zone.
+    Выход — среднее z по всем правилам, взвешенное их степенями истинности,
+    ограниченное диапазоном выхода. Термы без коэффициентов пропускаются.
+    """
+
+    name = ENGINE_SUGENO
+    aggregation = 'sum'
+
+    def __init__(self, coefficients: Mapping[str, Mapping[str, object]]):
+        self.coefficients = {
+            name: {term: self._linear(value) for term, value in coefficients.get(name, {}).items()}
+            for name in OUTPUT_VARIABLES
+        }
+        self._prepared, self._prepared_kb = None, None
+
+    @staticmethod
+    def _linear(value) -> np.ndarray:
+        coefficients = np.zeros(4)
+        values = np.atleast_1d(np.asarray(value, dtype=float))
+        if values.shape[0] not in (1, 4):
+            raise ValueError("Коэффициенты Сугено: константа или (p0, p_smoke, p_temperature, p_zone)")
+        coefficients[:values.shape[0]] = values
+        return coefficients
+
+    @classmethod
+    def zero_order(cls, crisp_maps: Mapping[str, Mapping[str, float]]) -> 'SugenoEngine':
+        """Сугено нулевого порядка с константами из словарей синглтонов"""
+        return cls({name: dict(crisp_maps[name]) for name in OUTPUT_VARIABLES})
+
+    def _prepare(self, kb: KnowledgeBase):
+        if self._prepared_kb is not kb:
+            prepared = []
+            for name, terms in zip(OUTPUT_VARIABLES, kb.action_terms):
+                table = self.coefficients[name]
+                known = np.array([term in table for term in terms], dtype=bool)
+                matrix = np.array([table[term] if term in table else np.zeros(4) for term in terms]).reshape(-1, 4)
+                # Для evaluate_point: (номер терма, p0, p_smoke, p_temperature, p_zone) известных термов
+                rows = tuple((k, *map(float, matrix[k])) for k in np.flatnonzero(known).tolist())
+                prepared.append((known, matrix, rows))
+            self._prepared, self._prepared_kb = prepared, kb
+        return self._prepared
+
+    def evaluate(self, kb: KnowledgeBase, firing: np.ndarray, plan, inputs: Sequence[np.ndarray]) -> Dict[str, np.ndarray]:
+        prepared = self._prepare(kb)
+        n = firing.shape[1]
+        regressors = np.vstack([np.ones(n), *inputs])  # (4, n)
+        results = {}
+        for j, name in enumerate(OUTPUT_VARIABLES):
+            rule_order, offsets = plan[j]
+            known, matrix, _ = prepared[j]
+            result = np.zeros(n)
+            if known.any():
+                # Сумма степеней истинности правил с одинаковым заключением
+                weights = np.add.reduceat(firing[rule_order], offsets, axis=0)[known]
+                # Нулевые коэффициенты не умножаются: NaN/inf на входе не портят константу
+                coefficients = matrix[known][:, :, None]
+                with np.errstate(invalid='ignore'):
+                    values = np.where(coefficients != 0, coefficients * regressors[None], 0.0).sum(axis=1)
+                numerator = (weights * values).sum(axis=0)
+                denominator = weights.sum(axis=0)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    result = np.where(denominator > 0, numerator / denominator, 0.0)
+                np.clip(result, *OUTPUT_RANGES[name], out=result)
+            results[name] = result
+        return results
+
+    def evaluate_point(self, kb: KnowledgeBase, aggregated: Sequence[Sequence[float]],
+                       inputs: Sequence[float]) -> Dict[str, float]:
+        """Одна точка по суммам степеней истинности термов (без пакета строк)"""
+        prepared = self._prepare(kb)
+        smoke, temperature, zone = inputs
+        results = {}
+        for name, weights, (_, _, rows) in zip(OUTPUT_VARIABLES, aggregated, prepared):
+            result = 0.0
+            if rows:
+                numerator = 0.0
+                denominator = 0.0
+                for k, p0, p_smoke, p_temperature, p_zone in rows:
+                    weight = weights[k]
+                    if weight > 0:
+                        # Как в evaluate: слагаемые с нулевым коэффициентом пропускаются
+                        value = p0
+                        if p_smoke:
+                            value += p_smoke * smoke
+                        if p_temperature:
+                            value += p_temperature * temperature
+                        if p_zone:
+                            value += p_zone * zone
+                        numerator += weight * value
+                        denominator += weight
+                if denominator > 0:
+                    result = numerator / denominator
+                low, high = OUTPUT_RANGES[name]
+                result = min(max(result, low), high)
+            results[name] = result
+        return results
+
+
+def create_engine(name: str, crisp_maps: Optional[Mapping[str, Mapping[str, float]]] = None):
+    """Механизм вывода по имени; для Сугено — нулевого порядка по словарям синглтонов"""
+    if name == ENGINE_CENTROID:
+        return CentroidEngine()
+    if name == ENGINE_SUGENO:
+        if crisp_maps is None:
+            raise ValueError("Для Сугено нулевого порядка нужны значения синглтонов")
+        return SugenoEngine.zero_order(crisp_maps)
+    raise ValueError(f"Неизвестный механизм вывода: {name!r}")
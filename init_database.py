@@ -1,36 +1,9 @@
-import sqlite3
+from kb_store import (DEFAULT_RULE_SET, connect, create_schema, ensure_rule_set, legacy_rule, upsert_fuzzy_sets,
+                      upsert_rules)
 
-def init_database():
-    conn = sqlite3.connect('knowledge_base.db')
-    cursor = conn.cursor()
-
-    # Таблица с нечеткими множествами
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS fuzzy_sets (
-        id INTEGER PRIMARY KEY,
-        variable_name TEXT NOT NULL,
-        set_name TEXT NOT NULL,
-        a REAL, b REAL, c REAL, d REAL
-    )
-    ''')
-
-    # Таблица правил
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS rules (
-        id INTEGER PRIMARY KEY,
-        condition_smoke TEXT,
-        condition_temp TEXT,
-        condition_zone TEXT,
-        action_sprinkler TEXT,
-        action_alarm TEXT,
-        action_ventilation TEXT,
-        priority INTEGER
-    )
-    ''')
-
-    # Очищаем таблицы
-    cursor.execute("DELETE FROM fuzzy_sets")
-    cursor.execute("DELETE FROM rules")
+def init_database(db_path: str = 'knowledge_base.db', rule_set: str = DEFAULT_RULE_SET):
+    conn = connect(db_path)
+    create_schema(conn)
 
     # Нечеткие множества для системы пожаротушения
     smoke_sets = [
@@ -53,8 +26,29 @@ def init_database():
         ('zone', 'danger', 3, 4, 5, 5)
     ]
 
-    cursor.executemany('INSERT INTO fuzzy_sets VALUES (NULL, ?, ?, ?, ?, ?, ?)',
-                       smoke_sets + temp_sets + zone_sets)
+    # Выходные множества на [0, 1] для центроидной дефаззификации
+    # (FuzzyInferenceSystem(engine='centroid')); пики — у значений синглтонов
+    sprinkler_sets = [
+        ('sprinkler', 'off', 0, 0, 0, 0.2),
+        ('sprinkler', 'low', 0.13, 0.28, 0.38, 0.53),
+        ('sprinkler', 'medium', 0.46, 0.61, 0.71, 0.86),
+        ('sprinkler', 'high', 0.8, 0.95, 1, 1)
+    ]
+
+    alarm_sets = [
+        ('alarm', 'off', 0, 0, 0, 0.3),
+        ('alarm', 'warning', 0.2, 0.45, 0.55, 0.8),
+        ('alarm', 'on', 0.7, 1, 1, 1)
+    ]
+
+    ventilation_sets = [
+        ('ventilation', 'off', 0, 0, 0, 0.2),
+        ('ventilation', 'low', 0.13, 0.28, 0.38, 0.53),
+        ('ventilation', 'medium', 0.46, 0.61, 0.71, 0.86),
+        ('ventilation', 'high', 0.8, 0.95, 1, 1)
+    ]
+
+    fuzzy_sets = smoke_sets + temp_sets + zone_sets + sprinkler_sets + alarm_sets + ventilation_sets
 
     # ОБНОВЛЕННЫЕ ПРАВИЛА С КОРРЕКТНЫМИ ТЕРМИНАМИ ВЕНТИЛЯЦИИ
     rules = [
@@ -84,11 +78,12 @@ def init_database():
         ('none', 'warm', None, 'off', 'warning', 'low', 5),
     ]
 
-    cursor.executemany('''
-    INSERT INTO rules VALUES (NULL, ?, ?, ?, ?, ?, ?, ?)
-    ''', rules)
-
-    conn.commit()
+    # Повторный запуск обновляет термы и правила на месте (по имени терма и
+    # номеру правила) одной транзакцией; правила, убранные из списка, удаляются
+    with conn:
+        set_id = ensure_rule_set(conn, rule_set)
+        upsert_fuzzy_sets(conn, set_id, fuzzy_sets)
+        upsert_rules(conn, set_id, [legacy_rule((n, *rule)) for n, rule in enumerate(rules, start=1)], prune=True)
     conn.close()
     print("База данных системы пожаротушения с вентиляцией инициализирована!")
 
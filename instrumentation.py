@@ -0,0 +1,293 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+# Границы корзин гистограмм по умолчанию (секунды): 1 мкс … 10 с, шаг ×~2.15
+DEFAULT_BUCKETS = tuple(round(10 ** (k / 3), 12) for k in range(-18, 4))
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин (как у Prometheus)"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # последняя корзина — +Inf
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхним границам корзин"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> Dict:
+        cumulative, buckets = 0, []
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            buckets.append([bound, cumulative])
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min if self.count else 0.0,
+            'max': self.max if self.count else 0.0,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+class _NullTimer:
+    """Таймер выключенных метрик: ничего не измеряет"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """Счётчики и гистограммы длительностей этапов.
+
+    Компоненты принимают metrics=None (по умолчанию) и тогда не делают
+    ничего, кроме одной проверки на None. Metrics(enabled=False) можно
+    передать заранее и включить позже: пока метрики выключены, count /
+    observe сразу возвращаются, а timer() отдаёт общий пустой таймер.
+    """
+
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: float = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def histogram(self, name: str) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, name: str, value: float):
+        if self.enabled:
+            self.histogram(name).observe(value)
+
+    def timer(self, name: str):
+        """Контекстный менеджер: длительность блока попадает в гистограмму name"""
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self.histogram(name))
+
+    def timed(self, name: Optional[str] = None):
+        """Декоратор: длительность каждого вызова функции"""
+        def decorator(function):
+            metric = name or f'{function.__module__}_{function.__qualname__}_seconds'.replace('.', '_')
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.histogram(metric).observe(time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+
+    def snapshot(self) -> Dict:
+        return {
+            'counters': dict(sorted(self.counters.items())),
+            'histograms': {name: h.as_dict() for name, h in sorted(self.histograms.items())},
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix: str = 'firesystem_') -> str:
+        """Текстовый формат экспозиции Prometheus"""
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'# TYPE {prefix}{name} counter')
+            lines.append(f'{prefix}{name} {value:g}')
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f'# TYPE {prefix}{name} histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}{name}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{prefix}{name}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f'{prefix}{name}_sum {histogram.total!r}')
+            lines.append(f'{prefix}{name}_count {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str):
+        """Запись метрик в файл: .json — JSON, иначе текстовый формат Prometheus"""
+        text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temporary, path)
+
+    def report(self, stream=None):
+        """Краткая таблица этапов для консоли"""
+        stream = stream or sys.stdout
+        stream.write("⏱ ЭТАПЫ (вызовов, среднее, p99, всего):\n")
+        for name, h in sorted(self.histograms.items(), key=lambda item: -item[1].total):
+            stream.write(f"   {name}: {h.count}, {h.total / max(h.count, 1) * 1e6:.1f} мкс, "
+                         f"{h.quantile(0.99) * 1e6:.1f} мкс, {h.total:.4f} с\n")
+        if self.counters:
+            stream.write("🔢 СЧЁТЧИКИ:\n")
+            for name, value in sorted(self.counters.items()):
+                stream.write(f"   {name}: {value:g}\n")
+
+
+@contextmanager
+def profile(path: Optional[str] = None, sort: str = 'cumulative', limit: int = 25, stream=None):
+    """cProfile вокруг блока: статистика в файл path (.prof) или таблица в stream"""
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        else:
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats(sort).print_stats(limit)
+            (stream or sys.stdout).write(buffer.getvalue())
+
+
+class SamplingProfiler:
+    """Статистический профилировщик: снимки стека потока через interval секунд.
+
+    В отличие от cProfile почти не замедляет профилируемый код. Результат —
+    счётчики свёрнутых стеков (формат flamegraph.pl / speedscope).
+    """
+
+    def __init__(self, interval: float = 0.001, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        target = self.thread_id
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> 'SamplingProfiler':
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def top(self, limit: int = 20) -> List[Tuple[str, int]]:
+        """Функции с наибольшим числом снимков на вершине стека"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(limit)
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+@contextmanager
+def sampling(path: Optional[str] = None, interval: float = 0.001):
+    """SamplingProfiler вокруг блока; свёрнутые стеки записываются в path"""
+    profiler = SamplingProfiler(interval)
+    with profiler:
+        yield profiler
+    if path:
+        profiler.write_collapsed(path)
@@ -0,0 +1,317 @@
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from knowledge_base import INPUT_VARIABLES, OUTPUT_VARIABLES
+
+# Набор правил, который загружается, если имя не указано
+DEFAULT_RULE_SET = 'default'
+
+# Нормализованная схема: наборы правил (здание / зона), переменные и термы
+# набора, правила и их условия/заключения (кортеж «правило — переменная — терм»)
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS kb_rule_sets (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    building TEXT,
+    zone TEXT
+);
+CREATE TABLE IF NOT EXISTS kb_variables (
+    id INTEGER PRIMARY KEY,
+    rule_set_id INTEGER NOT NULL REFERENCES kb_rule_sets(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('input', 'output')),
+    UNIQUE (rule_set_id, name)
+);
+CREATE INDEX IF NOT EXISTS kb_variables_by_name ON kb_variables (name);
+CREATE TABLE IF NOT EXISTS kb_terms (
+    id INTEGER PRIMARY KEY,
+    variable_id INTEGER NOT NULL REFERENCES kb_variables(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    a REAL, b REAL, c REAL, d REAL,
+    UNIQUE (variable_id, name)
+);
+CREATE TABLE IF NOT EXISTS kb_rules (
+    id INTEGER PRIMARY KEY,
+    rule_set_id INTEGER NOT NULL REFERENCES kb_rule_sets(id) ON DELETE CASCADE,
+    rule_key INTEGER NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (rule_set_id, rule_key)
+);
+CREATE INDEX IF NOT EXISTS kb_rules_by_priority ON kb_rules (rule_set_id, priority DESC, rule_key);
+CREATE TABLE IF NOT EXISTS kb_clauses (
+    rule_id INTEGER NOT NULL REFERENCES kb_rules(id) ON DELETE CASCADE,
+    variable_id INTEGER NOT NULL REFERENCES kb_variables(id) ON DELETE CASCADE,
+    term TEXT NOT NULL,
+    PRIMARY KEY (rule_id, variable_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS kb_clauses_by_variable ON kb_clauses (variable_id);
+'''
+
+
+def connect(db_path: str, readonly: bool = False) -> sqlite3.Connection:
+    """Соединение с базой знаний.
+
+    Запись идёт в режиме WAL: читатели (FuzzyInferenceSystem) не блокируются
+    на время обновления. readonly=True запрещает изменения и не создаёт файл,
+    если его нет. Используется mode=rw, а не mode=ro: только так последнее
+    соединение при закрытии убирает файлы -wal/-shm.
+    """
+    if readonly:
+        conn = sqlite3.connect(f'{Path(db_path).resolve().as_uri()}?mode=rw', uri=True)
+        conn.execute('PRAGMA query_only=ON')
+        return conn
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    return conn
+
+
+def create_schema(conn: sqlite3.Connection):
+    conn.executescript(SCHEMA)
+
+
+def has_schema(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'kb_rule_sets'").fetchone()
+    return row is not None
+
+
+def _kind(variable: str) -> str:
+    return 'output' if variable in OUTPUT_VARIABLES else 'input'
+
+
+def ensure_rule_set(conn: sqlite3.Connection, name: str = DEFAULT_RULE_SET, building: Optional[str] = None,
+                    zone: Optional[str] = None) -> int:
+    """id набора правил; создаёт или обновляет его описание"""
+    conn.execute('''
+        INSERT INTO kb_rule_sets (name, building, zone) VALUES (?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET building = excluded.building, zone = excluded.zone
+    ''', (name, building, zone))
+    return conn.execute('SELECT id FROM kb_rule_sets WHERE name = ?', (name,)).fetchone()[0]
+
+
+def rule_set_id(conn: sqlite3.Connection, name: str) -> int:
+    row = conn.execute('SELECT id FROM kb_rule_sets WHERE name = ?', (name,)).fetchone()
+    if row is None:
+        raise KeyError(f"Набор правил {name!r} не найден")
+    return row[0]
+
+
+def _variable_ids(conn: sqlite3.Connection, set_id: int, kinds: Mapping[str, str]) -> Dict[str, int]:
+    conn.executemany('INSERT OR IGNORE INTO kb_variables (rule_set_id, name, kind) VALUES (?, ?, ?)',
+                     [(set_id, name, kind) for name, kind in kinds.items()])
+    return dict(conn.execute('SELECT name, id FROM kb_variables WHERE rule_set_id = ?', (set_id,)))
+
+
+def upsert_fuzzy_sets(conn: sqlite3.Connection, set_id: int, fuzzy_sets: Iterable[tuple]):
+    """Добавление или обновление термов: строки (переменная, терм, a, b, c, d)"""
+    fuzzy_sets = list(fuzzy_sets)
+    variable_ids = _variable_ids(conn, set_id, {row[0]: _kind(row[0]) for row in fuzzy_sets})
+    conn.executemany('''
+        INSERT INTO kb_terms (variable_id, name, a, b, c, d) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (variable_id, name) DO UPDATE SET a = excluded.a, b = excluded.b, c = excluded.c, d = excluded.d
+    ''', [(variable_ids[variable], term, a, b, c, d) for variable, term, a, b, c, d in fuzzy_sets])
+
+
+def legacy_rule(row: tuple) -> Dict:
+    """Строка старой таблицы rules → правило в общем виде"""
+    rule_id, *terms, priority = row
+    return {
+        'id': rule_id,
+        'priority': priority,
+        'conditions': {name: term for name, term in zip(INPUT_VARIABLES, terms[:3]) if term},
+        'actions': {name: term for name, term in zip(OUTPUT_VARIABLES, terms[3:6]) if term},
+    }
+
+
+def upsert_rules(conn: sqlite3.Connection, set_id: int, rules: Iterable[Mapping], prune: bool = False):
+    """Добавление или замена правил набора по ключу id.
+
+    Правило: {'id', 'priority', 'conditions': {переменная: терм},
+    'actions': {переменная: терм}}. prune=True удаляет правила набора,
+    которых нет среди переданных.
+    """
+    rules = list(rules)
+    kinds = {}
+    for rule in rules:
+        kinds.update((name, 'input') for name in rule.get('conditions', {}))
+        kinds.update((name, 'output') for name in rule.get('actions', {}))
+    variable_ids = _variable_ids(conn, set_id, kinds)
+
+    conn.executemany('''
+        INSERT INTO kb_rules (rule_set_id, rule_key, priority) VALUES (?, ?, ?)
+        ON CONFLICT (rule_set_id, rule_key) DO UPDATE SET priority = excluded.priority
+    ''', [(set_id, rule['id'], rule.get('priority', 0)) for rule in rules])
+    rule_ids = dict(conn.execute('SELECT rule_key, id FROM kb_rules WHERE rule_set_id = ?', (set_id,)))
+
+    # Условия и заключения обновлённых правил заменяются целиком
+    conn.executemany('DELETE FROM kb_clauses WHERE rule_id = ?', [(rule_ids[rule['id']],) for rule in rules])
+    conn.executemany('INSERT INTO kb_clauses (rule_id, variable_id, term) VALUES (?, ?, ?)', [
+        (rule_ids[rule['id']], variable_ids[name], term)
+        for rule in rules
+        for clauses in (rule.get('conditions', {}), rule.get('actions', {}))
+        for name, term in clauses.items()
+    ])
+
+    if prune:
+        keep = {rule['id'] for rule in rules}
+        stale = [(rule_id,) for key, rule_id in rule_ids.items() if key not in keep]
+        conn.executemany('DELETE FROM kb_rules WHERE id = ?', stale)
+
+
+def delete_rules(conn: sqlite3.Connection, set_id: int, keys: Iterable[int]):
+    conn.executemany('DELETE FROM kb_rules WHERE rule_set_id = ? AND rule_key = ?', [(set_id, key) for key in keys])
+
+
+def read_rule_set(conn: sqlite3.Connection, name: str = DEFAULT_RULE_SET) -> Tuple[List[tuple], List[tuple]]:
+    """Набор правил в формате строк старых таблиц fuzzy_sets и rules (как их читает load_knowledge_base)"""
+    set_id = rule_set_id(conn, name)
+    fuzzy_sets = conn.execute('''
+        SELECT v.name, t.name, t.a, t.b, t.c, t.d
+        FROM kb_terms t JOIN kb_variables v ON v.id = t.variable_id
+        WHERE v.rule_set_id = ?
+        ORDER BY v.id, t.id
+    ''', (set_id,)).fetchall()
+
+    columns = {name: j for j, name in enumerate(INPUT_VARIABLES + OUTPUT_VARIABLES)}
+    rules = []
+    current_id, current = None, None
+    rows = conn.execute('''
+        SELECT r.id, r.rule_key, r.priority, v.name, c.term
+        FROM kb_rules r
+        LEFT JOIN kb_clauses c ON c.rule_id = r.id
+        LEFT JOIN kb_variables v ON v.id = c.variable_id
+        WHERE r.rule_set_id = ?
+        ORDER BY r.priority DESC, r.rule_key
+    ''', (set_id,))
+    for rule_id, rule_key, priority, variable, term in rows:
+        if rule_id != current_id:
+            if current is not None:
+                rules.append(tuple(current))
+            current_id = rule_id
+            current = [rule_key, None, None, None, None, None, None, priority]
+        if variable is None:
+            continue
+        column = columns.get(variable)
+        if column is None:
+            raise ValueError(f"Правило {rule_key} набора {name!r}: переменная {variable!r} "
+                             f"не поддерживается механизмом вывода")
+        current[1 + column] = term
+    if current is not None:
+        rules.append(tuple(current))
+    return fuzzy_sets, rules
+
+
+def import_legacy(conn: sqlite3.Connection, name: str = DEFAULT_RULE_SET) -> int:
+    """Перенос старых таблиц fuzzy_sets и rules в набор правил name"""
+    fuzzy_sets = conn.execute('SELECT variable_name, set_name, a, b, c, d FROM fuzzy_sets ORDER BY id').fetchall()
+    rules = conn.execute('SELECT * FROM rules ORDER BY id').fetchall()
+    with conn:
+        create_schema(conn)
+        set_id = ensure_rule_set(conn, name)
+        upsert_fuzzy_sets(conn, set_id, fuzzy_sets)
+        upsert_rules(conn, set_id, map(legacy_rule, rules), prune=True)
+    return len(rules)
+
+
+def export_json(conn: sqlite3.Connection, name: str = DEFAULT_RULE_SET) -> Dict:
+    """Набор правил в виде словаря для JSON (формат import_json)"""
+    set_id = rule_set_id(conn, name)
+    building, zone = conn.execute('SELECT building, zone FROM kb_rule_sets WHERE id = ?', (set_id,)).fetchone()
+    variables = {}
+    for variable, kind, term, a, b, c, d in conn.execute('''
+        SELECT v.name, v.kind, t.name, t.a, t.b, t.c, t.d
+        FROM kb_variables v LEFT JOIN kb_terms t ON t.variable_id = v.id
+        WHERE v.rule_set_id = ? ORDER BY v.id, t.id
+    ''', (set_id,)):
+        entry = variables.setdefault(variable, {'kind': kind, 'terms': {}})
+        if term is not None:
+            entry['terms'][term] = [a, b, c, d]
+
+    rules = {}
+    for rule_id, rule_key, priority, variable, kind, term in conn.execute('''
+        SELECT r.id, r.rule_key, r.priority, v.name, v.kind, c.term
+        FROM kb_rules r
+        LEFT JOIN kb_clauses c ON c.rule_id = r.id
+        LEFT JOIN kb_variables v ON v.id = c.variable_id
+        WHERE r.rule_set_id = ? ORDER BY r.rule_key
+    ''', (set_id,)):
+        rule = rules.setdefault(rule_id, {'id': rule_key, 'priority': priority, 'conditions': {}, 'actions': {}})
+        if variable is not None:
+            rule['conditions' if kind == 'input' else 'actions'][variable] = term
+    return {'rule_set': {'name': name, 'building': building, 'zone': zone},
+            'variables': variables, 'rules': list(rules.values())}
+
+
+def import_json(conn: sqlite3.Connection, data: Mapping, name: Optional[str] = None, prune: bool = True) -> int:
+    """Загрузка набора правил из словаря export_json одной транзакцией"""
+    info = data.get('rule_set', {})
+    name = name or info.get('name') or DEFAULT_RULE_SET
+    with conn:
+        create_schema(conn)
+        set_id = ensure_rule_set(conn, name, info.get('building'), info.get('zone'))
+        variables = data.get('variables', {})
+        _variable_ids(conn, set_id, {variable: spec.get('kind', _kind(variable))
+                                     for variable, spec in variables.items()})
+        upsert_fuzzy_sets(conn, set_id, [(variable, term, *params)
+                                         for variable, spec in variables.items()
+                                         for term, params in spec.get('terms', {}).items()])
+        upsert_rules(conn, set_id, data.get('rules', []), prune=prune)
+    return len(data.get('rules', []))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Импорт, экспорт и миграция наборов правил базы знаний")
+    parser.add_argument('--db', default='knowledge_base.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="наборы правил и число правил в них")
+    command = commands.add_parser('import-legacy', help="перенос старых таблиц fuzzy_sets/rules")
+    command.add_argument('--rule-set', default=DEFAULT_RULE_SET)
+    command = commands.add_parser('import', help="загрузка набора правил из JSON")
+    command.add_argument('path')
+    command.add_argument('--rule-set')
+    command.add_argument('--keep', action='store_true', help="не удалять правила, которых нет в файле")
+    command = commands.add_parser('export', help="выгрузка набора правил в JSON")
+    command.add_argument('--rule-set', default=DEFAULT_RULE_SET)
+    command.add_argument('--output', help="файл JSON (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+
+    if args.command in ('list', 'export'):
+        conn = connect(args.db, readonly=True)
+    else:
+        conn = connect(args.db)
+    try:
+        started = time.perf_counter()
+        if args.command == 'list':
+            for name, building, zone, count in conn.execute('''
+                SELECT s.name, s.building, s.zone, COUNT(r.id)
+                FROM kb_rule_sets s LEFT JOIN kb_rules r ON r.rule_set_id = s.id
+                GROUP BY s.id ORDER BY s.name
+            '''):
+                print(f"{name}\t{building or '-'}\t{zone or '-'}\t{count}")
+        elif args.command == 'import-legacy':
+            count = import_legacy(conn, args.rule_set)
+            print(f"✅ Перенесено правил: {count} за {time.perf_counter() - started:.2f} с")
+        elif args.command == 'import':
+            with open(args.path, encoding='utf-8') as f:
+                data = json.load(f)
+            count = import_json(conn, data, args.rule_set, prune=not args.keep)
+            print(f"✅ Загружено правил: {count} за {time.perf_counter() - started:.2f} с")
+        else:
+            report = json.dumps(export_json(conn, args.rule_set), ensure_ascii=False, indent=2)
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.write(report)
+            else:
+                sys.stdout.write(report + "\n")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
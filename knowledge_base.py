@@ -0,0 +1,225 @@
+import json
+import os
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Порядок входных и выходных переменных в скомпилированных массивах
+INPUT_VARIABLES = ('smoke', 'temperature', 'zone')
+OUTPUT_VARIABLES = ('sprinkler', 'alarm', 'ventilation')
+# Допустимые диапазоны входов (те же, что проверяет get_user_input)
+INPUT_RANGES = {'smoke': (0.0, 100.0), 'temperature': (0.0, 200.0), 'zone': (0.0, 5.0)}
+# Диапазоны выходов (интенсивность исполнительных устройств)
+OUTPUT_RANGES = {'sprinkler': (0.0, 1.0), 'alarm': (0.0, 1.0), 'ventilation': (0.0, 1.0)}
+# Версия формата снимка базы знаний (save_snapshot / load_snapshot)
+SNAPSHOT_VERSION = 1
+
+
+class FuzzyVariable(NamedTuple):
+    """Лингвистическая переменная: термы и параметры их трапеций"""
+    name: str
+    terms: Tuple[str, ...]
+    params: np.ndarray  # (n_terms, 4): a, b, c, d
+    index: Mapping[str, int]
+    sets: Tuple[Tuple[str, float, float, float, float], ...]  # те же данные для скалярного пути
+
+    @property
+    def unknown_index(self) -> int:
+        """Индекс терма, которого нет в fuzzy_sets (принадлежность всегда 0)"""
+        return len(self.terms)
+
+    @property
+    def any_index(self) -> int:
+        """Индекс «условие не задано» (принадлежность всегда 1)"""
+        return len(self.terms) + 1
+
+
+class KnowledgeBase(NamedTuple):
+    """Неизменяемая скомпилированная база знаний.
+
+    Условия правил закодированы индексами термов входных переменных
+    (см. FuzzyVariable.unknown_index / any_index), заключения — индексами
+    в action_terms, -1 означает отсутствие действия.
+    """
+    variables: Mapping[str, FuzzyVariable]
+    rule_ids: np.ndarray       # (n_rules,)
+    priorities: np.ndarray     # (n_rules,)
+    conditions: np.ndarray     # (n_rules, len(INPUT_VARIABLES))
+    actions: np.ndarray        # (n_rules, len(OUTPUT_VARIABLES))
+    action_terms: Tuple[Tuple[str, ...], ...]
+    rules: Tuple[tuple, ...]   # исходные строки таблицы rules по убыванию приоритета
+    signature: Optional[tuple]
+    # Индекс для скалярного вывода: те же conditions/actions в виде кортежей int
+    # и, для каждой входной переменной и каждого её индекса терма, битовая маска
+    # правил с этим условием (бит r — правило r)
+    rule_conditions: Tuple[Tuple[int, ...], ...] = ()
+    rule_actions: Tuple[Tuple[int, ...], ...] = ()
+    term_rules: Tuple[Tuple[int, ...], ...] = ()
+
+    @property
+    def n_rules(self) -> int:
+        return len(self.rules)
+
+
+def db_signature(db_path: str) -> Optional[tuple]:
+    """Отпечаток файла БД (и WAL-журнала) для обнаружения изменений"""
+    signature = []
+    for path in (db_path, db_path + '-wal'):
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+def compile_knowledge_base(fuzzy_sets, rules, signature: Optional[tuple] = None) -> KnowledgeBase:
+    """Компиляция строк таблиц fuzzy_sets и rules в массивы"""
+    grouped = {}
+    for variable_name, set_name, a, b, c, d in fuzzy_sets:
+        grouped.setdefault(variable_name, []).append((set_name, a, b, c, d))
+
+    variables = {}
+    for name, sets in grouped.items():
+        terms = tuple(s[0] for s in sets)
+        params = np.array([s[1:] for s in sets], dtype=float).reshape(-1, 4)
+        variables[name] = FuzzyVariable(name, terms, _frozen(params),
+                                        MappingProxyType({t: i for i, t in enumerate(terms)}),
+                                        tuple((t,) + tuple(p) for t, p in zip(terms, params.tolist())))
+    for name in INPUT_VARIABLES:
+        if name not in variables:
+            variables[name] = FuzzyVariable(name, (), _frozen(np.zeros((0, 4))),
+                                            MappingProxyType({}), ())
+
+    action_terms = [[] for _ in OUTPUT_VARIABLES]
+    conditions = np.empty((len(rules), len(INPUT_VARIABLES)), dtype=np.intp)
+    actions = np.empty((len(rules), len(OUTPUT_VARIABLES)), dtype=np.intp)
+
+    for r, rule in enumerate(rules):
+        for j, term in enumerate(rule[1:4]):
+            variable = variables[INPUT_VARIABLES[j]]
+            if not term:
+                conditions[r, j] = variable.any_index
+            else:
+                conditions[r, j] = variable.index.get(term, variable.unknown_index)
+        for j, term in enumerate(rule[4:7]):
+            if not term:
+                actions[r, j] = -1
+                continue
+            if term not in action_terms[j]:
+                action_terms[j].append(term)
+            actions[r, j] = action_terms[j].index(term)
+
+    rule_conditions = tuple(map(tuple, conditions.tolist()))
+    term_rules = []
+    for j, name in enumerate(INPUT_VARIABLES):
+        masks = []
+        for t in range(variables[name].any_index + 1):
+            bits = np.packbits(conditions[:, j] == t, bitorder='little')
+            masks.append(int.from_bytes(bits.tobytes(), 'little'))
+        term_rules.append(tuple(masks))
+
+    return KnowledgeBase(
+        variables=MappingProxyType(variables),
+        rule_ids=_frozen(np.array([rule[0] for rule in rules], dtype=np.int64)),
+        priorities=_frozen(np.array([rule[7] for rule in rules], dtype=np.int64)),
+        conditions=_frozen(conditions),
+        actions=_frozen(actions),
+        action_terms=tuple(tuple(terms) for terms in action_terms),
+        rules=tuple(tuple(rule) for rule in rules),
+        signature=signature,
+        rule_conditions=rule_conditions,
+        rule_actions=tuple(map(tuple, actions.tolist())),
+        term_rules=tuple(term_rules),
+    )
+
+
+def load_knowledge_base(db_path: str, rule_set: Optional[str] = None) -> KnowledgeBase:
+    """Однократная загрузка базы знаний из SQLite.
+
+    Если в БД есть нормализованная схема (kb_store.py), читается набор
+    правил rule_set (по умолчанию kb_store.DEFAULT_RULE_SET), иначе —
+    старые таблицы fuzzy_sets и rules. БД открывается только для чтения.
+    """
+    from kb_store import DEFAULT_RULE_SET, connect, has_schema, read_rule_set
+
+    # Отпечаток берётся до чтения: правка во время загрузки вызовет повторную
+    signature = db_signature(db_path)
+    conn = connect(db_path, readonly=True)
+    try:
+        if has_schema(conn):
+            fuzzy_sets, rules = read_rule_set(conn, rule_set or DEFAULT_RULE_SET)
+        elif rule_set is not None:
+            raise KeyError(f"В {db_path} нет наборов правил (старая схема); rule_set={rule_set!r} недоступен")
+        else:
+            cursor = conn.cursor()
+            cursor.execute('SELECT variable_name, set_name, a, b, c, d FROM fuzzy_sets ORDER BY id')
+            fuzzy_sets = cursor.fetchall()
+            cursor.execute('SELECT * FROM rules ORDER BY priority DESC, id')
+            rules = cursor.fetchall()
+    finally:
+        conn.close()
+    return compile_knowledge_base(fuzzy_sets, rules, signature)
+
+
+def save_snapshot(kb: KnowledgeBase, path: str, rule_set: Optional[str] = None):
+    """Снимок базы знаний: строки fuzzy_sets и rules с отпечатком БД в JSON.
+
+    Снимок читается без SQLite; компиляция строк занимает доли миллисекунды.
+    """
+    fuzzy_sets = [(name,) + tuple(row) for name, variable in kb.variables.items() for row in variable.sets]
+    data = {
+        'version': SNAPSHOT_VERSION,
+        'rule_set': rule_set,
+        'signature': kb.signature,
+        'fuzzy_sets': fuzzy_sets,
+        'rules': kb.rules,
+    }
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+def load_snapshot(path: str) -> Tuple[KnowledgeBase, Optional[str]]:
+    """База знаний из снимка и имя её набора правил"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия снимка базы знаний: {data.get('version')!r}")
+    signature = data['signature']
+    if signature is not None:
+        signature = tuple(tuple(part) if part is not None else None for part in signature)
+    return compile_knowledge_base(data['fuzzy_sets'], data['rules'], signature), data['rule_set']
+
+
+def load_knowledge_base_cached(db_path: str, snapshot_path: str, rule_set: Optional[str] = None) -> KnowledgeBase:
+    """База знаний из снимка, если он соответствует файлу БД, иначе из БД с обновлением снимка.
+
+    Если файла БД нет, используется снимок как есть — так короткоживущий
+    процесс может работать с одним лишь снимком.
+    """
+    signature = db_signature(db_path)
+    try:
+        kb, snapshot_rule_set = load_snapshot(snapshot_path)
+    except (OSError, ValueError, KeyError, TypeError):
+        kb, snapshot_rule_set = None, None
+    if kb is not None and snapshot_rule_set == rule_set:
+        if kb.signature == signature:
+            return kb
+        if signature[0] is None:
+            return kb._replace(signature=signature)
+
+    kb = load_knowledge_base(db_path, rule_set)
+    try:
+        save_snapshot(kb, snapshot_path, rule_set)
+    except OSError:
+        pass  # каталог только для чтения: работаем без снимка
+    return kb
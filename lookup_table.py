@@ -0,0 +1,204 @@
+import json
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from fuzzy_system import FuzzyInferenceSystem
+from knowledge_base import INPUT_RANGES, INPUT_VARIABLES, OUTPUT_VARIABLES, db_signature
+
+# Сетка по умолчанию: шаг 1% дыма, 1°C и 0.1 уровня риска
+DEFAULT_SHAPE = (101, 201, 51)
+
+
+def _grid_axes(shape: Tuple[int, int, int], ranges: Tuple[Tuple[float, float], ...]):
+    return [np.linspace(low, high, n) for n, (low, high) in zip(shape, ranges)]
+
+
+def _evaluate_grid(fis: FuzzyInferenceSystem, axes) -> np.ndarray:
+    """Точный вывод во всех узлах сетки → массив (ns, nt, nz, 3)"""
+    smoke, temperature, zone = np.meshgrid(*axes, indexing='ij')
+    outputs = fis.infer_batch(smoke, temperature, zone)
+    return np.stack([outputs[name] for name in OUTPUT_VARIABLES], axis=-1)
+
+
+class LookupTableController:
+    """Поверхность управления, заранее вычисленная на сетке.
+
+    Запросы обслуживаются трилинейной интерполяцией за постоянное время.
+    error_bound — максимальное отклонение от точного infer() по каждому
+    выходу, измеренное на сетке с половинным шагом (узлы, середины рёбер,
+    граней и ячеек). Аналитической оценки нет: там, где перестают
+    срабатывать правила, поверхность разрывна, поэтому оценка эмпирическая.
+
+    Конечные значения вне диапазона обрезаются до границ сетки. NaN и
+    бесконечности передаются точному выводу fallback (как в InferenceCache),
+    а без него вызывают ValueError.
+    """
+
+    def __init__(self, table: np.ndarray, ranges: Tuple[Tuple[float, float], ...] = None,
+                 error_bound: Optional[Dict[str, float]] = None, kb_signature: Optional[tuple] = None,
+                 fallback: Optional[FuzzyInferenceSystem] = None):
+        if table.ndim != 4 or table.shape[-1] != len(OUTPUT_VARIABLES) or min(table.shape[:3]) < 2:
+            raise ValueError(f"Ожидается таблица (ns, nt, nz, {len(OUTPUT_VARIABLES)}) с не менее чем 2 узлами по оси")
+        self.table = table
+        self.ranges = tuple(tuple(map(float, r)) for r in (ranges or [INPUT_RANGES[v] for v in INPUT_VARIABLES]))
+        self.error_bound = error_bound
+        self.kb_signature = kb_signature
+        self.fallback = fallback
+
+        self._low = np.array([r[0] for r in self.ranges])
+        self._high = np.array([r[1] for r in self.ranges])
+        self._last = np.array(table.shape[:3]) - 1
+        self._scale = self._last / (self._high - self._low)
+
+    @classmethod
+    def build(cls, fis: FuzzyInferenceSystem, shape: Tuple[int, int, int] = DEFAULT_SHAPE,
+              estimate_error: bool = True, dtype=np.float32) -> 'LookupTableController':
+        """Построение таблицы по точному выводу fis"""
+        fis.reload_if_changed()
+        ranges = tuple(INPUT_RANGES[v] for v in INPUT_VARIABLES)
+        table = _evaluate_grid(fis, _grid_axes(shape, ranges)).astype(dtype)
+        controller = cls(table, ranges, kb_signature=fis.kb.signature, fallback=fis)
+        if estimate_error:
+            controller.error_bound = controller.measure_error(fis)
+        return controller
+
+    def measure_error(self, fis: FuzzyInferenceSystem) -> Dict[str, float]:
+        """Максимальная ошибка интерполяции на сетке с половинным шагом"""
+        refined = tuple(2 * n - 1 for n in self.table.shape[:3])
+        axes = _grid_axes(refined, self.ranges)
+        errors = np.zeros(len(OUTPUT_VARIABLES))
+        # По одному срезу дыма за раз, чтобы не держать всю сетку в памяти
+        for smoke_value in axes[0]:
+            smoke, temperature, zone = np.meshgrid([smoke_value], axes[1], axes[2], indexing='ij')
+            exact = fis.infer_batch(smoke, temperature, zone)
+            approx = self.infer_batch(smoke, temperature, zone)
+            for j, name in enumerate(OUTPUT_VARIABLES):
+                errors[j] = max(errors[j], float(np.max(np.abs(exact[name] - approx[name]))))
+        return dict(zip(OUTPUT_VARIABLES, errors.tolist()))
+
+    def infer_batch(self, smoke: np.ndarray, temperature: np.ndarray, zone: np.ndarray) -> Dict[str, np.ndarray]:
+        """Трилинейная интерполяция для массивов входов (значения вне диапазона обрезаются)"""
+        inputs = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (smoke, temperature, zone)))
+        shape = inputs[0].shape
+        inputs = [values.ravel() for values in inputs]
+        finite = np.isfinite(inputs[0]) & np.isfinite(inputs[1]) & np.isfinite(inputs[2])
+        invalid = None if finite.all() else np.flatnonzero(~finite)
+        if invalid is not None:
+            if self.fallback is None:
+                raise ValueError("Таблица не обслуживает NaN и бесконечные входы (не задан fallback)")
+            # Нечисловые строки интерполируются в нижнем углу и затем заменяются точным выводом
+            raw = inputs
+            inputs = [np.where(finite, values, low) for values, low in zip(inputs, self._low)]
+
+        index = []
+        frac = []
+        for j, values in enumerate(inputs):
+            position = (np.clip(values, self._low[j], self._high[j]) - self._low[j]) * self._scale[j]
+            i0 = np.minimum(position.astype(np.intp), self._last[j] - 1)
+            index.append(i0)
+            frac.append((position - i0)[:, None])
+
+        (i, j, k), (fx, fy, fz) = index, frac
+        t = self.table
+        c00 = t[i, j, k] * (1 - fz) + t[i, j, k + 1] * fz
+        c01 = t[i, j + 1, k] * (1 - fz) + t[i, j + 1, k + 1] * fz
+        c10 = t[i + 1, j, k] * (1 - fz) + t[i + 1, j, k + 1] * fz
+        c11 = t[i + 1, j + 1, k] * (1 - fz) + t[i + 1, j + 1, k + 1] * fz
+        c0 = c00 * (1 - fy) + c01 * fy
+        c1 = c10 * (1 - fy) + c11 * fy
+        result = c0 * (1 - fx) + c1 * fx
+
+        outputs = {name: result[:, n] for n, name in enumerate(OUTPUT_VARIABLES)}
+        if invalid is not None:
+            exact = self.fallback.infer_batch(*(values[invalid] for values in raw))
+            for name in OUTPUT_VARIABLES:
+                outputs[name] = outputs[name].astype(float)
+                outputs[name][invalid] = exact[name]
+        return {name: values.reshape(shape) for name, values in outputs.items()}
+
+    def infer(self, smoke: float, temperature: float, zone: float) -> Dict[str, float]:
+        """Интерполированное управление для одной точки"""
+        if not (math.isfinite(smoke) and math.isfinite(temperature) and math.isfinite(zone)):
+            if self.fallback is None:
+                raise ValueError("Таблица не обслуживает NaN и бесконечные входы (не задан fallback)")
+            return self.fallback.infer(smoke, temperature, zone)
+        index = []
+        frac = []
+        for j, value in enumerate((smoke, temperature, zone)):
+            low, high = self._low[j], self._high[j]
+            position = (min(max(value, low), high) - low) * self._scale[j]
+            i0 = min(int(position), int(self._last[j]) - 1)
+            index.append(i0)
+            frac.append(float(position - i0))
+
+        (i, j, k), (fx, fy, fz) = index, frac
+        cube = np.asarray(self.table[i:i + 2, j:j + 2, k:k + 2], dtype=float)
+        face = cube[0] * (1 - fx) + cube[1] * fx
+        edge = face[0] * (1 - fy) + face[1] * fy
+        result = edge[0] * (1 - fz) + edge[1] * fz
+        return dict(zip(OUTPUT_VARIABLES, result.tolist()))
+
+    def is_stale(self, db_path: str) -> bool:
+        """Изменилась ли база знаний после построения таблицы"""
+        return self.kb_signature is None or tuple(self.kb_signature) != db_signature(db_path)
+
+    def save(self, path: str):
+        """Сохранение таблицы в .npy и метаданных в соседний .json"""
+        np.save(path, self.table)
+        meta = {
+            'ranges': self.ranges,
+            'shape': list(self.table.shape),
+            'error_bound': self.error_bound,
+            'kb_signature': self.kb_signature,
+        }
+        with open(_meta_path(path), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True,
+             fallback: Optional[FuzzyInferenceSystem] = None) -> 'LookupTableController':
+        """Загрузка таблицы; при mmap=True данные отображаются в память, а не читаются целиком"""
+        table = np.load(_npy_path(path), mmap_mode='r' if mmap else None)
+        with open(_meta_path(path), encoding='utf-8') as f:
+            meta = json.load(f)
+        signature = meta.get('kb_signature')
+        if signature is not None:
+            signature = tuple(tuple(part) if part is not None else None for part in signature)
+        return cls(table, meta['ranges'], meta.get('error_bound'), signature, fallback)
+
+    @classmethod
+    def load_or_build(cls, path: str, fis: FuzzyInferenceSystem, **build_kwargs) -> 'LookupTableController':
+        """Загрузка таблицы, перестроение при изменении knowledge_base.db"""
+        if os.path.exists(_npy_path(path)) and os.path.exists(_meta_path(path)):
+            controller = cls.load(path, fallback=fis)
+            if not controller.is_stale(fis.db_path):
+                return controller
+        controller = cls.build(fis, **build_kwargs)
+        controller.save(path)
+        return cls.load(path, fallback=fis)
+
+
+def _npy_path(path: str) -> str:
+    return path if path.endswith('.npy') else path + '.npy'
+
+
+def _meta_path(path: str) -> str:
+    return _npy_path(path)[:-len('.npy')] + '.json'
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Построение таблицы поверхности управления")
+    parser.add_argument('output', help="файл таблицы (.npy)")
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--shape', type=int, nargs=3, default=DEFAULT_SHAPE, metavar=('SMOKE', 'TEMP', 'ZONE'))
+    args = parser.parse_args()
+
+    lut = LookupTableController.build(FuzzyInferenceSystem(args.db, verbosity='silent'), tuple(args.shape))
+    lut.save(args.output)
+    print(f"Таблица {lut.table.shape} сохранена в {_npy_path(args.output)}")
+    print(f"Максимальная ошибка интерполяции: {lut.error_bound}")
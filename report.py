@@ -0,0 +1,140 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from trajectory_log import is_trajectory_log, read_run
+from visualization import FIELDS, create_figure, decimate_minmax
+
+Trajectory = Union[np.ndarray, str]
+
+
+def load_trajectory(trajectory: Trajectory, run: Optional[int] = None) -> np.ndarray:
+    """Траектория (шаги × FIELDS) из массива, файла .npy или журнала .ftlog (прогон run)"""
+    if isinstance(trajectory, str) and is_trajectory_log(trajectory):
+        trajectory = read_run(trajectory, run)
+    elif isinstance(trajectory, str):
+        trajectory = np.load(trajectory, mmap_mode='r')
+    trajectory = np.asarray(trajectory, dtype=float)
+    if trajectory.ndim != 2 or trajectory.shape[1] != len(FIELDS):
+        raise ValueError(f"Ожидается траектория (шаги, {len(FIELDS)}) со столбцами {FIELDS}")
+    # Строки-заполнители NaN (ансамбли, пакетная симуляция) не рисуются
+    return trajectory[~np.isnan(trajectory[:, 0])]
+
+
+def _offline_figure(title: Optional[str] = None, dpi: int = 100):
+    """Фигура на холсте Agg: не требует дисплея и не трогает состояние pyplot"""
+    fig = Figure(figsize=(15, 8), dpi=dpi)
+    FigureCanvasAgg(fig)
+    fig, axes, lines = create_figure(fig=fig)
+    if title:
+        fig.suptitle(title, fontsize=14, fontweight='bold')
+    return fig, axes, lines
+
+
+def _set_data(axes, lines, trajectory: np.ndarray, stop: int, max_points: int):
+    steps = trajectory[:stop, 0]
+    for j, field in enumerate(FIELDS[1:], start=1):
+        xs, ys = decimate_minmax(steps, trajectory[:stop, j], max_points)
+        lines[field].set_data(xs, ys)
+        lines[field].set_markersize(4 if len(xs) <= 200 else 0)
+
+
+def _set_x_limits(axes, trajectory: np.ndarray):
+    last = trajectory[-1, 0] if len(trajectory) else 1
+    for ax in axes:
+        ax.set_xlim(min(0, trajectory[0, 0]) if len(trajectory) else 0, max(last, 1))
+
+
+def render_png(trajectory: Trajectory, path: str, title: Optional[str] = None,
+               max_points: int = 2000, dpi: int = 100) -> str:
+    """Статичный отчёт: шесть панелей по записанной траектории"""
+    trajectory = load_trajectory(trajectory)
+    fig, axes, lines = _offline_figure(title, dpi)
+    _set_data(axes, lines, trajectory, len(trajectory), max_points)
+    _set_x_limits(axes, trajectory)
+    fig.savefig(path)
+    return path
+
+
+def render_animation(trajectory: Trajectory, path: str, title: Optional[str] = None, fps: int = 10,
+                     max_frames: int = 120, max_points: int = 2000, dpi: int = 72) -> str:
+    """Анимация прогона: .mp4 (нужен ffmpeg), .gif или .html (JavaScript-плеер)"""
+    from matplotlib import animation
+
+    trajectory = load_trajectory(trajectory)
+    fig, axes, lines = _offline_figure(title, dpi)
+    _set_x_limits(axes, trajectory)
+    # Длинный прогон показывается не более чем за max_frames кадров
+    frame_ends = np.unique(np.linspace(1, len(trajectory), min(max_frames, len(trajectory))).astype(int))
+
+    def draw(stop):
+        _set_data(axes, lines, trajectory, stop, max_points)
+        return list(lines.values())
+
+    anim = animation.FuncAnimation(fig, draw, frames=frame_ends, blit=False)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.html':
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(anim.to_jshtml(fps=fps))
+    elif extension == '.gif':
+        anim.save(path, writer=animation.PillowWriter(fps=fps))
+    elif extension == '.mp4':
+        if not animation.FFMpegWriter.isAvailable():
+            raise RuntimeError("Для .mp4 нужен ffmpeg; используйте .gif или .html")
+        anim.save(path, writer=animation.FFMpegWriter(fps=fps))
+    else:
+        raise ValueError(f"Неизвестный формат анимации: {extension!r}")
+    return path
+
+
+def _render_job(job: Tuple[Trajectory, str, Optional[str], Optional[str]]) -> List[str]:
+    trajectory, png_path, animation_path, title = job
+    trajectory = load_trajectory(trajectory)
+    written = [render_png(trajectory, png_path, title)]
+    if animation_path:
+        written.append(render_animation(trajectory, animation_path, title))
+    return written
+
+
+def render_runs(jobs: Sequence[Tuple[Trajectory, str, Optional[str], Optional[str]]],
+                workers: Optional[int] = None) -> List[str]:
+    """Параллельный рендеринг многих прогонов.
+
+    jobs — кортежи (траектория или путь к .npy, путь к PNG, путь к анимации
+    или None, заголовок или None). Траектории лучше передавать путями:
+    рабочие процессы читают их сами, без копирования через pickle.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        results = [_render_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_render_job, jobs))
+    return [path for written in results for path in written]
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Отчёты по записанным траекториям симуляции")
+    parser.add_argument('trajectories', nargs='+', help="файлы траекторий .npy или журналы .ftlog")
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--animation', choices=('mp4', 'gif', 'html'), help="дополнительно сохранить анимацию")
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = []
+    for path in args.trajectories:
+        name = os.path.splitext(os.path.basename(path))[0]
+        base = os.path.join(args.output_dir, name)
+        jobs.append((path, base + '.png', f"{base}.{args.animation}" if args.animation else None, name))
+    for path in render_runs(jobs, args.workers):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
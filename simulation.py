@@ -1,6 +1,20 @@
+import argparse
+import json
+import sys
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
 import numpy as np
-from fuzzy_system import FuzzyInferenceSystem
-from visualization import SimulationVisualizer
+from fuzzy_system import VERBOSITY_FULL, VERBOSITY_SILENT, FuzzyInferenceSystem
+
+# Столбцы массива траектории: по строке на шаг симуляции
+TRAJECTORY_FIELDS = ('step', 'smoke', 'temperature', 'zone', 'sprinkler', 'alarm', 'ventilation')
+
+
+class SimulationResult(NamedTuple):
+    """Результат прогона: траектория (шаги × TRAJECTORY_FIELDS) и сводная статистика"""
+    trajectory: np.ndarray
+    summary: Dict[str, float]
 
 def get_user_input():
     """Интерактивный ввод начальных условий"""
@@ -47,20 +61,47 @@ def is_safe_zone(smoke: float, temperature: float, zone: float) -> bool:
     return smoke_safe and temp_safe and zone_safe
 
 class FireSuppressionSimulator:
-    def __init__(self):
-        self.fis = FuzzyInferenceSystem('knowledge_base.db')
-        self.visualizer = SimulationVisualizer()
-
-        # Интерактивный ввод начальных условий
-        self.smoke, self.temperature, self.zone = get_user_input()
+    def __init__(self, initial_conditions: Optional[Tuple[float, float, float]] = None,
+                 seed: Optional[int] = None, headless: bool = False,
+                 db_path: str = 'knowledge_base.db', fis: Optional[FuzzyInferenceSystem] = None,
+                 external_smoke: float = 0.0, external_temp: float = 25.0,
+                 recorder=None, run_id: int = 0, metrics=None):
+        # В режиме headless нет ни окна с графиками, ни ввода с клавиатуры, ни печати
+        self.headless = headless
+        if fis is None:
+            fis = FuzzyInferenceSystem(db_path, verbosity=VERBOSITY_SILENT if headless else VERBOSITY_FULL,
+                                       metrics=metrics)
+        self.fis = fis
+        # Метрики этапов шага (instrumentation.Metrics); None — без измерений
+        self.metrics = metrics
+        self.visualizer = None
+        if not headless:
+            # matplotlib загружается только для окна с графиками
+            from visualization import SimulationVisualizer
+            self.visualizer = SimulationVisualizer()
+        self.rng = np.random.default_rng(seed)
+        # Журнал траекторий (trajectory_log.TrajectoryWriter): каждый шаг дописывается сразу,
+        # при прерывании прогона уже выполненные шаги сбрасываются на диск
+        self.recorder = recorder
+        self.run_id = run_id
+
+        if initial_conditions is None:
+            if headless:
+                raise ValueError("В режиме headless начальные условия задаются явно")
+            # Интерактивный ввод начальных условий
+            initial_conditions = get_user_input()
+        self.smoke, self.temperature, self.zone = (float(v) for v in initial_conditions)
 
         # Внешние условия (имитация)
-        self.external_smoke = 0.0
-        self.external_temp = 25.0
+        self.external_smoke = float(external_smoke)
+        self.external_temp = float(external_temp)
 
         self.step = 0
         self.safe_steps_count = 0
 
+        if headless:
+            return
+
         print("\n" + "=" * 60)
         print("🚒 СИМУЛЯТОР СИСТЕМЫ ПОЖАРОТУШЕНИЯ С ВЕНТИЛЯЦИЕЙ ЗАПУЩЕН!")
         print(f"📊 НАЧАЛЬНЫЕ УСЛОВИЯ: Дым={self.smoke}%, Температура={self.temperature}°C, Зона={self.zone}")
@@ -74,8 +115,8 @@ class FireSuppressionSimulator:
     def update_environment(self):
         """Имитация изменения условий"""
         # Имитация возможного развития пожара
-        self.external_smoke = max(0, min(100, self.external_smoke + np.random.normal(0, 2)))
-        self.external_temp = max(0, min(200, self.external_temp + np.random.normal(0, 1)))
+        self.external_smoke = max(0, min(100, self.external_smoke + self.rng.normal(0, 2)))
+        self.external_temp = max(0, min(200, self.external_temp + self.rng.normal(0, 1)))
 
     def apply_control_actions(self, sprinkler: float, alarm: float, ventilation: float):
         """Улучшенная физическая модель с системой вентиляции"""
@@ -112,67 +153,228 @@ class FireSuppressionSimulator:
 
         self.zone = max(0, min(5, self.zone + risk_increase))
 
-    def run(self, steps=20):
+    def run(self, steps=20) -> SimulationResult:
         """Запуск симуляции"""
-        print("\n📈 ЗАПУСК СИМУЛЯЦИИ...")
-        print("   Графики будут обновляться в реальном времени!")
-        input("   Нажмите Enter чтобы продолжить...")
+        verbose = not self.headless
+        if verbose:
+            print("\n📈 ЗАПУСК СИМУЛЯЦИИ...")
+            print("   Графики будут обновляться в реальном времени!")
+            input("   Нажмите Enter чтобы продолжить...")
+
+        # Этапы шага; с метриками каждый вызов измеряется, без них — прямые вызовы
+        update_environment = self.update_environment
+        infer = self.fis.infer
+        apply_control_actions = self.apply_control_actions
+        visualize = self.visualizer.update if self.visualizer is not None else None
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
+            update_environment = metrics.timed('sim_update_environment_seconds')(update_environment)
+            infer = metrics.timed('sim_infer_seconds')(infer)
+            apply_control_actions = metrics.timed('sim_control_actions_seconds')(apply_control_actions)
+            if visualize is not None:
+                visualize = metrics.timed('sim_visualizer_update_seconds')(visualize)
+
+        trajectory = np.empty((steps * 2, len(TRAJECTORY_FIELDS)))
+        time_to_safe = 0 if is_safe_zone(self.smoke, self.temperature, self.zone) else None
+
+        record = self.recorder.append if self.recorder is not None else None
+        run_id = self.run_id
 
         step = 0
         actual_steps = 0
 
-        while actual_steps < steps and step < steps * 2:
-            step += 1
-
-            if is_safe_zone(self.smoke, self.temperature, self.zone):
-                self.safe_steps_count += 1
-                print(f"\n✅ ШАГ {step}: БЕЗОПАСНАЯ СИТУАЦИЯ")
-                print(f"   Дым: {self.smoke:.1f}%, Температура: {self.temperature:.1f}°C, Зона: {self.zone:.1f}")
-                print("   Система мониторинга активна")
-                print("-" * 40)
-
-                self.visualizer.update(step, self.smoke, self.temperature, self.zone, 0, 0, 0)
-                continue
-
-            actual_steps += 1
-            self.step = step
-
-            print(f"\n🎯 ШАГ {step} (активный шаг {actual_steps}):")
-            print("-" * 40)
-
-            self.update_environment()
-            print(f"🌍 Внешние условия: дым={self.external_smoke:.1f}%, темп={self.external_temp:.1f}°C")
-
-            print(f"🏢 Состояние: дым={self.smoke:.1f}%, темп={self.temperature:.1f}°C, зона={self.zone:.1f}")
-            actions = self.fis.infer(self.smoke, self.temperature, self.zone)
-            sprinkler = actions['sprinkler']
-            alarm = actions['alarm']
-            ventilation = actions['ventilation']
-
-            print(f"🎛 УПРАВЛЕНИЕ: спринклер={sprinkler:.2f}, сигнализация={alarm:.2f}, вентиляция={ventilation:.2f}")
-
-            self.visualizer.update(step, self.smoke, self.temperature, self.zone, sprinkler, alarm, ventilation)
-            self.apply_control_actions(sprinkler, alarm, ventilation)
-
-        # Статистика
-        print("\n" + "=" * 60)
-        print("✅ СИМУЛЯЦИЯ ЗАВЕРШЕНА!")
-        print(f"📊 СТАТИСТИКА:")
-        print(f"   Всего шагов симуляции: {step}")
-        print(f"   Активных шагов пожаротушения: {actual_steps}")
-        print(f"   Шагов в безопасной зоне: {self.safe_steps_count}")
-        print(f"   Финальное состояние: дым={self.smoke:.1f}%, темп={self.temperature:.1f}°C, зона={self.zone:.1f}")
-
-        if is_safe_zone(self.smoke, self.temperature, self.zone):
-            print("🎉 ОПАСНОСТЬ ЛИКВИДИРОВАНА! Система работает нормально.")
-        else:
-            print("⚠️  ТРЕБУЕТСЯ ВМЕШАТЕЛЬСТВО! Ситуация не полностью под контролем.")
-
-        print("   Закройте окно с графиками чтобы выйти...")
-        print("=" * 60)
+        try:
+            while actual_steps < steps and step < steps * 2:
+                step += 1
+
+                if is_safe_zone(self.smoke, self.temperature, self.zone):
+                    self.safe_steps_count += 1
+                    if time_to_safe is None:
+                        time_to_safe = step - 1
+                    if verbose:
+                        print(f"\n✅ ШАГ {step}: БЕЗОПАСНАЯ СИТУАЦИЯ")
+                        print(f"   Дым: {self.smoke:.1f}%, Температура: {self.temperature:.1f}°C, Зона: {self.zone:.1f}")
+                        print("   Система мониторинга активна")
+                        print("-" * 40)
+
+                    trajectory[step - 1] = (step, self.smoke, self.temperature, self.zone, 0, 0, 0)
+                    if record is not None:
+                        record(run_id, step, self.smoke, self.temperature, self.zone, 0, 0, 0)
+                    if visualize is not None:
+                        visualize(step, self.smoke, self.temperature, self.zone, 0, 0, 0)
+                    continue
+
+                actual_steps += 1
+                self.step = step
+
+                if verbose:
+                    print(f"\n🎯 ШАГ {step} (активный шаг {actual_steps}):")
+                    print("-" * 40)
+
+                update_environment()
+                if verbose:
+                    print(f"🌍 Внешние условия: дым={self.external_smoke:.1f}%, темп={self.external_temp:.1f}°C")
+                    print(f"🏢 Состояние: дым={self.smoke:.1f}%, темп={self.temperature:.1f}°C, зона={self.zone:.1f}")
+
+                actions = infer(self.smoke, self.temperature, self.zone)
+                sprinkler = actions['sprinkler']
+                alarm = actions['alarm']
+                ventilation = actions['ventilation']
+
+                if verbose:
+                    print(f"🎛 УПРАВЛЕНИЕ: спринклер={sprinkler:.2f}, сигнализация={alarm:.2f}, вентиляция={ventilation:.2f}")
+
+                trajectory[step - 1] = (step, self.smoke, self.temperature, self.zone, sprinkler, alarm, ventilation)
+                if record is not None:
+                    record(run_id, step, self.smoke, self.temperature, self.zone, sprinkler, alarm, ventilation)
+                if visualize is not None:
+                    visualize(step, self.smoke, self.temperature, self.zone, sprinkler, alarm, ventilation)
+                apply_control_actions(sprinkler, alarm, ventilation)
+        except BaseException:
+            # Прерванный прогон: записанные шаги не должны остаться только в буфере
+            if self.recorder is not None:
+                self.recorder.flush()
+            raise
+
+        final_safe = is_safe_zone(self.smoke, self.temperature, self.zone)
+        if time_to_safe is None and final_safe:
+            time_to_safe = step
+        trajectory = trajectory[:step]
+        if metrics is not None:
+            metrics.observe('sim_run_seconds', time.perf_counter() - started)
+            metrics.count('sim_steps_total', step)
+            metrics.count('sim_active_steps_total', actual_steps)
+        summary = {
+            'total_steps': step,
+            'active_steps': actual_steps,
+            'safe_steps': self.safe_steps_count,
+            'final_smoke': self.smoke,
+            'final_temperature': self.temperature,
+            'final_zone': self.zone,
+            'reached_safe': final_safe,
+            'time_to_safe': time_to_safe,
+            'max_smoke': float(trajectory[:, 1].max()) if step else self.smoke,
+            'max_temperature': float(trajectory[:, 2].max()) if step else self.temperature,
+            'water_used': float(trajectory[:, 4].sum()),
+            'ventilation_used': float(trajectory[:, 6].sum()),
+        }
+
+        if verbose:
+            # Статистика
+            print("\n" + "=" * 60)
+            print("✅ СИМУЛЯЦИЯ ЗАВЕРШЕНА!")
+            print(f"📊 СТАТИСТИКА:")
+            print(f"   Всего шагов симуляции: {step}")
+            print(f"   Активных шагов пожаротушения: {actual_steps}")
+            print(f"   Шагов в безопасной зоне: {self.safe_steps_count}")
+            print(f"   Финальное состояние: дым={self.smoke:.1f}%, темп={self.temperature:.1f}°C, зона={self.zone:.1f}")
+
+            if final_safe:
+                print("🎉 ОПАСНОСТЬ ЛИКВИДИРОВАНА! Система работает нормально.")
+            else:
+                print("⚠️  ТРЕБУЕТСЯ ВМЕШАТЕЛЬСТВО! Ситуация не полностью под контролем.")
+
+            print("   Закройте окно с графиками чтобы выйти...")
+            print("=" * 60)
+
+        if self.visualizer is not None:
+            self.visualizer.show_final()
+
+        return SimulationResult(trajectory, summary)
+
+
+def load_scenario(path: str) -> Dict:
+    """Чтение сценария из JSON: smoke, temperature, zone, steps, seed, external_smoke, external_temp"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_headless(smoke: float, temperature: float, zone: float, steps: int = 15,
+                 seed: Optional[int] = None, db_path: str = 'knowledge_base.db',
+                 external_smoke: float = 0.0, external_temp: float = 25.0,
+                 fis: Optional[FuzzyInferenceSystem] = None, recorder=None, metrics=None) -> SimulationResult:
+    """Один прогон без GUI и stdin"""
+    simulator = FireSuppressionSimulator((smoke, temperature, zone), seed=seed, headless=True,
+                                         db_path=db_path, fis=fis,
+                                         external_smoke=external_smoke, external_temp=external_temp,
+                                         recorder=recorder, metrics=metrics)
+    return simulator.run(steps=steps)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Симулятор системы пожаротушения с вентиляцией")
+    parser.add_argument('--headless', action='store_true', help="без графиков и интерактивного ввода")
+    parser.add_argument('--scenario', help="JSON-файл сценария (аргументы командной строки имеют приоритет)")
+    parser.add_argument('--smoke', type=float)
+    parser.add_argument('--temperature', type=float)
+    parser.add_argument('--zone', type=float)
+    parser.add_argument('--steps', type=int)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--output', help="куда записать сводку в JSON (по умолчанию stdout)")
+    parser.add_argument('--trajectory', help="куда сохранить траекторию (.npy или журнал .ftlog)")
+    parser.add_argument('--metrics', help="куда выгрузить метрики этапов (.json или текст Prometheus)")
+    parser.add_argument('--profile', help="профиль cProfile прогона (.prof)")
+    args = parser.parse_args(argv)
+
+    metrics = None
+    if args.metrics:
+        from instrumentation import Metrics
+        metrics = Metrics()
+    if args.profile:
+        from instrumentation import profile
+        with profile(args.profile):
+            _run(parser, args, metrics)
+    else:
+        _run(parser, args, metrics)
+    if metrics is not None:
+        metrics.export(args.metrics)
+
+
+def _run(parser, args, metrics):
+    if not args.headless:
+        simulator = FireSuppressionSimulator(db_path=args.db, seed=args.seed, metrics=metrics)
+        simulator.run(steps=args.steps or 15)
+        return
+
+    scenario = load_scenario(args.scenario) if args.scenario else {}
+    for key in ('smoke', 'temperature', 'zone', 'steps', 'seed'):
+        if getattr(args, key) is not None:
+            scenario[key] = getattr(args, key)
+    missing = [key for key in ('smoke', 'temperature', 'zone') if key not in scenario]
+    if missing:
+        parser.error(f"не заданы начальные условия: {', '.join(missing)}")
+
+    # Журнал .ftlog пишется по ходу прогона: при прерывании шаги не теряются
+    recorder = None
+    if args.trajectory and args.trajectory.endswith('.ftlog'):
+        from trajectory_log import TrajectoryWriter
+        recorder = TrajectoryWriter(args.trajectory)
+
+    started = time.perf_counter()
+    try:
+        result = run_headless(scenario['smoke'], scenario['temperature'], scenario['zone'],
+                              steps=scenario.get('steps', 15), seed=scenario.get('seed'), db_path=args.db,
+                              external_smoke=scenario.get('external_smoke', 0.0),
+                              external_temp=scenario.get('external_temp', 25.0),
+                              recorder=recorder, metrics=metrics)
+    finally:
+        if recorder is not None:
+            recorder.close()
+    elapsed = time.perf_counter() - started
+
+    summary = dict(result.summary, elapsed_s=elapsed,
+                   steps_per_s=result.summary['total_steps'] / elapsed if elapsed > 0 else None)
+    if args.trajectory and recorder is None:
+        np.save(args.trajectory, result.trajectory)
+    report = json.dumps({'scenario': scenario, 'summary': summary}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report + "\n")
 
-        self.visualizer.show_final()
 
 if __name__ == "__main__":
-    simulator = FireSuppressionSimulator()
-    simulator.run(steps=15)
\ No newline at end of file
+    main()
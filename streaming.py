@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import inspect
+import os
+import sys
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+
+
+class SensorReading(NamedTuple):
+    """Показания датчиков одной зоны"""
+    zone_id: str
+    smoke: float
+    temperature: float
+    zone: float
+    timestamp: float = 0.0  # time.monotonic() при получении; 0 — проставит конвейер
+
+
+class ActuatorCommand(NamedTuple):
+    """Команда исполнительным устройствам зоны"""
+    zone_id: str
+    sprinkler: float
+    alarm: float
+    ventilation: float
+    latency: float  # секунды от получения показаний до выдачи команды
+
+
+Sink = Callable[[List[ActuatorCommand]], Union[None, Awaitable[None]]]
+
+_END = object()
+
+
+def parse_reading(line: str) -> Optional[SensorReading]:
+    """Строка «zone_id,smoke,temperature,zone»; пустые строки и комментарии пропускаются"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    try:
+        zone_id, smoke, temperature, zone = (part.strip() for part in line.split(','))
+        return SensorReading(zone_id, float(smoke), float(temperature), float(zone), time.monotonic())
+    except ValueError:
+        raise ValueError(f"некорректная строка показаний: {line!r}") from None
+
+
+def report_bad_line(line: str, error: ValueError):
+    """Обработчик нераспознанных строк по умолчанию: сообщение в stderr"""
+    print(f"⚠️ Пропущена строка: {error}", file=sys.stderr)
+
+
+def _parse_or_skip(line: Union[str, bytes], on_error: Callable[[str, ValueError], None]) -> Optional[SensorReading]:
+    """parse_reading, но нераспознанная строка передаётся on_error и пропускается"""
+    if isinstance(line, bytes):
+        try:
+            line = line.decode('utf-8')
+        except UnicodeDecodeError:
+            on_error(line.decode('utf-8', 'replace'), ValueError(f"строка не в кодировке UTF-8: {line!r}"))
+            return None
+    try:
+        return parse_reading(line)
+    except ValueError as error:
+        on_error(line, error)
+        return None
+
+
+async def replay_source(readings: Iterable[Union[SensorReading, str]],
+                        rate: Optional[float] = None,
+                        on_error: Callable[[str, ValueError], None] = report_bad_line) -> AsyncIterator[SensorReading]:
+    """Воспроизведение записанных показаний (для тестов и отладки).
+
+    rate — показаний в секунду; None — с максимальной скоростью. Строки,
+    которые не удалось разобрать, передаются on_error и пропускаются.
+    """
+    interval = 1.0 / rate if rate else 0.0
+    for n, item in enumerate(readings):
+        reading = _parse_or_skip(item, on_error) if isinstance(item, str) else item
+        if reading is None:
+            continue
+        yield reading._replace(timestamp=time.monotonic())
+        if interval:
+            await asyncio.sleep(interval)
+        elif n % 1024 == 1023:
+            # Даём поработать остальным задачам цикла событий
+            await asyncio.sleep(0)
+
+
+async def stream_source(reader: asyncio.StreamReader,
+                        on_error: Callable[[str, ValueError], None] = report_bad_line) -> AsyncIterator[SensorReading]:
+    """Показания из потока строк (сокет, канал)"""
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        reading = _parse_or_skip(line, on_error)
+        if reading is not None:
+            yield reading
+
+
+async def file_tail_source(path: str, poll_interval: float = 0.1, follow: bool = True,
+                           from_start: bool = True,
+                           on_error: Callable[[str, ValueError], None] = report_bad_line) -> AsyncIterator[SensorReading]:
+    """Чтение дописываемого файла, как tail -f"""
+    with open(path, encoding='utf-8') as f:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        pending = ''
+        while True:
+            chunk = f.readline()
+            if chunk:
+                pending += chunk
+                if not pending.endswith('\n'):
+                    continue  # строка ещё дописывается
+                reading = _parse_or_skip(pending, on_error)
+                pending = ''
+                if reading is not None:
+                    yield reading
+            elif follow:
+                await asyncio.sleep(poll_interval)
+            else:
+                if pending:
+                    reading = _parse_or_skip(pending, on_error)
+                    if reading is not None:
+                        yield reading
+                return
+
+
+async def socket_source(host: str, port: int, queue_size: int = 10000,
+                        on_error: Callable[[str, ValueError], None] = report_bad_line) -> AsyncIterator[SensorReading]:
+    """TCP-сервер: показания со всех подключений в одном потоке"""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            async for reading in stream_source(reader, on_error):
+                await queue.put(reading)  # полная очередь притормаживает чтение сокета
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        while True:
+            yield await queue.get()
+
+
+class ControllerPipeline:
+    """Асинхронный контур управления по потоку показаний.
+
+    Показания попадают в ограниченную очередь (полная очередь
+    приостанавливает источник), собираются в пакеты до max_batch штук
+    или до истечения max_delay секунд с момента первого показания пакета
+    и обрабатываются одним вызовом FuzzyInferenceSystem.infer_batch.
+    При coalesce=True из нескольких показаний одной зоны в пакете
+    обрабатывается только последнее.
+    """
+
+    def __init__(self, fis: FuzzyInferenceSystem, max_batch: int = 4096, max_delay: float = 0.01,
+                 queue_size: int = 16384, coalesce: bool = False):
+        self.fis = fis
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue_size = queue_size
+        self.coalesce = coalesce
+        self.batches = 0
+        self.readings = 0
+        self.commands = 0
+        self.max_latency = 0.0
+
+    def process_batch(self, batch: List[SensorReading]) -> List[ActuatorCommand]:
+        """Пакетный вывод для набора показаний"""
+        if self.coalesce:
+            latest: Dict[str, SensorReading] = {}
+            for reading in batch:
+                latest[reading.zone_id] = reading
+            batch = list(latest.values())
+
+        smoke = np.fromiter((r.smoke for r in batch), dtype=float, count=len(batch))
+        temperature = np.fromiter((r.temperature for r in batch), dtype=float, count=len(batch))
+        zone = np.fromiter((r.zone for r in batch), dtype=float, count=len(batch))
+        actions = self.fis.infer_batch(smoke, temperature, zone)
+
+        now = time.monotonic()
+        commands = [
+            ActuatorCommand(reading.zone_id, sprinkler, alarm, ventilation, now - reading.timestamp)
+            for reading, sprinkler, alarm, ventilation in zip(
+                batch, actions['sprinkler'].tolist(), actions['alarm'].tolist(), actions['ventilation'].tolist())
+        ]
+        if commands:
+            self.max_latency = max(self.max_latency, max(command.latency for command in commands))
+        self.batches += 1
+        self.commands += len(commands)
+        return commands
+
+    async def _collect(self, queue: asyncio.Queue) -> Optional[List[SensorReading]]:
+        """Следующий пакет; None — источник исчерпан"""
+        first = await queue.get()
+        if first is _END:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is _END:
+                queue.put_nowait(_END)  # сообщаем о завершении следующему вызову
+                break
+            batch.append(item)
+        return batch
+
+    async def run(self, source: AsyncIterator[SensorReading], sink: Sink):
+        """Обработка потока до исчерпания источника; ошибка источника пробрасывается"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def produce():
+            try:
+                async for reading in source:
+                    if not reading.timestamp:
+                        reading = reading._replace(timestamp=time.monotonic())
+                    await queue.put(reading)
+                    self.readings += 1
+            except asyncio.CancelledError:
+                # Потребитель уже остановлен: признак конца не нужен, а при полной
+                # очереди ожидание места в ней никогда бы не завершилось
+                raise
+            except BaseException:
+                await queue.put(_END)
+                raise
+            await queue.put(_END)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                batch = await self._collect(queue)
+                if batch is None:
+                    break
+                result = sink(self.process_batch(batch))
+                if inspect.isawaitable(result):
+                    await result
+        finally:
+            if not producer.done():
+                producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+        if not producer.cancelled() and producer.exception() is not None:
+            raise producer.exception()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'readings': self.readings,
+            'commands': self.commands,
+            'batches': self.batches,
+            'mean_batch': self.commands / self.batches if self.batches else 0.0,
+            'max_latency_s': self.max_latency,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потоковый контур управления по показаниям датчиков")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument('--replay', help="файл показаний «zone_id,smoke,temperature,zone» для воспроизведения")
+    source_group.add_argument('--tail', help="дописываемый файл показаний (как tail -f)")
+    source_group.add_argument('--listen', help="host:port для приёма показаний по TCP")
+    parser.add_argument('--rate', type=float, help="скорость воспроизведения, показаний/с")
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--max-batch', type=int, default=4096)
+    parser.add_argument('--max-delay', type=float, default=0.01)
+    parser.add_argument('--coalesce', action='store_true')
+    args = parser.parse_args(argv)
+
+    skipped = 0
+
+    def skip_line(line: str, error: ValueError):
+        nonlocal skipped
+        skipped += 1
+        report_bad_line(line, error)
+
+    if args.replay:
+        with open(args.replay, encoding='utf-8') as f:
+            lines = f.readlines()
+        source = replay_source(lines, rate=args.rate, on_error=skip_line)
+    elif args.tail:
+        source = file_tail_source(args.tail, on_error=skip_line)
+    else:
+        host, port = args.listen.rsplit(':', 1)
+        source = socket_source(host, int(port), on_error=skip_line)
+
+    pipeline = ControllerPipeline(FuzzyInferenceSystem(args.db, verbosity=VERBOSITY_SILENT),
+                                  max_batch=args.max_batch, max_delay=args.max_delay, coalesce=args.coalesce)
+
+    def write_commands(commands: List[ActuatorCommand]):
+        sys.stdout.write(''.join(f"{c.zone_id},{c.sprinkler:.4f},{c.alarm:.4f},{c.ventilation:.4f}\n"
+                                 for c in commands))
+
+    status = 0
+    try:
+        asyncio.run(pipeline.run(source, write_commands))
+    except KeyboardInterrupt:
+        pass
+    except Exception as error:
+        print(f"❌ Источник показаний завершился с ошибкой: {error!r}", file=sys.stderr)
+        status = 1
+    print({**pipeline.stats(), 'skipped': skipped}, file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from knowledge_base import INPUT_RANGES, INPUT_VARIABLES, OUTPUT_VARIABLES, db_signature
+from lookup_table import DEFAULT_SHAPE
+
+# Файлы результатов в каталоге прогона: поверхность выхода и максимальная
+# степень истинности правил с заключением для этого выхода (0 — ни одно не сработало)
+SURFACE_FILE = '{}.npy'
+ACTIVATION_FILE = '{}_activation.npy'
+META_FILE = 'sweep.json'
+
+# Система нечеткого вывода рабочего процесса
+_worker_fis: Optional[FuzzyInferenceSystem] = None
+
+
+def grid_axes(shape: Tuple[int, int, int] = DEFAULT_SHAPE) -> List[np.ndarray]:
+    """Узлы равномерной сетки по диапазонам входов"""
+    return [np.linspace(*INPUT_RANGES[v], n) for v, n in zip(INPUT_VARIABLES, shape)]
+
+
+def _init_worker(db_path: str, engine: Optional[str]):
+    global _worker_fis
+    _worker_fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT, engine=engine)
+
+
+def _sweep_slab(output_dir: str, shape: Tuple[int, int, int], start: int, stop: int) -> int:
+    """Вывод для срезов дыма [start, stop) с записью прямо в файлы результатов"""
+    axes = grid_axes(shape)
+    smoke, temperature, zone = np.meshgrid(axes[0][start:stop], axes[1], axes[2], indexing='ij')
+    outputs, activation = _worker_fis.infer_activation_batch(smoke, temperature, zone)
+    for name in OUTPUT_VARIABLES:
+        for pattern, values in ((SURFACE_FILE, outputs), (ACTIVATION_FILE, activation)):
+            target = open_memmap(os.path.join(output_dir, pattern.format(name)), mode='r+')
+            target[start:stop] = values[name]
+            target.flush()
+            del target
+    return stop - start
+
+
+def sweep(db_path: str, output_dir: str, shape: Tuple[int, int, int] = DEFAULT_SHAPE,
+          workers: Optional[int] = None, slab_points: int = 1 << 17, engine: Optional[str] = None) -> Dict:
+    """Поверхность управления на сетке shape в каталоге output_dir.
+
+    Сетка делится на срезы по дыму примерно по slab_points узлов; срезы
+    считаются в пуле процессов и записываются в .npy через memmap, поэтому
+    память не зависит от размера сетки.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shape = tuple(int(n) for n in shape)
+    for name in OUTPUT_VARIABLES:
+        for pattern in (SURFACE_FILE, ACTIVATION_FILE):
+            open_memmap(os.path.join(output_dir, pattern.format(name)), mode='w+', dtype=np.float32, shape=shape)
+
+    slab = max(1, slab_points // (shape[1] * shape[2]))
+    slabs = [(start, min(start + slab, shape[0])) for start in range(0, shape[0], slab)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(db_path, engine)
+        for start, stop in slabs:
+            _sweep_slab(output_dir, shape, start, stop)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_path, engine)) as pool:
+            futures = [pool.submit(_sweep_slab, output_dir, shape, start, stop) for start, stop in slabs]
+            for future in futures:
+                future.result()
+
+    meta = {
+        'db_path': os.path.abspath(db_path),
+        'signature': db_signature(db_path),
+        'engine': engine,
+        'shape': list(shape),
+        'ranges': [list(INPUT_RANGES[v]) for v in INPUT_VARIABLES],
+    }
+    with open(os.path.join(output_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+def load_sweep(output_dir: str) -> Tuple[Dict, Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """Метаданные, поверхности и степени активации прогона (memmap только для чтения)"""
+    with open(os.path.join(output_dir, META_FILE), encoding='utf-8') as f:
+        meta = json.load(f)
+    surfaces = {name: np.load(os.path.join(output_dir, SURFACE_FILE.format(name)), mmap_mode='r')
+                for name in OUTPUT_VARIABLES}
+    activation = {name: np.load(os.path.join(output_dir, ACTIVATION_FILE.format(name)), mmap_mode='r')
+                  for name in OUTPUT_VARIABLES}
+    return meta, surfaces, activation
+
+
+def _region(mask_slabs, axes) -> Dict:
+    """Число узлов, доля и охватывающий параллелепипед области, заданной маской по срезам"""
+    count = 0
+    low = np.full(3, np.inf)
+    high = np.full(3, -np.inf)
+    total = 0
+    for start, mask in mask_slabs:
+        total += mask.size
+        if not mask.any():
+            continue
+        count += int(np.count_nonzero(mask))
+        for axis in range(3):
+            hit = np.flatnonzero(mask.any(axis=tuple(a for a in range(3) if a != axis)))
+            offset = start if axis == 0 else 0
+            low[axis] = min(low[axis], axes[axis][hit[0] + offset])
+            high[axis] = max(high[axis], axes[axis][hit[-1] + offset])
+    region = {'points': count, 'fraction': count / total if total else 0.0}
+    if count:
+        region['bounds'] = {v: [float(low[a]), float(high[a])] for a, v in enumerate(INPUT_VARIABLES)}
+    return region
+
+
+def _slabs(array: np.ndarray, slab: int):
+    for start in range(0, array.shape[0], slab):
+        yield start, np.asarray(array[start:start + slab])
+
+
+def coverage_gaps(output_dir: str, slab: int = 8) -> Dict[str, Dict]:
+    """Области, где для выхода не срабатывает ни одно правило"""
+    meta, _, activation = load_sweep(output_dir)
+    axes = grid_axes(meta['shape'])
+    gaps = {name: _region(((start, values <= 0) for start, values in _slabs(activation[name], slab)), axes)
+            for name in OUTPUT_VARIABLES}
+    # Узлы, где не срабатывает вообще ни одно правило с заключением
+    combined = ((start, np.all([np.asarray(activation[name][start:start + slab]) <= 0
+                                for name in OUTPUT_VARIABLES], axis=0))
+                for start in range(0, meta['shape'][0], slab))
+    gaps['all'] = _region(combined, axes)
+    return gaps
+
+
+def compare_sweeps(dir_a: str, dir_b: str, threshold: float = 0.05, slab: int = 8,
+                   mask_path: Optional[str] = None) -> Dict[str, Dict]:
+    """Различия поверхностей двух прогонов на одной сетке.
+
+    Для каждого выхода — максимум и среднее |b - a|, место максимума и
+    область, где изменение больше threshold. mask_path — необязательный
+    .npy (uint8), куда пишется маска изменений: бит j — выход j.
+    """
+    meta_a, surfaces_a, _ = load_sweep(dir_a)
+    meta_b, surfaces_b, _ = load_sweep(dir_b)
+    if meta_a['shape'] != meta_b['shape'] or meta_a['ranges'] != meta_b['ranges']:
+        raise ValueError("Прогоны выполнены на разных сетках")
+    shape = tuple(meta_a['shape'])
+    axes = grid_axes(shape)
+    mask = open_memmap(mask_path, mode='w+', dtype=np.uint8, shape=shape) if mask_path else None
+
+    report = {}
+    for j, name in enumerate(OUTPUT_VARIABLES):
+        max_diff, argmax, total = 0.0, None, 0.0
+
+        def changed_slabs():
+            nonlocal max_diff, argmax, total
+            for start in range(0, shape[0], slab):
+                diff = np.abs(np.asarray(surfaces_b[name][start:start + slab], dtype=float) -
+                              np.asarray(surfaces_a[name][start:start + slab], dtype=float))
+                total += float(diff.sum())
+                k = int(np.argmax(diff))
+                if diff.flat[k] > max_diff:
+                    max_diff = float(diff.flat[k])
+                    i, t, z = np.unravel_index(k, diff.shape)
+                    argmax = (axes[0][start + i], axes[1][t], axes[2][z])
+                changed = diff > threshold
+                if mask is not None:
+                    mask[start:start + slab] |= changed.astype(np.uint8) << j
+                yield start, changed
+
+        region = _region(changed_slabs(), axes)
+        report[name] = {
+            'max_diff': max_diff,
+            'mean_diff': total / float(np.prod(shape)),
+            'max_at': dict(zip(INPUT_VARIABLES, map(float, argmax))) if argmax else None,
+            'changed': region,
+        }
+    if mask is not None:
+        mask.flush()
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Перебор поверхности управления и сравнение версий базы знаний")
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--compare', help="вторая версия базы знаний для сравнения")
+    parser.add_argument('--output-dir', default='sweep')
+    parser.add_argument('--shape', type=int, nargs=3, default=DEFAULT_SHAPE, metavar=('NS', 'NT', 'NZ'))
+    parser.add_argument('--threshold', type=float, default=0.05, help="порог изменения выхода")
+    parser.add_argument('--engine', choices=('centroid', 'sugeno'))
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    base_dir = os.path.join(args.output_dir, 'a') if args.compare else args.output_dir
+    sweep(args.db, base_dir, args.shape, args.workers, engine=args.engine)
+    report = {'coverage_gaps': coverage_gaps(base_dir)}
+    if args.compare:
+        other_dir = os.path.join(args.output_dir, 'b')
+        sweep(args.compare, other_dir, args.shape, args.workers, engine=args.engine)
+        report = {
+            'coverage_gaps': {'a': report['coverage_gaps'], 'b': coverage_gaps(other_dir)},
+            'diff': compare_sweeps(base_dir, other_dir, args.threshold,
+                                   mask_path=os.path.join(args.output_dir, 'changed.npy')),
+        }
+
+    sys.stdout.write(json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+    if args.compare and any(d['changed']['points'] for d in report['diff'].values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def db_path() -> str:
+    return os.path.join(ROOT, 'knowledge_base.db')
+
+
+@pytest.fixture
+def db_copy(tmp_path, db_path) -> str:
+    """Копия базы знаний, которую тест может изменять"""
+    import shutil
+
+    path = str(tmp_path / 'knowledge_base.db')
+    shutil.copyfile(db_path, path)
+    return path
@@ -0,0 +1,25 @@
+import numpy as np
+
+from batch_simulation import is_safe_zone_array
+from coupled_simulation import Adjacency, CoupledSimulator
+
+
+def test_time_to_safe_reset_when_neighbour_makes_zone_unsafe(db_path):
+    # Зона 1 безопасна в начале, но получает дым и тепло от горящей зоны 0
+    simulator = CoupledSimulator([90.0, 0.0], [150.0, 25.0], [4.0, 0.0], adjacency=Adjacency.from_edges(2, [0], [1]),
+                                 smoke_exchange=0.5, heat_exchange=0.5, seed=1, db_path=db_path)
+    result = simulator.run(steps=15)
+
+    assert result.active_steps[1] > 0
+    assert result.time_to_safe[1] != 0
+    finite = ~np.isnan(result.time_to_safe)
+    assert is_safe_zone_array(result.smoke, result.temperature, result.zone)[finite].all()
+
+
+def test_diffusion_conserves_total(db_path):
+    adjacency = Adjacency.from_edges(4, [0, 1, 2], [1, 2, 3], [1.0, 0.5, 2.0])
+    simulator = CoupledSimulator(np.array([80.0, 0.0, 10.0, 0.0]), np.full(4, 25.0), np.zeros(4),
+                                 adjacency=adjacency, smoke_exchange=0.2, heat_exchange=0.0, db_path=db_path)
+    total = simulator.smoke.sum()
+    simulator.couple()
+    assert np.isclose(simulator.smoke.sum(), total)
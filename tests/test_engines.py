@@ -0,0 +1,63 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from inference_engines import SugenoEngine
+from knowledge_base import OUTPUT_VARIABLES
+
+FIRST_ORDER = {
+    'sprinkler': {'low': (0.1, 0.003, 0.001, 0.01), 'medium': (0.3, 0.001, 0.0, 0.0), 'high': 1.0},
+    'alarm': {'warning': (0.2, 0.0, 0.002, 0.05), 'on': 1.0},
+    'ventilation': {'low': (0.1, 0.001, 0.001, 0.01), 'high': 0.9},
+}
+
+
+def points() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    regular = rng.uniform([-5, -5, -0.5], [105, 205, 5.5], (2000, 3))
+    on_grid = np.array(list(itertools.product([0, 10, 30, 40, 70, 100], [0, 40, 60, 100, 200], [0, 1, 3, 5])))
+    return np.vstack([regular, on_grid])
+
+
+def non_finite_points() -> np.ndarray:
+    special = [np.nan, np.inf, -np.inf]
+    return np.array([(s, 100.0, 2.0) for s in special] + [(50.0, t, 2.0) for t in special]
+                    + [(50.0, 100.0, z) for z in special] + [(np.nan, np.nan, np.nan)])
+
+
+def make_fis(db_path, engine) -> FuzzyInferenceSystem:
+    return FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT, engine=engine)
+
+
+@pytest.mark.parametrize('engine', ['centroid', 'sugeno', 'first_order'])
+def test_scalar_matches_batch(db_path, engine):
+    fis = make_fis(db_path, SugenoEngine(FIRST_ORDER) if engine == 'first_order' else engine)
+    grid = points()
+    batch = fis.infer_batch(*grid.T)
+    for i, point in enumerate(grid.tolist()):
+        scalar = fis.infer(*point)
+        for name in OUTPUT_VARIABLES:
+            assert scalar[name] == pytest.approx(batch[name][i], abs=1e-12), (point, name)
+
+
+@pytest.mark.parametrize('engine', ['centroid', 'sugeno'])
+def test_non_finite_inputs_give_finite_outputs(db_path, engine):
+    fis = make_fis(db_path, engine)
+    grid = non_finite_points()
+    batch = fis.infer_batch(*grid.T)
+    for i, point in enumerate(grid.tolist()):
+        scalar = fis.infer(*point)
+        for name in OUTPUT_VARIABLES:
+            assert np.isfinite(scalar[name]), (point, name)
+            assert scalar[name] == pytest.approx(batch[name][i], abs=1e-12), (point, name)
+
+
+def test_named_engine_rebuilt_on_reload(db_path):
+    fis = make_fis(db_path, 'sugeno')
+    engine = fis.engine
+    fis.sprinkler_map = {**fis.sprinkler_map, 'low': 0.25}
+    fis.reload()
+    assert fis.engine is not engine
+    assert fis.engine.coefficients['sprinkler']['low'][0] == 0.25
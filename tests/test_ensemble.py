@@ -0,0 +1,21 @@
+import numpy as np
+
+from ensemble import run_ensemble
+from trajectory_log import open_trajectory_log
+
+
+def test_result_does_not_depend_on_worker_count(tmp_path, db_path):
+    runs = {}
+    for workers in (1, 2):
+        log_path = str(tmp_path / f'ensemble{workers}.ftlog')
+        result = run_ensemble(6, (80.0, 120.0, 4.0), steps=8, seed=11, workers=workers, db_path=db_path,
+                              log_path=log_path)
+        runs[workers] = (result, np.array(open_trajectory_log(log_path)))
+
+    (single, single_log), (pooled, pooled_log) = runs[1], runs[2]
+    np.testing.assert_array_equal(single.trajectories, pooled.trajectories)
+    np.testing.assert_array_equal(single.time_to_safe, pooled.time_to_safe)
+    assert single.summary == pooled.summary
+    np.testing.assert_array_equal(single_log, pooled_log)
+    # Каждый прогон получает свой поток случайных чисел
+    assert len({single.trajectories[n, 1].tobytes() for n in range(6)}) == 6
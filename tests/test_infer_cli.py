@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+import kb_store
+import knowledge_base
+from infer import main
+from knowledge_base import db_signature, load_snapshot
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Счётчик чтений базы знаний из SQLite (снимок читается без них)"""
+    calls = []
+    load = knowledge_base.load_knowledge_base
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(knowledge_base, 'load_knowledge_base', counting)
+    return calls
+
+
+def run(capsys, *argv) -> str:
+    assert main(list(argv)) == 0
+    return capsys.readouterr().out
+
+
+def test_snapshot_reused_until_database_changes(tmp_path, capsys, db_copy, loads):
+    snapshot = str(tmp_path / 'kb.json')
+    run(capsys, '--db', db_copy, '--snapshot', snapshot, '--compile')
+    assert len(loads) == 1 and os.path.exists(snapshot)
+    assert load_snapshot(snapshot)[0].signature == db_signature(db_copy)
+
+    before = json.loads(run(capsys, '--db', db_copy, '--snapshot', snapshot, '35', '65', '2'))
+    assert len(loads) == 1
+
+    conn = kb_store.connect(db_copy)
+    with conn:
+        set_id = kb_store.rule_set_id(conn, kb_store.DEFAULT_RULE_SET)
+        kb_store.upsert_fuzzy_sets(conn, set_id, [('smoke', 'low', 10.0, 20.0, 36.0, 45.0)])
+    conn.close()
+
+    after = json.loads(run(capsys, '--db', db_copy, '--snapshot', snapshot, '35', '65', '2'))
+    assert len(loads) == 2
+    assert after != before
+    assert load_snapshot(snapshot)[0].signature == db_signature(db_copy)
+    run(capsys, '--db', db_copy, '--snapshot', snapshot, '35', '65', '2')
+    assert len(loads) == 2
+
+
+def test_snapshot_rebuilt_for_other_rule_set(tmp_path, capsys, db_copy, loads):
+    conn = kb_store.connect(db_copy)
+    data = kb_store.export_json(conn)
+    data['rules'] = data['rules'][:3]
+    kb_store.import_json(conn, data, name='annex')
+    conn.close()
+
+    snapshot = str(tmp_path / 'kb.json')
+    run(capsys, '--db', db_copy, '--snapshot', snapshot, '--compile')
+    out = run(capsys, '--db', db_copy, '--snapshot', snapshot, '--rule-set', 'annex', '--compile')
+    assert len(loads) == 2
+    assert '(правил: 3)' in out
+    assert load_snapshot(snapshot)[1] == 'annex'
+
+
+def test_snapshot_alone_serves_without_database(tmp_path, capsys, db_path, loads):
+    snapshot = str(tmp_path / 'kb.json')
+    expected = run(capsys, '--db', db_path, '--snapshot', snapshot, '80', '120', '4')
+    missing = str(tmp_path / 'missing.db')
+    assert run(capsys, '--db', missing, '--snapshot', snapshot, '80', '120', '4') == expected
+    assert len(loads) == 1
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+import kb_store
+from batch_simulation import BatchSimulator
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem, InferenceCache
+from knowledge_base import INPUT_VARIABLES, OUTPUT_VARIABLES
+from simulation import FireSuppressionSimulator
+
+
+@pytest.fixture
+def fis(db_path) -> FuzzyInferenceSystem:
+    return FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+
+
+def breakpoint_axis(fis: FuzzyInferenceSystem, variable: str) -> np.ndarray:
+    """Точки излома трапеций переменной, соседние с ними числа и середины отрезков между ними"""
+    points = np.unique([p for _, *params in fis.kb.variables[variable].sets for p in params])
+    return np.unique(np.concatenate([
+        points,
+        np.nextafter(points, -np.inf),
+        np.nextafter(points, np.inf),
+        (points[:-1] + points[1:]) / 2,
+    ]))
+
+
+def test_indexed_and_batch_match_full_rule_scan_at_breakpoints(fis):
+    axes = [breakpoint_axis(fis, variable) for variable in INPUT_VARIABLES]
+    grid = [values.ravel() for values in np.meshgrid(*axes, indexing='ij')]
+    batch = fis.infer_batch(*grid)
+
+    mismatches = []
+    for i, point in enumerate(zip(*(values.tolist() for values in grid))):
+        # explain() перебирает все правила, как исходный infer()
+        reference = fis.explain(*point).outputs
+        indexed = fis.infer(*point)
+        batched = {name: float(batch[name][i]) for name in OUTPUT_VARIABLES}
+        if not reference == indexed == batched:
+            mismatches.append((point, reference, indexed, batched))
+    assert not mismatches, mismatches[:5]
+
+
+def test_batch_simulator_reproduces_scalar_trajectory(fis):
+    for initial in [(80.0, 120.0, 4.0), (30.0, 60.0, 2.0), (95.0, 190.0, 5.0), (10.0, 30.0, 0.5)]:
+        scalar = FireSuppressionSimulator(initial, seed=7, headless=True, fis=fis).run(15)
+        batch = BatchSimulator(*([value] for value in initial), seed=7, fis=fis).run(15, record=True)
+        trajectory = batch.trajectory[:, 0, :]
+        trajectory = trajectory[~np.isnan(trajectory[:, 0])]
+        np.testing.assert_array_equal(trajectory, scalar.trajectory)
+
+
+def test_cache_serves_quantized_inputs_from_grid_node(fis, db_path):
+    cache = InferenceCache(resolution=(1.0, 1.0, 0.1))
+    cached = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT, cache=cache)
+
+    first = cached.infer(42.3, 87.6, 2.04)
+    second = cached.infer(41.7, 88.4, 1.96)  # тот же узел (42, 88, 2.0)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    assert first == second == fis.infer(*cache.point(cache.key(42.3, 87.6, 2.04)))
+    cached.infer(43.6, 87.6, 2.04)
+    assert len(cache) == 2
+
+
+def test_cache_evicts_least_recently_used():
+    cache = InferenceCache(maxsize=2)
+    a, b, c = cache.key(10, 20, 1), cache.key(30, 40, 2), cache.key(50, 60, 3)
+    cache.put(a, {'sprinkler': 0.1})
+    cache.put(b, {'sprinkler': 0.2})
+    assert cache.get(a) == {'sprinkler': 0.1}  # a становится самым свежим
+    cache.put(c, {'sprinkler': 0.3})
+
+    assert cache.get(b) is None
+    assert cache.get(a) is not None and cache.get(c) is not None
+    assert cache.evictions == 1
+
+
+def test_cache_cleared_on_knowledge_base_reload(db_copy):
+    cache = InferenceCache()
+    fis = FuzzyInferenceSystem(db_copy, auto_reload=True, verbosity=VERBOSITY_SILENT, cache=cache)
+    before = fis.infer(35.0, 65.0, 2.0)
+    assert len(cache) == 1
+
+    conn = kb_store.connect(db_copy)
+    with conn:
+        set_id = kb_store.rule_set_id(conn, kb_store.DEFAULT_RULE_SET)
+        kb_store.upsert_fuzzy_sets(conn, set_id, [('smoke', 'low', 10.0, 20.0, 36.0, 45.0)])
+    conn.close()
+
+    after = fis.infer(35.0, 65.0, 2.0)
+    assert cache.invalidations == 1
+    assert cache.stats()['hits'] == 0 and len(cache) == 1
+    uncached = FuzzyInferenceSystem(db_copy, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    assert after == uncached.infer(*cache.point(cache.key(35.0, 65.0, 2.0)))
+    assert after != before
+
+
+@pytest.mark.parametrize('point', [(np.nan, 100.0, 2.0), (50.0, np.inf, 2.0), (50.0, 100.0, -np.inf)])
+def test_cache_bypassed_for_non_finite_inputs(fis, db_path, point):
+    cache = InferenceCache()
+    cached = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT, cache=cache)
+
+    assert cache.key(*point) is None
+    assert cached.infer(*point) == fis.infer(*point)
+    assert len(cache) == 0
+    assert cache.stats()['hits'] == cache.stats()['misses'] == 0
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem, InferenceCache
+from instrumentation import Histogram, Metrics
+
+POINTS = [(80.0, 120.0, 4.0), (35.0, 65.0, 2.0), (5.0, 20.0, 0.5), (80.0, 120.0, 4.0), (60.0, 100.0, 3.0)]
+
+
+@pytest.fixture
+def measured(db_path):
+    metrics = Metrics()
+    fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT, cache=InferenceCache(),
+                               metrics=metrics)
+    return fis, metrics
+
+
+def test_counters_after_known_infer_calls(measured, db_path):
+    fis, metrics = measured
+    reference = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    for point in POINTS:
+        assert fis.infer(*point) == reference.infer(*point)
+
+    # В индексированном пути оцениваются только правила-кандидаты, и все они срабатывают
+    fired = sum(len(reference.explain(*point).fired) for point in set(POINTS))
+    assert metrics.counters == {
+        'fis_kb_loads_total': 1,
+        'fis_infer_total': len(POINTS),
+        'fis_cache_hits_total': 1,
+        'fis_cache_misses_total': len(POINTS) - 1,
+        'fis_rules_evaluated_total': fired,
+        'fis_rules_fired_total': fired,
+    }
+    assert metrics.histograms['fis_infer_seconds'].count == len(POINTS)
+
+
+def test_disabled_metrics_record_nothing(db_path):
+    metrics = Metrics(enabled=False)
+    fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT, metrics=metrics)
+    fis.infer(80.0, 120.0, 4.0)
+    fis.infer_batch([80.0, 30.0], [120.0, 60.0], [4.0, 2.0])
+    assert metrics.counters == {} and metrics.histograms == {}
+
+
+def test_json_export(tmp_path, measured):
+    fis, metrics = measured
+    for point in POINTS:
+        fis.infer(*point)
+    path = str(tmp_path / 'metrics.json')
+    metrics.export(path)
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['counters'] == metrics.counters
+    assert list(data['counters']) == sorted(data['counters'])
+    infer = data['histograms']['fis_infer_seconds']
+    assert infer['count'] == len(POINTS)
+    assert infer['min'] <= infer['p50'] <= infer['max']
+    cumulative = [count for _, count in infer['buckets']]
+    assert cumulative == sorted(cumulative) and cumulative[-1] <= len(POINTS)
+
+
+def test_prometheus_export(tmp_path):
+    metrics = Metrics(buckets=(0.001, 0.01, 0.1))
+    metrics.count('requests_total', 3)
+    for value in (0.0005, 0.005, 0.05, 0.5):
+        metrics.observe('stage_seconds', value)
+    path = str(tmp_path / 'metrics.prom')
+    metrics.export(path)
+
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines == [
+        '# TYPE firesystem_requests_total counter',
+        'firesystem_requests_total 3',
+        '# TYPE firesystem_stage_seconds histogram',
+        'firesystem_stage_seconds_bucket{le="0.001"} 1',
+        'firesystem_stage_seconds_bucket{le="0.01"} 2',
+        'firesystem_stage_seconds_bucket{le="0.1"} 3',
+        'firesystem_stage_seconds_bucket{le="+Inf"} 4',
+        f'firesystem_stage_seconds_sum {0.0005 + 0.005 + 0.05 + 0.5!r}',
+        'firesystem_stage_seconds_count 4',
+    ]
+
+
+def test_histogram_quantile_uses_bucket_bounds():
+    histogram = Histogram((1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.25) == 1.0
+    assert histogram.quantile(0.75) == 2.0
+    assert histogram.quantile(1.0) == 3.0  # не выше наибольшего наблюдения
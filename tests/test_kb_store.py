@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+
+import kb_store
+from knowledge_base import db_signature, load_knowledge_base
+
+
+def assert_same_knowledge_base(left, right):
+    """Скомпилированные базы знаний совпадают во всём, кроме отпечатка БД"""
+    assert left.variables.keys() == right.variables.keys()
+    for name, variable in left.variables.items():
+        other = right.variables[name]
+        assert variable.terms == other.terms and variable.sets == other.sets
+        np.testing.assert_array_equal(variable.params, other.params)
+    for field in ('rule_ids', 'priorities', 'conditions', 'actions'):
+        np.testing.assert_array_equal(getattr(left, field), getattr(right, field))
+    for field in ('action_terms', 'rules', 'rule_conditions', 'rule_actions', 'term_rules'):
+        assert getattr(left, field) == getattr(right, field), field
+
+
+def test_export_import_round_trip(tmp_path, db_path):
+    conn = kb_store.connect(db_path, readonly=True)
+    try:
+        exported = kb_store.export_json(conn)
+    finally:
+        conn.close()
+
+    fresh = str(tmp_path / 'fresh.db')
+    conn = kb_store.connect(fresh)
+    try:
+        # Через текст JSON, как в командах export/import
+        count = kb_store.import_json(conn, json.loads(json.dumps(exported, ensure_ascii=False)))
+        assert kb_store.export_json(conn) == exported
+    finally:
+        conn.close()
+
+    assert count == len(exported['rules'])
+    assert_same_knowledge_base(load_knowledge_base(fresh), load_knowledge_base(db_path))
+
+
+def test_import_into_named_rule_set_keeps_default(db_copy):
+    default = load_knowledge_base(db_copy)
+    conn = kb_store.connect(db_copy)
+    try:
+        data = kb_store.export_json(conn)
+        data['rules'] = data['rules'][:3]
+        kb_store.import_json(conn, data, name='annex')
+    finally:
+        conn.close()
+    assert load_knowledge_base(db_copy, 'annex').n_rules == 3
+    assert_same_knowledge_base(load_knowledge_base(db_copy), default)
+
+
+def test_upsert_changes_reload_signature(db_copy):
+    before = db_signature(db_copy)
+    conn = kb_store.connect(db_copy)
+    try:
+        with conn:
+            set_id = kb_store.rule_set_id(conn, kb_store.DEFAULT_RULE_SET)
+            kb_store.upsert_fuzzy_sets(conn, set_id, [('temperature', 'warm', 30.0, 42.0, 60.0, 70.0)])
+        # Изменение видно ещё до закрытия соединения (запись в WAL)
+        assert db_signature(db_copy) != before
+    finally:
+        conn.close()
+    assert db_signature(db_copy) != before
+    assert load_knowledge_base(db_copy).variables['temperature'].sets[1] == ('warm', 30.0, 42.0, 60.0, 70.0)
@@ -0,0 +1,79 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import kb_store
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from knowledge_base import OUTPUT_VARIABLES
+from lookup_table import LookupTableController, _grid_axes
+
+SHAPE = (21, 41, 11)
+
+
+@pytest.fixture
+def fis(db_path) -> FuzzyInferenceSystem:
+    return FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+
+
+@pytest.fixture
+def lut(fis) -> LookupTableController:
+    return LookupTableController.build(fis, SHAPE)
+
+
+def test_error_bound_holds_against_exact_infer(fis, lut):
+    refined = _grid_axes(tuple(2 * n - 1 for n in SHAPE), lut.ranges)
+    # Каждая третья точка сетки с половинным шагом, скалярные пути с обеих сторон
+    for point in itertools.product(*(axis[::3].tolist() for axis in refined)):
+        exact = fis.infer(*point)
+        approx = lut.infer(*point)
+        for name in OUTPUT_VARIABLES:
+            assert abs(exact[name] - approx[name]) <= lut.error_bound[name] + 1e-6, (point, name)
+
+
+def test_nodes_reproduce_exact_values(fis, lut):
+    axes = _grid_axes(SHAPE, lut.ranges)
+    for point in itertools.product(axes[0][::4].tolist(), axes[1][::8].tolist(), axes[2][::2].tolist()):
+        exact = fis.infer(*point)
+        for name, value in lut.infer(*point).items():
+            assert value == pytest.approx(exact[name], abs=1e-6)
+
+
+def test_non_finite_inputs_use_fallback_or_raise(fis, lut):
+    special = [(np.nan, 100.0, 2.0), (50.0, np.inf, 2.0), (50.0, 100.0, -np.inf)]
+    batch = lut.infer_batch(*np.array(special).T)
+    for i, point in enumerate(special):
+        assert lut.infer(*point) == fis.infer(*point)
+        assert {name: float(batch[name][i]) for name in OUTPUT_VARIABLES} == fis.infer(*point)
+
+    lut.fallback = None
+    with pytest.raises(ValueError):
+        lut.infer(np.nan, 100.0, 2.0)
+    with pytest.raises(ValueError):
+        lut.infer_batch([50.0, np.nan], [100.0, 100.0], [2.0, 2.0])
+
+
+def test_save_load_round_trip(tmp_path, lut):
+    path = str(tmp_path / 'surface.npy')
+    lut.save(path)
+    loaded = LookupTableController.load(path)
+
+    np.testing.assert_array_equal(np.asarray(loaded.table), lut.table)
+    assert loaded.ranges == lut.ranges
+    assert loaded.error_bound == lut.error_bound
+    assert loaded.kb_signature == lut.kb_signature
+    point = (42.5, 87.3, 2.2)
+    assert loaded.infer(*point) == lut.infer(*point)
+
+
+def test_is_stale_after_knowledge_base_change(db_copy):
+    fis = FuzzyInferenceSystem(db_copy, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    lut = LookupTableController.build(fis, SHAPE, estimate_error=False)
+    assert not lut.is_stale(db_copy)
+
+    conn = kb_store.connect(db_copy)
+    with conn:
+        set_id = kb_store.rule_set_id(conn, kb_store.DEFAULT_RULE_SET)
+        kb_store.upsert_fuzzy_sets(conn, set_id, [('smoke', 'low', 0.0, 0.0, 12.0, 25.0)])
+    conn.close()
+    assert lut.is_stale(db_copy)
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from streaming import ControllerPipeline, SensorReading, replay_source, stream_source
+
+
+def readings(n: int):
+    return [f"z{i},{i % 100},{20 + i % 150},{i % 5}" for i in range(n)]
+
+
+@pytest.fixture
+def fis(db_path) -> FuzzyInferenceSystem:
+    return FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+
+
+def run(coroutine, timeout: float = 10.0):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout))
+
+
+def test_batches_respect_max_batch(fis):
+    pipeline = ControllerPipeline(fis, max_batch=16, max_delay=0.001)
+    sizes = []
+    run(pipeline.run(replay_source(readings(200)), lambda commands: sizes.append(len(commands))))
+
+    assert sum(sizes) == 200
+    assert max(sizes) <= 16
+    assert pipeline.stats()['readings'] == pipeline.stats()['commands'] == 200
+
+
+def test_full_queue_holds_back_source(fis):
+    pipeline = ControllerPipeline(fis, max_batch=4, max_delay=0.001, queue_size=8)
+    backlog = []
+
+    async def slow_sink(commands):
+        # Непрочитанных показаний не больше ёмкости очереди и одного пакета
+        backlog.append(pipeline.readings - pipeline.commands)
+        await asyncio.sleep(0.001)
+
+    run(pipeline.run(replay_source(readings(100)), slow_sink))
+    assert pipeline.commands == 100
+    assert max(backlog) <= 8 + 1
+
+
+def test_sink_error_propagates_without_hanging(fis):
+    pipeline = ControllerPipeline(fis, max_batch=4, max_delay=0.001, queue_size=8)
+
+    async def failing_sink(commands):
+        await asyncio.sleep(0.01)  # очередь успевает заполниться
+        raise RuntimeError("sink failed")
+
+    with pytest.raises(RuntimeError, match="sink failed"):
+        run(pipeline.run(replay_source(readings(1000)), failing_sink), timeout=5.0)
+
+
+def test_source_error_propagates(fis):
+    async def broken_source():
+        yield SensorReading('z1', 10.0, 30.0, 1.0)
+        raise OSError("source failed")
+
+    pipeline = ControllerPipeline(fis, max_delay=0.001)
+    with pytest.raises(OSError, match="source failed"):
+        run(pipeline.run(broken_source(), lambda commands: None))
+    assert pipeline.commands == 1
+
+
+def test_malformed_lines_are_skipped(fis):
+    lines = readings(10)
+    lines[3] = "z3,abc,1"
+    skipped = []
+    pipeline = ControllerPipeline(fis, max_delay=0.001)
+    run(pipeline.run(replay_source(lines, on_error=lambda line, error: skipped.append(line)), lambda commands: None))
+
+    assert skipped == ["z3,abc,1"]
+    assert pipeline.commands == 9
+
+
+def test_stream_source_skips_non_utf8_lines():
+    async def collect():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"z1,10,30,1\n\xff\xfe,1,2,3\nz2,20,40,2\n")
+        reader.feed_eof()
+        skipped = []
+        zones = [reading.zone_id async for reading in stream_source(reader, lambda line, error: skipped.append(line))]
+        return zones, skipped
+
+    zones, skipped = run(collect())
+    assert zones == ['z1', 'z2']
+    assert len(skipped) == 1
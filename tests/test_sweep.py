@@ -0,0 +1,88 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from knowledge_base import INPUT_RANGES, INPUT_VARIABLES, OUTPUT_VARIABLES
+from sweep import (ACTIVATION_FILE, META_FILE, SURFACE_FILE, compare_sweeps, coverage_gaps, grid_axes, load_sweep,
+                   sweep)
+
+SHAPE = (6, 5, 3)
+
+
+def write_sweep(directory, surfaces, activation):
+    """Каталог прогона с заданными вручную массивами"""
+    os.makedirs(directory)
+    for name in OUTPUT_VARIABLES:
+        np.save(os.path.join(directory, SURFACE_FILE.format(name)), surfaces[name].astype(np.float32))
+        np.save(os.path.join(directory, ACTIVATION_FILE.format(name)), activation[name].astype(np.float32))
+    meta = {'shape': list(SHAPE), 'ranges': [list(INPUT_RANGES[v]) for v in INPUT_VARIABLES]}
+    with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return str(directory)
+
+
+def test_coverage_gaps_on_hand_made_grid(tmp_path):
+    axes = grid_axes(SHAPE)
+    activation = {name: np.ones(SHAPE) for name in OUTPUT_VARIABLES}
+    # Пробел sprinkler пересекает границу срезов (slab=2): дым 1..3, температура 2..3, зона 0
+    activation['sprinkler'][1:4, 2:4, 0] = 0.0
+    activation['alarm'][5, 4, 2] = 0.0
+    activation['ventilation'][1:3, 2:4, 0] = 0.0
+    zeros = {name: np.zeros(SHAPE) for name in OUTPUT_VARIABLES}
+    gaps = coverage_gaps(write_sweep(tmp_path / 'run', zeros, activation), slab=2)
+
+    total = float(np.prod(SHAPE))
+    assert gaps['sprinkler'] == {
+        'points': 6,
+        'fraction': 6 / total,
+        'bounds': {'smoke': [axes[0][1], axes[0][3]], 'temperature': [axes[1][2], axes[1][3]],
+                   'zone': [axes[2][0], axes[2][0]]},
+    }
+    assert gaps['alarm']['points'] == 1
+    assert gaps['alarm']['bounds'] == {'smoke': [100.0, 100.0], 'temperature': [200.0, 200.0], 'zone': [5.0, 5.0]}
+    # Узлы без единого правила — пересечение пробелов всех выходов
+    assert gaps['all'] == {'points': 0, 'fraction': 0.0}
+    activation['alarm'][1, 2, 0] = 0.0
+    gaps = coverage_gaps(write_sweep(tmp_path / 'run2', zeros, activation), slab=2)
+    assert gaps['all']['points'] == 1
+    assert gaps['all']['bounds']['smoke'] == [axes[0][1], axes[0][1]]
+
+
+def test_compare_sweeps_on_hand_made_grid(tmp_path):
+    axes = grid_axes(SHAPE)
+    ones = {name: np.ones(SHAPE) for name in OUTPUT_VARIABLES}
+    base = {name: np.full(SHAPE, 0.5) for name in OUTPUT_VARIABLES}
+    changed = {name: values.copy() for name, values in base.items()}
+    changed['sprinkler'][4, 1, 2] = 0.9
+    changed['sprinkler'][0, 0, 0] = 0.52  # ниже порога
+    changed['alarm'][2:4, :, 1] = 0.25
+    mask_path = str(tmp_path / 'mask.npy')
+    report = compare_sweeps(write_sweep(tmp_path / 'a', base, ones), write_sweep(tmp_path / 'b', changed, ones),
+                            threshold=0.05, slab=2, mask_path=mask_path)
+
+    assert report['sprinkler']['max_diff'] == pytest.approx(0.4)
+    assert report['sprinkler']['max_at'] == {'smoke': axes[0][4], 'temperature': axes[1][1], 'zone': axes[2][2]}
+    assert report['sprinkler']['changed']['points'] == 1
+    assert report['alarm']['changed']['points'] == 10
+    assert report['alarm']['changed']['bounds']['smoke'] == [axes[0][2], axes[0][3]]
+    assert report['ventilation'] == {'max_diff': 0.0, 'mean_diff': 0.0, 'max_at': None,
+                                     'changed': {'points': 0, 'fraction': 0.0}}
+    mask = np.load(mask_path)
+    assert mask[4, 1, 2] == 1 and mask[2, 0, 1] == 2 and mask[0, 0, 0] == 0
+    assert np.count_nonzero(mask) == 11
+
+
+def test_sweep_matches_batch_inference(tmp_path, db_path):
+    # Маленькие срезы: несколько записей в один файл через memmap
+    meta = sweep(db_path, str(tmp_path / 'run'), shape=SHAPE, workers=1, slab_points=SHAPE[1] * SHAPE[2] * 2)
+    _, surfaces, activation = load_sweep(str(tmp_path / 'run'))
+    fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    expected, expected_activation = fis.infer_activation_batch(*np.meshgrid(*grid_axes(SHAPE), indexing='ij'))
+
+    assert meta['shape'] == list(SHAPE)
+    for name in OUTPUT_VARIABLES:
+        np.testing.assert_array_equal(surfaces[name], expected[name].astype(np.float32))
+        np.testing.assert_array_equal(activation[name], expected_activation[name].astype(np.float32))
@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+
+from topology import load_topology, snapshot_path
+
+ONTOLOGY = '''
+@prefix : <http://example.org/fire#> .
+:building1 a :Building ; :hasSensor :smoke1, :smoke2 .
+:smoke1 a :SmokeSensor ; :hasValue {value} ; :locatedIn :hall .
+:smoke2 a :SmokeSensor ; :hasValue 5.0 ; :locatedIn :office .
+:hall :adjacentTo :office .
+'''
+
+
+def write(path, value: float):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(ONTOLOGY.format(value=value))
+
+
+def test_snapshot_invalidated_when_ttl_changes(tmp_path):
+    path = str(tmp_path / 'building.ttl')
+    cache_dir = str(tmp_path / 'cache')
+    write(path, 40.0)
+    first = load_topology(path, cache_dir)
+    assert os.listdir(cache_dir) == [os.path.basename(snapshot_path(path, first.source_hash, cache_dir))]
+
+    cached = load_topology(path, cache_dir)
+    assert cached.source_hash == first.source_hash
+    np.testing.assert_array_equal(cached.sensor_value, [40.0, 5.0])
+    assert list(cached.zones) == list(first.zones) and len(cached.adjacency_from) == 1
+
+    write(path, 75.0)
+    changed = load_topology(path, cache_dir)
+    assert changed.source_hash != first.source_hash
+    np.testing.assert_array_equal(changed.sensor_value, [75.0, 5.0])
+    # Снимок прежней версии файла удалён, остался только новый
+    assert os.listdir(cache_dir) == [os.path.basename(snapshot_path(path, changed.source_hash, cache_dir))]
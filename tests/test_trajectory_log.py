@@ -0,0 +1,59 @@
+import numpy as np
+
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from simulation import TRAJECTORY_FIELDS, main, run_headless
+from trajectory_log import (HEADER_SIZE, RECORD_DTYPE, TrajectoryWriter, is_trajectory_log, open_trajectory_log,
+                            read_run, run_bounds)
+
+
+def trajectory(n: int, offset: float = 0.0) -> np.ndarray:
+    values = np.arange(n * len(TRAJECTORY_FIELDS), dtype=float).reshape(n, -1) / 8 + offset
+    values[:, 0] = np.arange(1, n + 1)
+    return values
+
+
+def test_round_trip_through_memmap(tmp_path):
+    path = str(tmp_path / 'runs.ftlog')
+    first, second = trajectory(5), trajectory(3, offset=100.0)
+    padded = np.vstack([second, np.full((2, len(TRAJECTORY_FIELDS)), np.nan)])
+    # Маленький буфер: записи сбрасываются на диск несколькими блоками
+    with TrajectoryWriter(path, chunk_size=2) as writer:
+        writer.extend(first, run=0)
+        writer.extend(padded, run=1)
+    assert writer.records_written == 8
+
+    records = open_trajectory_log(path)
+    assert is_trajectory_log(path)
+    assert isinstance(records, np.memmap)
+    assert list(run_bounds(records)) == [(0, 0, 5), (1, 5, 8)]
+    np.testing.assert_array_equal(read_run(path), first)
+    np.testing.assert_array_equal(read_run(records, run=1), second)
+
+
+def test_torn_final_record_is_dropped(tmp_path):
+    path = str(tmp_path / 'torn.ftlog')
+    with TrajectoryWriter(path) as writer:
+        writer.extend(trajectory(4))
+    with open(path, 'ab') as f:
+        f.write(b'\x01' * (RECORD_DTYPE.itemsize // 2))
+
+    assert len(open_trajectory_log(path)) == 4
+    np.testing.assert_array_equal(read_run(path), trajectory(4))
+
+    # Дозапись начинается с места оборванной записи
+    with TrajectoryWriter(path, append=True) as writer:
+        writer.append(1, 1, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0)
+    records = open_trajectory_log(path)
+    assert len(records) == 5
+    assert (tmp_path / 'torn.ftlog').stat().st_size == HEADER_SIZE + 5 * RECORD_DTYPE.itemsize
+    np.testing.assert_array_equal(read_run(records, run=1), [[1, 1, 2, 3, 4, 5, 6]])
+
+
+def test_headless_cli_records_every_step(tmp_path, db_path):
+    path = str(tmp_path / 'cli.ftlog')
+    main(['--headless', '--smoke', '80', '--temperature', '120', '--zone', '4', '--steps', '10',
+          '--seed', '3', '--db', db_path, '--trajectory', path, '--output', str(tmp_path / 'summary.json')])
+
+    fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    expected = run_headless(80, 120, 4, steps=10, seed=3, fis=fis).trajectory
+    np.testing.assert_allclose(read_run(path), expected.astype(np.float32))
@@ -0,0 +1,68 @@
+import pytest
+
+from ttl_parser import RDF, RDF_TYPE, RDFS, XSD, Literal, TurtleError, parse_turtle
+
+EX = 'http://example.org/fire#'
+
+
+def test_prefixes_base_and_type_keyword():
+    triples, prefixes = parse_turtle('''
+        @prefix : <http://example.org/fire#> .
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        @base <http://example.org/base/> .
+        :zone1 a :Zone ; rdfs:label "Зал" ; :adjacentTo <zone2>, :zone3 .
+    ''')
+    assert prefixes == {'': EX, 'rdfs': RDFS}
+    assert triples == [
+        (EX + 'zone1', RDF_TYPE, EX + 'Zone'),
+        (EX + 'zone1', RDFS + 'label', Literal('Зал', XSD + 'string')),
+        (EX + 'zone1', EX + 'adjacentTo', 'http://example.org/base/zone2'),
+        (EX + 'zone1', EX + 'adjacentTo', EX + 'zone3'),
+    ]
+
+
+def test_literals():
+    triples, _ = parse_turtle(r'''
+        @prefix : <http://example.org/fire#> .
+        @prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+        :s :int 42 ; :dec -0.5 ; :dbl 1e3 ; :flag true ;
+           :typed "7"^^xsd:integer ; :lang "hall"@en-GB ;
+           :escaped "a\"b\né" ; :long """two
+lines""" .
+    ''')
+    objects = {predicate[len(EX):]: obj for _, predicate, obj in triples}
+    assert objects['int'] == Literal('42', XSD + 'integer') and objects['int'].to_python() == 42
+    assert objects['dec'].to_python() == -0.5
+    assert objects['dbl'] == Literal('1e3', XSD + 'double')
+    assert objects['flag'].to_python() is True
+    assert objects['typed'].to_python() == 7
+    assert objects['lang'] == Literal('hall', None, 'en-GB')
+    assert objects['escaped'].lexical == 'a"b\né'
+    assert objects['long'].lexical == 'two\nlines'
+
+
+def test_blank_nodes_and_collections():
+    triples, _ = parse_turtle('''
+        @prefix : <http://example.org/fire#> .
+        :b :hasSensor [ a :SmokeSensor ; :hasValue 3 ] ; :zones ( :z1 :z2 ) .
+    ''')
+    sensor = next(obj for _, predicate, obj in triples if predicate == EX + 'hasSensor')
+    assert sensor.startswith('_:')
+    assert (sensor, RDF_TYPE, EX + 'SmokeSensor') in triples
+    head = next(obj for _, predicate, obj in triples if predicate == EX + 'zones')
+    rest = next(obj for subject, predicate, obj in triples if subject == head and predicate == RDF + 'rest')
+    assert (head, RDF + 'first', EX + 'z1') in triples
+    assert (rest, RDF + 'first', EX + 'z2') in triples
+    assert (rest, RDF + 'rest', RDF + 'nil') in triples
+
+
+@pytest.mark.parametrize('text, line', [
+    ('@prefix : <http://example.org/#> .\n:a :b :c .\nunknown:x :b :c .', 3),
+    ('@prefix : <http://example.org/#> .\n:a :b .', 2),
+    ('@prefix : <http://example.org/#> .\n:a :b "open', 2),
+    ('@prefix : <http://example.org/#> .\n\n:a :b [ :c :d .', 3),
+    ('@prefix : <http://example.org/#> .\n:a :b :c :d .', 2),
+])
+def test_malformed_input_reports_line(text, line):
+    with pytest.raises(TurtleError, match=f"строка {line}:"):
+        parse_turtle(text)
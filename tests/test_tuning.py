@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import kb_store
+from tuning import fuzzy_set_rows, main, tune
+
+SMALL = dict(scenarios=[(70.0, 110.0, 3.5), (95.0, 190.0, 5.0)], replicates=2, steps=5, seed=1, batch=3,
+             workers=1)
+SMALL_ARGS = ['--iterations', '2', '--replicates', '2', '--steps', '5', '--batch', '3', '--workers', '1']
+
+
+def test_checkpoint_resume_continues_the_same_search(tmp_path, db_path):
+    checkpoint = str(tmp_path / 'search.json')
+    straight = tune(db_path, iterations=4, **SMALL)
+
+    partial = tune(db_path, iterations=2, checkpoint=checkpoint, **SMALL)
+    assert len(partial.history) == 2
+    resumed = tune(db_path, iterations=4, checkpoint=checkpoint, **SMALL)
+
+    assert resumed.best == straight.best
+    assert resumed.cost == straight.cost
+    assert resumed.history == straight.history
+    # Оценки первых итераций берутся из контрольной точки, а не считаются заново
+    assert resumed.evaluations == straight.evaluations
+
+    with pytest.raises(ValueError):
+        tune(db_path, iterations=4, checkpoint=checkpoint, **dict(SMALL, seed=2))
+
+
+def test_apply_writes_tuned_breakpoints(tmp_path, db_path, db_copy):
+    output = str(tmp_path / 'result.json')
+    main(['--db', db_copy, '--no-singletons', '--apply', '--output', output] + SMALL_ARGS)
+
+    with open(output, encoding='utf-8') as f:
+        report = json.load(f)
+    assert report['singletons'] == {}
+    conn = kb_store.connect(db_copy)
+    try:
+        fuzzy_sets, _ = kb_store.read_rule_set(conn)
+    finally:
+        conn.close()
+    stored = {(variable, term): tuple(points) for variable, term, *points in fuzzy_sets}
+    for variable, term, *points in fuzzy_set_rows(db_path, report['breakpoints']):
+        assert stored[variable, term] == pytest.approx(points)
+
+
+def test_apply_refuses_tuned_singletons(db_copy):
+    with open(db_copy, 'rb') as f:
+        before = f.read()
+    with pytest.raises(SystemExit):
+        main(['--db', db_copy, '--apply'] + SMALL_ARGS)
+    with open(db_copy, 'rb') as f:
+        assert f.read() == before
@@ -0,0 +1,349 @@
+import argparse
+import hashlib
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from batch_simulation import BatchResult, BatchSimulator
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from knowledge_base import INPUT_VARIABLES, OUTPUT_VARIABLES
+from ttl_parser import RDF_TYPE, RDFS, Literal, Triple, parse_turtle_file
+
+# Классы и свойства онтологии сопоставляются по локальному имени,
+# поэтому пространство имён файла может быть любым
+SENSOR_CLASSES = {'SmokeSensor': 'smoke', 'TemperatureSensor': 'temperature', 'ZoneSensor': 'zone'}
+ACTUATOR_CLASSES = {'Sprinkler': 'sprinkler', 'Alarm': 'alarm', 'VentilationSystem': 'ventilation'}
+ZONE_CLASS = 'Zone'
+BUILDING_CLASS = 'Building'
+
+# Показания для зоны без датчика соответствующего вида
+DEFAULT_READINGS = {'smoke': 0.0, 'temperature': 25.0, 'zone': 0.0}
+
+# Версия формата снимка: входит в имя файла кэша
+SNAPSHOT_VERSION = 2
+CACHE_DIR = '.topology_cache'
+
+
+def local_name(iri: str) -> str:
+    """Часть IRI после последнего '#' или '/'"""
+    return iri[max(iri.rfind('#'), iri.rfind('/')) + 1:]
+
+
+class Topology(NamedTuple):
+    """Топология здания на массивах: зоны → слоты датчиков → слоты исполнителей.
+
+    Вид датчика — индекс в INPUT_VARIABLES, исполнителя — в OUTPUT_VARIABLES;
+    -1 в *_zone означает, что зону устройства определить не удалось.
+    zone_sensors/zone_actuators — CSR-индексы: устройства зоны z — это
+    zone_sensors[zone_sensor_ptr[z]:zone_sensor_ptr[z + 1]].
+    adjacency_from/adjacency_to — пары соседних зон (adjacentTo) в том виде,
+    как они заданы в файле; граф считается неориентированным.
+    """
+    source_hash: str
+    buildings: np.ndarray
+    zones: np.ndarray
+    zone_labels: np.ndarray
+    zone_building: np.ndarray
+    sensors: np.ndarray
+    sensor_kind: np.ndarray
+    sensor_zone: np.ndarray
+    sensor_value: np.ndarray  # NaN — значение не задано
+    actuators: np.ndarray
+    actuator_kind: np.ndarray
+    actuator_zone: np.ndarray
+    zone_sensor_ptr: np.ndarray
+    zone_sensors: np.ndarray
+    zone_actuator_ptr: np.ndarray
+    zone_actuators: np.ndarray
+    adjacency_from: np.ndarray
+    adjacency_to: np.ndarray
+
+    @property
+    def n_zones(self) -> int:
+        return len(self.zones)
+
+    def sensors_in(self, zone: int) -> np.ndarray:
+        return self.zone_sensors[self.zone_sensor_ptr[zone]:self.zone_sensor_ptr[zone + 1]]
+
+    def actuators_in(self, zone: int) -> np.ndarray:
+        return self.zone_actuators[self.zone_actuator_ptr[zone]:self.zone_actuator_ptr[zone + 1]]
+
+    def zone_inputs(self, sensor_values: Optional[np.ndarray] = None,
+                    defaults: Dict[str, float] = DEFAULT_READINGS) -> List[np.ndarray]:
+        """Входы smoke/temperature/zone для всех зон по показаниям датчиков.
+
+        Если в зоне несколько датчиков одного вида, берётся наибольшее
+        показание (худший случай); пропуски (NaN) игнорируются, зона без
+        показаний получает значение из defaults.
+        """
+        values = self.sensor_value if sensor_values is None else np.asarray(sensor_values, dtype=float)
+        inputs = []
+        for k, name in enumerate(INPUT_VARIABLES):
+            column = np.full(self.n_zones, np.nan)
+            selected = (self.sensor_kind == k) & (self.sensor_zone >= 0)
+            np.fmax.at(column, self.sensor_zone[selected], values[selected])
+            column[np.isnan(column)] = defaults[name]
+            inputs.append(column)
+        return inputs
+
+    def actuator_commands(self, outputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """Команда каждому исполнителю из выходов по зонам (NaN — зона не определена)"""
+        commands = np.full(len(self.actuators), np.nan)
+        for k, name in enumerate(OUTPUT_VARIABLES):
+            selected = (self.actuator_kind == k) & (self.actuator_zone >= 0)
+            commands[selected] = np.asarray(outputs[name])[self.actuator_zone[selected]]
+        return commands
+
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+def _csr(zone_of: np.ndarray, n_zones: int):
+    """Указатели и индексы устройств, сгруппированных по зонам"""
+    assigned = np.flatnonzero(zone_of >= 0)
+    order = assigned[np.argsort(zone_of[assigned], kind='stable')]
+    ptr = np.zeros(n_zones + 1, dtype=np.int64)
+    np.cumsum(np.bincount(zone_of[assigned], minlength=n_zones), out=ptr[1:])
+    return ptr, order.astype(np.int64)
+
+
+def build_topology(triples: Sequence[Triple], source_hash: str = '') -> Topology:
+    """Топология по тройкам онтологии.
+
+    Зона устройства — объект locatedIn. Устройство без locatedIn относится
+    к зоне своего здания (hasSensor/hasActuator), если у здания ровно одна
+    зона — т.е. все размещённые устройства здания находятся в одной зоне.
+    """
+    types: Dict[str, List[str]] = {}
+    parents: Dict[str, List[str]] = {}
+    located: Dict[str, str] = {}
+    values: Dict[str, float] = {}
+    labels: Dict[str, str] = {}
+    owner: Dict[str, str] = {}
+    zone_order: Dict[str, None] = {}
+    adjacent: List[tuple] = []
+    for subject, predicate, obj in triples:
+        if predicate == RDF_TYPE:
+            types.setdefault(subject, []).append(obj)
+            continue
+        if predicate == RDFS + 'subClassOf':
+            parents.setdefault(subject, []).append(obj)
+            continue
+        if predicate == RDFS + 'label':
+            if isinstance(obj, Literal):
+                labels.setdefault(subject, obj.lexical)
+            continue
+        name = local_name(predicate)
+        if name == 'locatedIn' and not isinstance(obj, Literal):
+            located.setdefault(subject, obj)
+            zone_order.setdefault(obj)
+        elif name == 'hasValue' and isinstance(obj, Literal):
+            try:
+                values.setdefault(subject, float(obj.lexical))
+            except ValueError:
+                pass
+        elif name in ('hasSensor', 'hasActuator') and not isinstance(obj, Literal):
+            owner.setdefault(obj, subject)
+        elif name == 'adjacentTo' and not isinstance(obj, Literal):
+            adjacent.append((subject, obj))
+            zone_order.setdefault(subject)
+            zone_order.setdefault(obj)
+
+    ancestors: Dict[str, set] = {}
+
+    def classes_of(cls: str) -> set:
+        """Класс и все его надклассы (rdfs:subClassOf транзитивно)"""
+        if cls not in ancestors:
+            ancestors[cls] = {cls}
+            for parent in parents.get(cls, ()):
+                ancestors[cls] |= classes_of(parent)
+        return ancestors[cls]
+
+    buildings, sensors, actuators = [], [], []
+    sensor_kind, actuator_kind = [], []
+    for subject, subject_types in types.items():
+        names = {local_name(c) for t in subject_types for c in classes_of(t)}
+        if ZONE_CLASS in names:
+            zone_order.setdefault(subject)
+        if BUILDING_CLASS in names:
+            buildings.append(subject)
+        sensor = [kind for cls, kind in SENSOR_CLASSES.items() if cls in names]
+        actuator = [kind for cls, kind in ACTUATOR_CLASSES.items() if cls in names]
+        if sensor:
+            sensors.append(subject)
+            sensor_kind.append(INPUT_VARIABLES.index(sensor[0]))
+        elif actuator:
+            actuators.append(subject)
+            actuator_kind.append(OUTPUT_VARIABLES.index(actuator[0]))
+
+    zones = list(zone_order)
+    zone_index = {zone: z for z, zone in enumerate(zones)}
+    building_index = {building: b for b, building in enumerate(buildings)}
+
+    # Зоны здания — зоны его размещённых устройств
+    building_zones: Dict[str, set] = {}
+    zone_building = np.full(len(zones), -1, dtype=np.int32)
+    for device, zone in located.items():
+        building = owner.get(device)
+        if building is not None and zone in zone_index:
+            building_zones.setdefault(building, set()).add(zone)
+            if building in building_index and zone_building[zone_index[zone]] < 0:
+                zone_building[zone_index[zone]] = building_index[building]
+
+    def zone_of(device: str) -> int:
+        zone = located.get(device)
+        if zone is None:
+            candidates = building_zones.get(owner.get(device), ())
+            if len(candidates) != 1:
+                return -1
+            zone = next(iter(candidates))
+        return zone_index[zone]
+
+    sensor_zone = np.array([zone_of(s) for s in sensors], dtype=np.int32)
+    actuator_zone = np.array([zone_of(a) for a in actuators], dtype=np.int32)
+    sensor_ptr, zone_sensors = _csr(sensor_zone, len(zones))
+    actuator_ptr, zone_actuators = _csr(actuator_zone, len(zones))
+    edges = np.array([(zone_index[a], zone_index[b]) for a, b in adjacent], dtype=np.int32).reshape(-1, 2)
+    return Topology(
+        source_hash=source_hash,
+        buildings=_frozen(np.array(buildings, dtype=str)),
+        zones=_frozen(np.array(zones, dtype=str)),
+        zone_labels=_frozen(np.array([labels.get(z, local_name(z)) for z in zones], dtype=str)),
+        zone_building=_frozen(zone_building),
+        sensors=_frozen(np.array(sensors, dtype=str)),
+        sensor_kind=_frozen(np.array(sensor_kind, dtype=np.int8)),
+        sensor_zone=_frozen(sensor_zone),
+        sensor_value=_frozen(np.array([values.get(s, np.nan) for s in sensors], dtype=float)),
+        actuators=_frozen(np.array(actuators, dtype=str)),
+        actuator_kind=_frozen(np.array(actuator_kind, dtype=np.int8)),
+        actuator_zone=_frozen(actuator_zone),
+        zone_sensor_ptr=_frozen(sensor_ptr),
+        zone_sensors=_frozen(zone_sensors),
+        zone_actuator_ptr=_frozen(actuator_ptr),
+        zone_actuators=_frozen(zone_actuators),
+        adjacency_from=_frozen(edges[:, 0].copy()),
+        adjacency_to=_frozen(edges[:, 1].copy()),
+    )
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_path(path: str, digest: str, cache_dir: Optional[str] = None) -> str:
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f'{stem}.{digest[:16]}.v{SNAPSHOT_VERSION}.npz')
+
+
+def save_snapshot(topology: Topology, path: str):
+    """Запись снимка .npz (без pickle); файл заменяется атомарно"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez(f, **topology._asdict())
+    os.replace(temporary, path)
+
+
+def load_snapshot(path: str) -> Topology:
+    with np.load(path, allow_pickle=False) as data:
+        fields = {name: _frozen(data[name]) for name in Topology._fields}
+    fields['source_hash'] = str(fields['source_hash'])
+    return Topology(**fields)
+
+
+def load_topology(path: str = 'ontology.ttl', cache_dir: Optional[str] = None, use_cache: bool = True) -> Topology:
+    """Топология из файла Turtle.
+
+    Результат разбора кэшируется в двоичный снимок, ключ которого —
+    хеш содержимого файла: пока файл не изменён, повторная загрузка
+    читает только массивы из .npz.
+    """
+    digest = file_digest(path)
+    cached = snapshot_path(path, digest, cache_dir)
+    if use_cache and os.path.exists(cached):
+        try:
+            return load_snapshot(cached)
+        except (OSError, ValueError, KeyError):
+            pass  # повреждённый снимок строится заново
+
+    triples, _ = parse_turtle_file(path)
+    topology = build_topology(triples, digest)
+    if use_cache:
+        # Снимки прежних версий файла больше не нужны
+        prefix = os.path.splitext(os.path.basename(path))[0] + '.'
+        directory = os.path.dirname(cached)
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                # имя снимка: <файл>.<хеш>.v<версия>.npz
+                if name.startswith(prefix) and name.endswith('.npz') and name[len(prefix):].count('.') == 2:
+                    os.remove(os.path.join(directory, name))
+        save_snapshot(topology, cached)
+    return topology
+
+
+def infer_zones(fis: FuzzyInferenceSystem, topology: Topology,
+                sensor_values: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Пакетный вывод сразу для всех зон здания"""
+    return fis.infer_batch(*topology.zone_inputs(sensor_values))
+
+
+def simulate_building(topology: Topology, steps: int = 20, seed=None, fis: Optional[FuzzyInferenceSystem] = None,
+                      db_path: str = 'knowledge_base.db', record: bool = False,
+                      sensor_values: Optional[np.ndarray] = None) -> BatchResult:
+    """Синхронная симуляция всех зон здания из начальных показаний датчиков"""
+    simulator = BatchSimulator(*topology.zone_inputs(sensor_values), seed=seed, fis=fis, db_path=db_path)
+    return simulator.run(steps=steps, record=record)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Топология здания из онтологии и вывод по всем зонам")
+    parser.add_argument('ontology', nargs='?', default='ontology.ttl')
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--steps', type=int, help="выполнить симуляцию всех зон на заданное число шагов")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--no-cache', action='store_true', help="не использовать снимок разбора")
+    args = parser.parse_args(argv)
+
+    topology = load_topology(args.ontology, use_cache=not args.no_cache)
+    print(f"🏢 Зданий: {len(topology.buildings)}, зон: {topology.n_zones}, "
+          f"датчиков: {len(topology.sensors)}, исполнителей: {len(topology.actuators)}")
+    unassigned = int(np.count_nonzero(topology.sensor_zone < 0) + np.count_nonzero(topology.actuator_zone < 0))
+    if unassigned:
+        print(f"⚠️ Устройств без зоны: {unassigned}")
+    if not topology.n_zones:
+        return
+
+    fis = FuzzyInferenceSystem(args.db, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    smoke, temperature, zone = topology.zone_inputs()
+    outputs = fis.infer_batch(smoke, temperature, zone)
+    print("\n📍 Зоны (дым, температура, риск → спринклер, сигнализация, вентиляция):")
+    for z in range(min(topology.n_zones, 20)):
+        print(f"  {topology.zone_labels[z]}: {smoke[z]:.1f}, {temperature[z]:.1f}, {zone[z]:.1f} → "
+              + ", ".join(f"{outputs[name][z]:.2f}" for name in OUTPUT_VARIABLES))
+    if topology.n_zones > 20:
+        print(f"  ... ещё {topology.n_zones - 20} зон")
+
+    commands = topology.actuator_commands(outputs)
+    print("\n🔧 Команды исполнителям:")
+    for a in range(min(len(topology.actuators), 20)):
+        print(f"  {local_name(topology.actuators[a])}: {commands[a]:.2f}")
+
+    if args.steps:
+        result = simulate_building(topology, steps=args.steps, seed=args.seed, fis=fis)
+        safe = ~np.isnan(result.time_to_safe)
+        print(f"\n🔥 Симуляция: безопасное состояние достигнуто в {int(safe.sum())} из {topology.n_zones} зон")
+        if safe.any():
+            print(f"   Среднее время до безопасного состояния: {np.nanmean(result.time_to_safe):.1f} шагов")
+
+
+if __name__ == "__main__":
+    main()
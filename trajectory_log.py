@@ -0,0 +1,159 @@
+import os
+import struct
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from simulation import TRAJECTORY_FIELDS
+
+# Заголовок файла: сигнатура, версия, размер записи, число полей; дополнен до HEADER_SIZE байт
+MAGIC = b'FSTRAJ\x00\x01'
+VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct('<8sIII')
+
+LOG_EXTENSION = '.ftlog'
+
+# Запись — один шаг одного прогона: номер прогона и поля TRAJECTORY_FIELDS во float32
+RECORD_DTYPE = np.dtype([('run', '<u4')] + [(name, '<f4') for name in TRAJECTORY_FIELDS])
+
+
+def _header() -> bytes:
+    header = _HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, len(TRAJECTORY_FIELDS))
+    return header.ljust(HEADER_SIZE, b'\x00')
+
+
+def is_trajectory_log(path: str) -> bool:
+    """Файл начинается с сигнатуры журнала траекторий"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _check_header(f) -> None:
+    raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError("Файл короче заголовка журнала траекторий")
+    magic, version, itemsize, n_fields = _HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError("Не журнал траекторий: неверная сигнатура")
+    if version != VERSION or itemsize != RECORD_DTYPE.itemsize or n_fields != len(TRAJECTORY_FIELDS):
+        raise ValueError(f"Несовместимый журнал траекторий: версия {version}, запись {itemsize} байт")
+
+
+class TrajectoryWriter:
+    """Дозапись шагов в бинарный журнал траекторий.
+
+    Записи копятся в буфере из chunk_size элементов и сбрасываются на диск
+    одним блоком. Журнал можно дописывать и читать параллельно: неполная
+    последняя запись (оборванная запись на диск) при чтении отбрасывается.
+    """
+
+    def __init__(self, path: str, append: bool = False, chunk_size: int = 65536):
+        self.path = path
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, 'rb') as f:
+                _check_header(f)
+            self._file = open(path, 'r+b')
+            # Оборванная запись в конце файла затирается следующими
+            size = os.path.getsize(path)
+            records = (size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+            self._file.seek(HEADER_SIZE + records * RECORD_DTYPE.itemsize)
+            self._file.truncate()
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_header())
+        self._buffer = np.empty(chunk_size, dtype=RECORD_DTYPE)
+        self._size = 0
+        self.records_written = 0
+
+    def append(self, run: int, step, smoke, temperature, zone, sprinkler, alarm, ventilation):
+        """Одна запись"""
+        if self._size == len(self._buffer):
+            self.flush()
+        self._buffer[self._size] = (run, step, smoke, temperature, zone, sprinkler, alarm, ventilation)
+        self._size += 1
+
+    def extend(self, trajectory: np.ndarray, run=0):
+        """Шаги прогона: массив (шаги × TRAJECTORY_FIELDS); строки-заполнители NaN пропускаются.
+
+        run — номер прогона или массив номеров по строкам.
+        """
+        trajectory = np.asarray(trajectory)
+        if trajectory.ndim != 2 or trajectory.shape[1] != len(TRAJECTORY_FIELDS):
+            raise ValueError(f"Ожидается массив (шаги, {len(TRAJECTORY_FIELDS)})")
+        keep = ~np.isnan(trajectory[:, 0])
+        trajectory = trajectory[keep]
+        runs = np.broadcast_to(run, keep.shape)[keep]
+
+        start = 0
+        while start < len(trajectory):
+            if self._size == len(self._buffer):
+                self.flush()
+            n = min(len(trajectory) - start, len(self._buffer) - self._size)
+            block = self._buffer[self._size:self._size + n]
+            block['run'] = runs[start:start + n]
+            for j, name in enumerate(TRAJECTORY_FIELDS):
+                block[name] = trajectory[start:start + n, j]
+            self._size += n
+            start += n
+
+    def flush(self):
+        if self._size:
+            self._file.write(self._buffer[:self._size].tobytes())
+            self.records_written += self._size
+            self._size = 0
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> 'TrajectoryWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_trajectory_log(path: str) -> np.ndarray:
+    """Записи журнала как np.memmap со структурой RECORD_DTYPE (без чтения файла в память)"""
+    with open(path, 'rb') as f:
+        _check_header(f)
+    records = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if records == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(records,))
+
+
+def as_trajectory(records: np.ndarray) -> np.ndarray:
+    """Записи → массив float (шаги × TRAJECTORY_FIELDS), как у SimulationResult.trajectory"""
+    trajectory = np.empty((len(records), len(TRAJECTORY_FIELDS)))
+    for j, name in enumerate(TRAJECTORY_FIELDS):
+        trajectory[:, j] = records[name]
+    return trajectory
+
+
+def run_bounds(records: np.ndarray) -> Iterator[Tuple[int, int, int]]:
+    """(номер прогона, начало, конец) для идущих подряд записей одного прогона"""
+    runs = records['run']
+    if len(runs) == 0:
+        return
+    starts = np.flatnonzero(np.diff(runs)) + 1
+    edges = np.concatenate(([0], starts, [len(runs)]))
+    for start, stop in zip(edges[:-1].tolist(), edges[1:].tolist()):
+        yield int(runs[start]), start, stop
+
+
+def read_run(path_or_records, run: Optional[int] = None) -> np.ndarray:
+    """Траектория одного прогона (по умолчанию первого) в формате SimulationResult.trajectory"""
+    records = open_trajectory_log(path_or_records) if isinstance(path_or_records, str) else path_or_records
+    if run is None:
+        for run, start, stop in run_bounds(records):
+            return as_trajectory(records[start:stop])
+        return as_trajectory(records[:0])
+    return as_trajectory(records[records['run'] == run])
@@ -0,0 +1,254 @@
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+RDF = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+RDFS = 'http://www.w3.org/2000/01/rdf-schema#'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+RDF_TYPE = RDF + 'type'
+
+
+class Literal(NamedTuple):
+    """Литерал: лексическая форма, тип данных и язык"""
+    lexical: str
+    datatype: Optional[str] = None
+    lang: Optional[str] = None
+
+    def to_python(self):
+        """Значение литерала: int / float / bool для числовых и логических типов, иначе строка"""
+        if self.datatype == XSD + 'integer' or self.datatype == XSD + 'int':
+            return int(self.lexical)
+        if self.datatype in (XSD + 'decimal', XSD + 'double', XSD + 'float'):
+            return float(self.lexical)
+        if self.datatype == XSD + 'boolean':
+            return self.lexical in ('true', '1')
+        return self.lexical
+
+
+Term = Union[str, Literal]
+Triple = Tuple[str, str, Term]
+
+# Лексемы Turtle; порядок альтернатив важен (длинные строки раньше коротких,
+# пустые узлы раньше префиксных имён)
+_TOKEN = re.compile(r'''
+    (?P<ws>\s+|\#[^\n]*)
+  | (?P<long_string>"""(?:[^"\\]|\\.|"(?!""))*"""|\'\'\'(?:[^'\\]|\\.|'(?!''))*\'\'\')
+  | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<iri><[^<>"{}|^`\\\s]*>)
+  | (?P<bnode>_:[\w\-]+(?:\.[\w\-]+)*)
+  | (?P<pname>(?:[A-Za-z][\w\-]*(?:\.[\w\-]+)*)?:(?:[\w\-:%]+(?:\.[\w\-:%]+)*)?)
+  | (?P<directive>@prefix|@base|(?i:PREFIX|BASE)\b)
+  | (?P<lang>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+  | (?P<datatype>\^\^)
+  | (?P<number>[+-]?(?:\d+\.\d+|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+  | (?P<keyword>\b(?:a|true|false)\b)
+  | (?P<punct>[;,.\[\]()])
+''', re.VERBOSE)
+
+_ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))', re.DOTALL)
+_ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+
+class TurtleError(ValueError):
+    """Синтаксическая ошибка в Turtle с номером строки"""
+
+
+def _unescape(text: str) -> str:
+    def replace(match):
+        code = match.group(1) or match.group(2)
+        if code:
+            return chr(int(code, 16))
+        return _ESCAPES.get(match.group(3), match.group(3))
+    return _ESCAPE.sub(replace, text) if '\\' in text else text
+
+
+def _tokenize(text: str) -> Iterator[Tuple[str, str, int]]:
+    """(вид, текст, номер строки) без пробелов и комментариев"""
+    position = 0
+    line = 1
+    match_at = _TOKEN.match
+    while position < len(text):
+        match = match_at(text, position)
+        if match is None:
+            raise TurtleError(f"строка {line}: нераспознанный фрагмент {text[position:position + 20]!r}")
+        kind = match.lastgroup
+        value = match.group()
+        if kind != 'ws':
+            yield kind, value, line
+        line += value.count('\n')
+        position = match.end()
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens: List[Tuple[str, str, int]] = list(_tokenize(text))
+        self.position = 0
+        self.prefixes: Dict[str, str] = {}
+        self.base = ''
+        self.triples: List[Triple] = []
+        self._bnodes = 0
+
+    def _peek(self) -> Tuple[Optional[str], Optional[str], int]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        line = self.tokens[-1][2] if self.tokens else 1
+        return None, None, line
+
+    def _next(self) -> Tuple[str, str, int]:
+        token = self._peek()
+        if token[0] is None:
+            raise TurtleError(f"строка {token[2]}: неожиданный конец файла")
+        self.position += 1
+        return token
+
+    def _expect(self, value: str):
+        kind, text, line = self._next()
+        if text != value:
+            raise TurtleError(f"строка {line}: ожидалось {value!r}, получено {text!r}")
+
+    def _fresh_bnode(self) -> str:
+        self._bnodes += 1
+        return f'_:b{self._bnodes}'
+
+    def _iri(self, kind: str, text: str, line: int) -> str:
+        if kind == 'iri':
+            iri = _unescape(text[1:-1])
+            return iri if ':' in iri or not self.base else self.base + iri
+        if kind == 'pname':
+            prefix, _, local = text.partition(':')
+            if prefix not in self.prefixes:
+                raise TurtleError(f"строка {line}: неизвестный префикс {prefix!r}")
+            return self.prefixes[prefix] + local
+        raise TurtleError(f"строка {line}: ожидался IRI, получено {text!r}")
+
+    def parse(self) -> List[Triple]:
+        while self._peek()[0] is not None:
+            kind, text, line = self._peek()
+            if kind == 'directive':
+                self._directive()
+            else:
+                self._statement()
+        return self.triples
+
+    def _directive(self):
+        _, keyword, _ = self._next()
+        sparql_style = not keyword.startswith('@')
+        if keyword.lower().endswith('prefix'):
+            kind, name, line = self._next()
+            if kind != 'pname' or not name.endswith(':'):
+                raise TurtleError(f"строка {line}: ожидалось имя префикса, получено {name!r}")
+            kind, iri, line = self._next()
+            self.prefixes[name[:-1]] = self._iri(kind, iri, line)
+        else:
+            kind, iri, line = self._next()
+            self.base = self._iri(kind, iri, line)
+        if not sparql_style:
+            self._expect('.')
+
+    def _statement(self):
+        kind, text, line = self._peek()
+        if text == '[':
+            subject = self._blank_node_property_list()
+            if self._peek()[1] == '.':
+                self._next()
+                return
+        else:
+            subject = self._subject()
+        self._predicate_object_list(subject)
+        # Точку перед концом файла допускается опустить
+        if self._peek()[0] is not None:
+            self._expect('.')
+
+    def _subject(self) -> str:
+        kind, text, line = self._next()
+        if kind == 'bnode':
+            return text
+        if text == '(':
+            return self._collection()
+        return self._iri(kind, text, line)
+
+    def _predicate_object_list(self, subject: str):
+        while True:
+            kind, text, line = self._next()
+            predicate = RDF_TYPE if kind == 'keyword' and text == 'a' else self._iri(kind, text, line)
+            while True:
+                self.triples.append((subject, predicate, self._object()))
+                if self._peek()[1] != ',':
+                    break
+                self._next()
+            if self._peek()[1] != ';':
+                return
+            # Несколько ';' подряд и ';' перед '.', ']' или концом файла допустимы
+            while self._peek()[1] == ';':
+                self._next()
+            if self._peek()[0] is None or self._peek()[1] in ('.', ']'):
+                return
+
+    def _object(self) -> Term:
+        kind, text, line = self._next()
+        if kind == 'bnode':
+            return text
+        if kind in ('iri', 'pname'):
+            return self._iri(kind, text, line)
+        if text == '[':
+            self.position -= 1
+            return self._blank_node_property_list()
+        if text == '(':
+            return self._collection()
+        if kind in ('string', 'long_string'):
+            quote = 3 if kind == 'long_string' else 1
+            lexical = _unescape(text[quote:-quote])
+            next_kind, next_text, next_line = self._peek()
+            if next_kind == 'lang':
+                self._next()
+                return Literal(lexical, None, next_text[1:])
+            if next_kind == 'datatype':
+                self._next()
+                return Literal(lexical, self._iri(*self._next()))
+            return Literal(lexical, XSD + 'string')
+        if kind == 'number':
+            if 'e' in text or 'E' in text:
+                return Literal(text, XSD + 'double')
+            return Literal(text, XSD + ('decimal' if '.' in text else 'integer'))
+        if kind == 'keyword' and text in ('true', 'false'):
+            return Literal(text, XSD + 'boolean')
+        raise TurtleError(f"строка {line}: неожиданный объект {text!r}")
+
+    def _blank_node_property_list(self) -> str:
+        self._expect('[')
+        node = self._fresh_bnode()
+        if self._peek()[1] != ']':
+            self._predicate_object_list(node)
+        self._expect(']')
+        return node
+
+    def _collection(self) -> str:
+        """Список ( ... ) в виде цепочки rdf:first / rdf:rest"""
+        items = []
+        while self._peek()[1] != ')':
+            items.append(self._object())
+        self._next()
+        head = RDF + 'nil'
+        for item in reversed(items):
+            node = self._fresh_bnode()
+            self.triples.append((node, RDF + 'first', item))
+            self.triples.append((node, RDF + 'rest', head))
+            head = node
+        return head
+
+
+def parse_turtle(text: str) -> Tuple[List[Triple], Dict[str, str]]:
+    """Тройки и префиксы документа Turtle.
+
+    Поддерживается подмножество Turtle 1.1, достаточное для онтологий
+    проекта: @prefix/@base (и SPARQL-формы), IRI и префиксные имена, 'a',
+    строки (в т.ч. длинные) с языком или типом, числа и логические
+    литералы, пустые узлы _:x и [ ... ], списки ( ... ).
+    """
+    parser = _Parser(text)
+    triples = parser.parse()
+    return triples, parser.prefixes
+
+
+def parse_turtle_file(path: str) -> Tuple[List[Triple], Dict[str, str]]:
+    with open(path, encoding='utf-8') as f:
+        return parse_turtle(f.read())
@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch_simulation import BatchSimulator
+from fuzzy_system import VERBOSITY_SILENT, FuzzyInferenceSystem
+from knowledge_base import INPUT_RANGES, INPUT_VARIABLES, KnowledgeBase, compile_knowledge_base
+from simulation import TRAJECTORY_FIELDS
+
+# Начальные условия (дым, температура, зона) набора сценариев по умолчанию
+DEFAULT_SCENARIOS = (
+    (30.0, 45.0, 1.5),
+    (50.0, 70.0, 2.5),
+    (70.0, 110.0, 3.5),
+    (85.0, 150.0, 4.5),
+    (95.0, 190.0, 5.0),
+)
+# Веса целевой функции: время до безопасного состояния + расход воды и вентиляции
+DEFAULT_WEIGHTS = {'time_to_safe': 1.0, 'water': 0.5, 'ventilation': 0.25}
+METHODS = ('random', 'coordinate')
+# Значения параметров округляются: одинаковые кандидаты дают одинаковый ключ кэша
+PRECISION = 6
+
+_SPRINKLER = TRAJECTORY_FIELDS.index('sprinkler')
+_VENTILATION = TRAJECTORY_FIELDS.index('ventilation')
+
+# Рабочий процесс: система вывода, исходная база знаний, пространство и настройки оценки
+_worker = None
+
+
+class ParameterSpace(NamedTuple):
+    """Настраиваемые параметры: имена, исходные значения и границы.
+
+    Имена вида 'sprinkler:low' — синглтоны выходов (sprinkler_map и т.д.),
+    'smoke/medium/b' — точки трапеций входов в fuzzy_sets.
+    """
+    names: Tuple[str, ...]
+    base: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+
+    def clip(self, vector: np.ndarray) -> np.ndarray:
+        return np.round(np.clip(vector, self.lower, self.upper), PRECISION)
+
+
+class TuningResult(NamedTuple):
+    best: Dict[str, float]
+    cost: float
+    metrics: Dict[str, float]
+    evaluations: int
+    history: List[float]  # лучшая стоимость после каждой итерации
+
+
+def _maps(fis: FuzzyInferenceSystem) -> Dict[str, Dict[str, float]]:
+    return {'sprinkler': fis.sprinkler_map, 'alarm': fis.alarm_map, 'ventilation': fis.ventilation_map}
+
+
+def parameter_space(fis: FuzzyInferenceSystem, singletons: bool = True, breakpoints: bool = True,
+                    span: float = 0.15) -> ParameterSpace:
+    """Пространство параметров от текущей базы знаний.
+
+    Синглтоны меняются в [0, 1] (нулевые, т.е. 'off', не настраиваются);
+    точки трапеций — в пределах span ширины диапазона входа от исходных,
+    кроме лежащих на границе диапазона.
+    """
+    names, base, lower, upper = [], [], [], []
+    if singletons:
+        for output, crisp_map in _maps(fis).items():
+            for term, value in crisp_map.items():
+                if value > 0:
+                    names.append(f'{output}:{term}')
+                    base.append(value)
+                    lower.append(0.0)
+                    upper.append(1.0)
+    if breakpoints:
+        for variable in INPUT_VARIABLES:
+            low, high = INPUT_RANGES[variable]
+            delta = span * (high - low)
+            for term, *points in fis.kb.variables[variable].sets:
+                for label, value in zip('abcd', points):
+                    if value <= low or value >= high:
+                        continue  # плечи на границе диапазона остаются на месте
+                    names.append(f'{variable}/{term}/{label}')
+                    base.append(value)
+                    lower.append(max(low, value - delta))
+                    upper.append(min(high, value + delta))
+    return ParameterSpace(tuple(names), np.array(base, dtype=float), np.array(lower), np.array(upper))
+
+
+def apply_candidate(fis: FuzzyInferenceSystem, base_kb: KnowledgeBase, values: Dict[str, float]):
+    """Подстановка параметров кандидата (имя → значение) в систему вывода без записи в БД"""
+    for output, crisp_map in _maps(fis).items():
+        for term in crisp_map:
+            crisp_map[term] = values.get(f'{output}:{term}', crisp_map[term])
+    fuzzy_sets = []
+    for variable, sets in base_kb.variables.items():
+        for term, *points in sets.sets:
+            # Точки трапеции упорядочиваются, чтобы a <= b <= c <= d
+            points = sorted(values.get(f'{variable}/{term}/{label}', value) for label, value in zip('abcd', points))
+            fuzzy_sets.append((variable, term, *points))
+    fis.kb = compile_knowledge_base(fuzzy_sets, base_kb.rules, base_kb.signature)
+    if fis.cache is not None:
+        fis.cache.clear()
+
+
+def _init_worker(db_path: str, space: ParameterSpace, scenarios: np.ndarray, config: Dict):
+    global _worker
+    fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    base_maps = {output: dict(crisp_map) for output, crisp_map in _maps(fis).items()}
+    _worker = (fis, fis.kb, base_maps, space, scenarios, config)
+
+
+def _evaluate(vector: Tuple[float, ...]) -> Dict[str, float]:
+    """Стоимость кандидата по всем сценариям (пакетная симуляция всех повторов сразу)"""
+    fis, base_kb, base_maps, space, scenarios, config = _worker
+    for output, crisp_map in _maps(fis).items():
+        crisp_map.update(base_maps[output])
+    apply_candidate(fis, base_kb, dict(zip(space.names, vector)))
+
+    steps = config['steps']
+    initial = np.repeat(scenarios, config['replicates'], axis=0)
+    # Одинаковое зерно для всех кандидатов: сравнение на общих случайных числах
+    simulator = BatchSimulator(initial[:, 0], initial[:, 1], initial[:, 2], seed=config['seed'], fis=fis)
+    result = simulator.run(steps=steps, record=True)
+    time_to_safe = np.where(np.isnan(result.time_to_safe), 2 * steps, result.time_to_safe)
+    metrics = {
+        'time_to_safe': float(time_to_safe.mean()),
+        'reached_safe': float(np.mean(~np.isnan(result.time_to_safe))),
+        'water': float(np.nansum(result.trajectory[:, :, _SPRINKLER], axis=0).mean()),
+        'ventilation': float(np.nansum(result.trajectory[:, :, _VENTILATION], axis=0).mean()),
+    }
+    metrics['cost'] = sum(weight * metrics[name] for name, weight in config['weights'].items())
+    return metrics
+
+
+class _Evaluator:
+    """Оценка кандидатов в пуле процессов с кэшем по значениям параметров"""
+
+    def __init__(self, db_path: str, space: ParameterSpace, scenarios: np.ndarray, config: Dict,
+                 workers: Optional[int], memo: Optional[Dict] = None):
+        self.memo: Dict[Tuple[float, ...], Dict[str, float]] = memo if memo is not None else {}
+        self.hits = 0
+        initargs = (db_path, space, scenarios, config)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            _init_worker(*initargs)
+            self.pool = None
+        else:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs)
+
+    def __call__(self, vectors: Sequence[np.ndarray]) -> List[Dict[str, float]]:
+        keys = [tuple(float(v) for v in vector) for vector in vectors]
+        pending = list(dict.fromkeys(key for key in keys if key not in self.memo))
+        self.hits += len(keys) - len(pending)
+        if self.pool is None:
+            results = map(_evaluate, pending)
+        else:
+            results = self.pool.map(_evaluate, pending)
+        for key, metrics in zip(pending, results):
+            self.memo[key] = metrics
+        return [self.memo[key] for key in keys]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def _save_checkpoint(path: str, state: Dict, memo: Dict):
+    """Атомарная запись состояния поиска и всех оценённых кандидатов"""
+    data = dict(state, memo=[[list(key), metrics] for key, metrics in memo.items()])
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+def _load_checkpoint(path: str, config: Dict) -> Tuple[Optional[Dict], Dict]:
+    if not path or not os.path.exists(path):
+        return None, {}
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('config') != config:
+        raise ValueError(f"Контрольная точка {path} создана с другими параметрами поиска; "
+                         f"удалите её или задайте другой путь")
+    memo = {tuple(key): metrics for key, metrics in data.pop('memo')}
+    return data, memo
+
+
+def _random_step(state: Dict, space: ParameterSpace, evaluate, batch: int, rng: np.random.Generator):
+    """(1 + λ)-поиск: batch гауссовых возмущений лучшего кандидата.
+
+    Если улучшения нет, шаг sigma (доля ширины границ) уменьшается в 0.7 раза.
+    """
+    best = np.array(state['best'])
+    width = space.upper - space.lower
+    candidates = [space.clip(best + rng.normal(0, state['sigma'], size=best.shape) * width) for _ in range(batch)]
+    results = evaluate(candidates)
+    k = int(np.argmin([r['cost'] for r in results]))
+    if results[k]['cost'] < state['cost']:
+        state['best'], state['cost'], state['metrics'] = candidates[k].tolist(), results[k]['cost'], results[k]
+    else:
+        state['sigma'] *= 0.7
+
+
+def _coordinate_step(state: Dict, space: ParameterSpace, evaluate, batch: int, rng: np.random.Generator):
+    """Покоординатный спуск: ±sigma · ширина по каждому параметру за один пакет оценок.
+
+    Принимается лучший из одиночных сдвигов или их объединение (все
+    улучшающие сдвиги сразу); без улучшения шаг уменьшается вдвое.
+    """
+    best = np.array(state['best'])
+    width = space.upper - space.lower
+    candidates = []
+    for i in range(len(best)):
+        for sign in (-1.0, 1.0):
+            candidate = best.copy()
+            candidate[i] += sign * state['sigma'] * width[i]
+            candidates.append(space.clip(candidate))
+    results = evaluate(candidates)
+    costs = np.array([r['cost'] for r in results])
+
+    combined = best.copy()
+    for i in range(len(best)):
+        pair = costs[2 * i:2 * i + 2]
+        j = int(np.argmin(pair))
+        if pair[j] < state['cost']:
+            combined[i] = candidates[2 * i + j][i]
+    combined = space.clip(combined)
+    candidates.append(combined)
+    results += evaluate([combined])
+    costs = np.append(costs, results[-1]['cost'])
+
+    k = int(np.argmin(costs))
+    if costs[k] < state['cost']:
+        state['best'], state['cost'], state['metrics'] = candidates[k].tolist(), float(costs[k]), results[k]
+    else:
+        state['sigma'] *= 0.5
+
+
+def tune(db_path: str = 'knowledge_base.db', method: str = 'random', iterations: int = 20,
+         scenarios: Sequence[Tuple[float, float, float]] = DEFAULT_SCENARIOS, replicates: int = 8,
+         steps: int = 15, seed: int = 0, batch: int = 16, sigma: Optional[float] = None,
+         weights: Optional[Dict[str, float]] = None, singletons: bool = True, breakpoints: bool = True,
+         workers: Optional[int] = None, checkpoint: Optional[str] = None, verbose: bool = False) -> TuningResult:
+    """Подбор синглтонов выходов и точек трапеций входов по набору сценариев.
+
+    Каждый кандидат оценивается пакетной симуляцией всех сценариев ×
+    replicates с общим зерном seed. Одинаковые кандидаты не пересчитываются;
+    после каждой итерации состояние и все оценки пишутся в checkpoint (JSON),
+    и повторный вызов с тем же путём продолжает поиск.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Неизвестный метод настройки: {method!r}")
+    fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    space = parameter_space(fis, singletons=singletons, breakpoints=breakpoints)
+    if not space.names:
+        raise ValueError("Нет параметров для настройки")
+    scenarios = np.array(scenarios, dtype=float).reshape(-1, len(INPUT_VARIABLES))
+    config = {
+        'method': method,
+        'parameters': list(space.names),
+        'scenarios': scenarios.tolist(),
+        'replicates': replicates,
+        'steps': steps,
+        'seed': seed,
+        'weights': dict(weights or DEFAULT_WEIGHTS),
+    }
+    state, memo = _load_checkpoint(checkpoint, config)
+
+    evaluate = _Evaluator(db_path, space, scenarios, config, workers, memo)
+    try:
+        if state is None:
+            base = space.clip(space.base)
+            metrics = evaluate([base])[0]
+            state = {'config': config, 'iteration': 0, 'best': base.tolist(), 'cost': metrics['cost'],
+                     'metrics': metrics, 'initial': metrics,
+                     'sigma': sigma if sigma is not None else (0.1 if method == 'random' else 0.25),
+                     'history': []}
+        step = _random_step if method == 'random' else _coordinate_step
+        while state['iteration'] < iterations:
+            # Генератор зависит только от seed и номера итерации: продолжение даёт тот же поиск
+            rng = np.random.default_rng([seed, state['iteration']])
+            started = time.perf_counter()
+            step(state, space, evaluate, batch, rng)
+            state['iteration'] += 1
+            state['history'].append(state['cost'])
+            if checkpoint:
+                _save_checkpoint(checkpoint, state, evaluate.memo)
+            if verbose:
+                print(f"🔧 Итерация {state['iteration']}/{iterations}: стоимость {state['cost']:.3f}, "
+                      f"шаг {state['sigma']:.3g}, оценок {len(evaluate.memo)} "
+                      f"(из кэша {evaluate.hits}), {time.perf_counter() - started:.1f} с")
+    finally:
+        evaluate.close()
+
+    return TuningResult(dict(zip(space.names, state['best'])), state['cost'], state['metrics'],
+                        len(evaluate.memo), list(state['history']))
+
+
+def fuzzy_set_rows(db_path: str, best: Dict[str, float]) -> List[tuple]:
+    """Строки fuzzy_sets (переменная, терм, a, b, c, d) с настроенными точками трапеций"""
+    fis = FuzzyInferenceSystem(db_path, auto_reload=False, verbosity=VERBOSITY_SILENT)
+    apply_candidate(fis, fis.kb, best)
+    return [(variable, term, *points) for variable in INPUT_VARIABLES
+            for term, *points in fis.kb.variables[variable].sets]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Настройка синглтонов и трапеций по замкнутому контуру симуляции")
+    parser.add_argument('--db', default='knowledge_base.db')
+    parser.add_argument('--method', choices=METHODS, default='random')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=16, help="кандидатов на итерацию случайного поиска")
+    parser.add_argument('--scenarios', help="JSON-файл: список объектов smoke, temperature, zone")
+    parser.add_argument('--replicates', type=int, default=8, help="повторов каждого сценария")
+    parser.add_argument('--steps', type=int, default=15)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--checkpoint', help="файл контрольной точки (JSON) для продолжения поиска")
+    parser.add_argument('--no-singletons', action='store_true')
+    parser.add_argument('--no-breakpoints', action='store_true')
+    parser.add_argument('--apply', action='store_true',
+                        help="записать настроенные трапеции в базу знаний; только вместе с --no-singletons: "
+                             "синглтоны заданы в коде FuzzyInferenceSystem, и в БД их записать нельзя")
+    parser.add_argument('--output', help="куда записать результат в JSON (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+    if args.apply and not args.no_singletons:
+        parser.error("--apply записывает только трапеции: синглтоны выходов в базе знаний не хранятся, "
+                     "добавьте --no-singletons")
+    if args.apply and args.no_breakpoints:
+        parser.error("--apply вместе с --no-breakpoints: записывать нечего")
+
+    scenarios = DEFAULT_SCENARIOS
+    if args.scenarios:
+        with open(args.scenarios, encoding='utf-8') as f:
+            scenarios = [(s['smoke'], s['temperature'], s['zone']) for s in json.load(f)]
+
+    started = time.perf_counter()
+    result = tune(args.db, args.method, args.iterations, scenarios, args.replicates, args.steps, args.seed,
+                  args.batch, singletons=not args.no_singletons, breakpoints=not args.no_breakpoints,
+                  workers=args.workers, checkpoint=args.checkpoint, verbose=True)
+    elapsed = time.perf_counter() - started
+
+    if args.apply:
+        from kb_store import DEFAULT_RULE_SET, connect, has_schema, rule_set_id, upsert_fuzzy_sets
+        rows = fuzzy_set_rows(args.db, result.best)
+        conn = connect(args.db)
+        try:
+            if not has_schema(conn):
+                parser.error(f"в {args.db} старая схема; перенесите её командой kb_store.py import-legacy")
+            with conn:
+                upsert_fuzzy_sets(conn, rule_set_id(conn, DEFAULT_RULE_SET), rows)
+        finally:
+            conn.close()
+        print(f"💾 Трапеции записаны в {args.db}")
+
+    report = json.dumps({
+        'cost': result.cost,
+        'metrics': result.metrics,
+        'evaluations': result.evaluations,
+        'history': result.history,
+        'singletons': {k: v for k, v in result.best.items() if ':' in k},
+        'breakpoints': {k: v for k, v in result.best.items() if '/' in k},
+        'elapsed_s': elapsed,
+    }, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,97 +1,230 @@
-import matplotlib.pyplot as plt
+import time
+from typing import Optional
+
 import numpy as np
 
+# Поля записи, по порядку аргументов SimulationVisualizer.update
+FIELDS = ('step', 'smoke', 'temperature', 'zone', 'sprinkler', 'alarm', 'ventilation')
+
+# Панели: поле, заголовок, подпись оси, цвет, пределы по y, порог опасности
+PANELS = (
+    ('smoke', 'УРОВЕНЬ ЗАДЫМЛЕННОСТИ', 'Дым (%)', 'gray', (0, 105), 20),
+    ('temperature', 'ТЕМПЕРАТУРА', 'Температура (°C)', 'red', (0, 210), 40),
+    ('zone', 'УРОВЕНЬ РИСКА ЗОНЫ', 'Уровень риска', 'orange', (0, 5.5), 2),
+    ('sprinkler', 'ИНТЕНСИВНОСТЬ СПРИНКЛЕРА', 'Интенсивность (0-1)', 'blue', (-0.1, 1.1), None),
+    ('alarm', 'СИГНАЛИЗАЦИЯ', 'Уровень (0-1)', 'yellow', (-0.1, 1.1), None),
+    ('ventilation', 'СИСТЕМА ВЕНТИЛЯЦИИ', 'Интенсивность (0-1)', 'green', (-0.1, 1.1), None),
+)
+TITLE = 'СИСТЕМА ПОЖАРОТУШЕНИЯ С ВЕНТИЛЯЦИЕЙ'
+
+
+def _pyplot():
+    """matplotlib.pyplot загружается только тогда, когда нужно окно с графиками"""
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def decimate_minmax(x: np.ndarray, y: np.ndarray, max_points: int):
+    """Прореживание ряда: минимум и максимум в каждой из max_points // 2 корзин.
+
+    Сохраняет пики и провалы, поэтому форма графика не меняется, а число
+    точек ограничено независимо от длины ряда.
+    """
+    n = len(x)
+    if n <= max_points:
+        return x, y
+    buckets = max(1, max_points // 2)
+    edges = np.linspace(0, n, buckets + 1).astype(np.intp)
+    starts = edges[:-1]
+    lo = np.minimum.reduceat(y, starts)
+    hi = np.maximum.reduceat(y, starts)
+    # Точки корзины ставятся в её начало и конец, чтобы x оставался возрастающим
+    ends = edges[1:] - 1
+    xs = np.empty(2 * buckets)
+    ys = np.empty(2 * buckets)
+    xs[0::2], xs[1::2] = x[starts], x[ends]
+    ys[0::2], ys[1::2] = lo, hi
+    return xs, ys
+
+
+def create_figure(figsize=(15, 8), fig=None):
+    """Фигура 2×3 с оформлением панелей; возвращает фигуру, оси и линии данных.
+
+    Если передана готовая fig (например, matplotlib.figure.Figure для
+    offline-рендеринга), панели создаются в ней без участия pyplot.
+    """
+    if fig is None:
+        fig = _pyplot().figure(figsize=figsize)
+    axes = fig.subplots(2, 3)
+    fig.suptitle(TITLE, fontsize=14, fontweight='bold')
+    lines = {}
+    for ax, (field, title, ylabel, color, ylim, threshold) in zip(axes.flat, PANELS):
+        lines[field], = ax.plot([], [], color=color, marker='o', linestyle='-', linewidth=2, markersize=4)
+        ax.set_title(title)
+        ax.set_ylabel(ylabel)
+        ax.set_ylim(*ylim)
+        ax.grid(True, alpha=0.3)
+        if threshold is not None:
+            ax.axhline(y=threshold, color='red', linestyle='--', alpha=0.7, label='Порог опасности')
+            ax.legend(loc='upper right')
+    for ax in axes[1]:
+        ax.set_xlabel('Шаг симуляции')
+    fig.tight_layout()
+    return fig, list(axes.flat), lines
+
+
 class SimulationVisualizer:
-    def __init__(self):
-        self.steps = []
-        self.smoke_levels = []
-        self.temperatures = []
-        self.zones = []
-        self.sprinklers = []
-        self.alarms = []
-        self.ventilations = []
+    """Живой график симуляции с инкрементальной отрисовкой.
 
+    Линии создаются один раз, данные копятся в растущем массиве, а кадр
+    перерисовывается через blitting не чаще refresh_interval секунд.
+    window — ширина скользящего окна в шагах (None — вся история); число
+    точек на линию ограничено max_points (прореживание min/max), поэтому
+    стоимость кадра не растёт с длиной прогона.
+    """
+
+    def __init__(self, window: Optional[int] = None, refresh_interval: float = 0.1,
+                 max_points: int = 2000, initial_capacity: int = 256):
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.max_points = max_points
+
+        self._data = np.empty((initial_capacity, len(FIELDS)))
+        self._size = 0
+        self._last_draw = float('-inf')
+        self._background = None
+        self._x_limits = (0, window or 20)
+
+        plt = _pyplot()
         plt.ion()
-        self.fig, ((ax1, ax2, ax3), (ax4, ax5, ax6)) = plt.subplots(2, 3, figsize=(15, 8))
-        self.fig.suptitle('СИСТЕМА ПОЖАРОТУШЕНИЯ С ВЕНТИЛЯЦИЕЙ', fontsize=14, fontweight='bold')
+        self.fig, self.axes, self.lines = create_figure()
+        for line in self.lines.values():
+            line.set_animated(True)
+        for ax in self.axes:
+            ax.set_xlim(*self._x_limits)
+        self._blit = self.fig.canvas.supports_blit
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        plt.show(block=False)
+        self.fig.canvas.draw()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def column(self, field: str) -> np.ndarray:
+        """Накопленные значения поля (представление без копирования)"""
+        return self._data[:self._size, FIELDS.index(field)]
+
+    @property
+    def steps(self) -> np.ndarray:
+        return self.column('step')
+
+    @property
+    def smoke_levels(self) -> np.ndarray:
+        return self.column('smoke')
+
+    @property
+    def temperatures(self) -> np.ndarray:
+        return self.column('temperature')
+
+    @property
+    def zones(self) -> np.ndarray:
+        return self.column('zone')
+
+    @property
+    def sprinklers(self) -> np.ndarray:
+        return self.column('sprinkler')
+
+    @property
+    def alarms(self) -> np.ndarray:
+        return self.column('alarm')
+
+    @property
+    def ventilations(self) -> np.ndarray:
+        return self.column('ventilation')
 
     def update(self, step, smoke, temperature, zone, sprinkler, alarm, ventilation):
         """Обновление данных для графика"""
-        self.steps.append(step)
-        self.smoke_levels.append(smoke)
-        self.temperatures.append(temperature)
-        self.zones.append(zone)
-        self.sprinklers.append(sprinkler)
-        self.alarms.append(alarm)
-        self.ventilations.append(ventilation)
-
-        self._plot_all()
-
-    def _plot_all(self):
-        """Отрисовка всех графиков"""
-        for ax in self.fig.axes:
-            ax.clear()
-
-        # График задымленности
-        ax1 = self.fig.axes[0]
-        ax1.plot(self.steps, self.smoke_levels, color='gray', marker='o', linestyle='-', linewidth=2, markersize=4)
-        ax1.set_title('УРОВЕНЬ ЗАДЫМЛЕННОСТИ')
-        ax1.set_ylabel('Дым (%)')
-        ax1.grid(True, alpha=0.3)
-        ax1.axhline(y=20, color='red', linestyle='--', alpha=0.7, label='Порог опасности')
-        ax1.legend()
-
-        # График температуры
-        ax2 = self.fig.axes[1]
-        ax2.plot(self.steps, self.temperatures, color='red', marker='o', linestyle='-', linewidth=2, markersize=4)
-        ax2.set_title('ТЕМПЕРАТУРА')
-        ax2.set_ylabel('Температура (°C)')
-        ax2.grid(True, alpha=0.3)
-        ax2.axhline(y=40, color='red', linestyle='--', alpha=0.7, label='Порог опасности')
-        ax2.legend()
-
-        # График зоны риска
-        ax3 = self.fig.axes[2]
-        ax3.plot(self.steps, self.zones, color='orange', marker='o', linestyle='-', linewidth=2, markersize=4)
-        ax3.set_title('УРОВЕНЬ РИСКА ЗОНЫ')
-        ax3.set_ylabel('Уровень риска')
-        ax3.set_ylim(0, 5.5)
-        ax3.grid(True, alpha=0.3)
-        ax3.axhline(y=2, color='red', linestyle='--', alpha=0.7, label='Порог опасности')
-        ax3.legend()
-
-        # График спринклера
-        ax4 = self.fig.axes[3]
-        ax4.plot(self.steps, self.sprinklers, color='blue', marker='o', linestyle='-', linewidth=2, markersize=4)
-        ax4.set_title('ИНТЕНСИВНОСТЬ СПРИНКЛЕРА')
-        ax4.set_ylabel('Интенсивность (0-1)')
-        ax4.set_xlabel('Шаг симуляции')
-        ax4.set_ylim(-0.1, 1.1)
-        ax4.grid(True, alpha=0.3)
-
-        # График сигнализации
-        ax5 = self.fig.axes[4]
-        ax5.plot(self.steps, self.alarms, color='yellow', marker='o', linestyle='-', linewidth=2, markersize=4)
-        ax5.set_title('СИГНАЛИЗАЦИЯ')
-        ax5.set_ylabel('Уровень (0-1)')
-        ax5.set_xlabel('Шаг симуляции')
-        ax5.set_ylim(-0.1, 1.1)
-        ax5.grid(True, alpha=0.3)
-
-        # График вентиляции
-        ax6 = self.fig.axes[5]
-        ax6.plot(self.steps, self.ventilations, color='green', marker='o', linestyle='-', linewidth=2, markersize=4)
-        ax6.set_title('СИСТЕМА ВЕНТИЛЯЦИИ')
-        ax6.set_ylabel('Интенсивность (0-1)')
-        ax6.set_xlabel('Шаг симуляции')
-        ax6.set_ylim(-0.1, 1.1)
-        ax6.grid(True, alpha=0.3)
-
-        plt.tight_layout()
-        plt.draw()
-        plt.pause(0.1)
+        if self._size == len(self._data):
+            grown = np.empty((2 * len(self._data), len(FIELDS)))
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size] = (step, smoke, temperature, zone, sprinkler, alarm, ventilation)
+        self._size += 1
+
+        now = time.perf_counter()
+        if now - self._last_draw >= self.refresh_interval:
+            self.refresh()
+
+    def refresh(self):
+        """Перерисовка кадра с текущими данными"""
+        self._last_draw = time.perf_counter()
+        if self._size == 0:
+            return
+
+        steps = self.column('step')
+        limits_changed = self._update_x_limits(steps[-1])
+        # В режиме скользящего окна рисуются только точки внутри пределов оси
+        start = 0 if self.window is None else int(np.searchsorted(steps, self._x_limits[0]))
+        self._set_line_data(start)
+        if limits_changed:
+            # Сменились пределы оси x — нужен полный кадр и новый фон
+            self.fig.canvas.draw()
+        else:
+            self._draw_frame()
+        self.fig.canvas.flush_events()
+
+    def _set_line_data(self, start: int):
+        x = self._data[start:self._size, 0]
+        for j, field in enumerate(FIELDS[1:], start=1):
+            xs, ys = decimate_minmax(x, self._data[start:self._size, j], self.max_points)
+            self.lines[field].set_data(xs, ys)
+
+    def _update_x_limits(self, last_step: float) -> bool:
+        """Расширение или сдвиг оси x скачками, чтобы полный перерисовывающий кадр был редким"""
+        low, high = self._x_limits
+        if last_step <= high:
+            return False
+        if self.window is None:
+            while high < last_step:
+                high *= 2
+            self._x_limits = (0, high)
+        else:
+            # Окно сдвигается на половину ширины
+            shift = max(self.window // 2, 1)
+            while high < last_step:
+                low, high = low + shift, high + shift
+            self._x_limits = (low, high)
+        for ax in self.axes:
+            ax.set_xlim(*self._x_limits)
+        return True
+
+    def _on_draw(self, event):
+        """После полного кадра запоминаем фон без линий и дорисовываем линии"""
+        if self._blit:
+            self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        for ax, line in zip(self.axes, self.lines.values()):
+            ax.draw_artist(line)
+
+    def _draw_frame(self):
+        canvas = self.fig.canvas
+        if not self._blit or self._background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._background)
+        for ax, line in zip(self.axes, self.lines.values()):
+            ax.draw_artist(line)
+        canvas.blit(self.fig.bbox)
 
     def show_final(self):
         """Показать финальный график"""
+        # Итоговый график — вся история без скользящего окна
+        for line in self.lines.values():
+            line.set_animated(False)
+        if self._size:
+            steps = self.steps
+            for ax in self.axes:
+                ax.set_xlim(min(0, steps[0]), max(steps[-1], 1))
+            self._set_line_data(0)
+        plt = _pyplot()
         plt.ioff()
-        plt.show()
\ No newline at end of file
+        plt.show()